@@ -0,0 +1,180 @@
+# k210/common/scheduler.py
+# 基于 time.ticks_ms 截止时间的协作式周期任务调度（stereo_lcd / stereo_lcd_wifi 共用）
+import time
+
+# MicroPython 的 ticks 会回绕，差值/加法必须走 ticks_diff/ticks_add；
+# 在 PC 上跑（模拟器）时退化为普通整数运算
+_ticks_diff = getattr(time, "ticks_diff", lambda a, b: a - b)
+_ticks_add = getattr(time, "ticks_add", lambda a, b: a + b)
+
+
+class Task:
+    def __init__(self, name, fn, period_ms, priority=10):
+        self.name = name
+        self.fn = fn
+        self.period = max(1, int(period_ms))
+        self.priority = int(priority)
+        self.enabled = True
+        self.deadline = 0
+        self.runs = 0
+        self.errors = 0
+        self.overruns = 0  # 单次执行超过周期
+        self.skipped = 0  # 落后整周期被跳过的次数
+        self.jitter_max = 0
+        self.jitter_sum = 0
+        self.exec_max = 0
+        self.exec_sum = 0
+
+    def stats(self):
+        n = self.runs or 1
+        return {
+            "period": self.period,
+            "runs": self.runs,
+            "errors": self.errors,
+            "overruns": self.overruns,
+            "skipped": self.skipped,
+            "jitter_avg": self.jitter_sum // n,
+            "jitter_max": self.jitter_max,
+            "exec_avg": self.exec_sum // n,
+            "exec_max": self.exec_max,
+        }
+
+
+class Scheduler:
+    """
+    每个任务有自己的截止时间。
+    选任务：到期的任务中 priority 数值小的先跑，同优先级按截止时间先后；
+    落后满一个周期的任务优先于没落后的（高优先级任务一直超时也饿不死别人）。
+    正常情况：下一次截止时间 = 本次截止时间 + 周期（节拍不漂移）。
+    超时（执行完已经过了下一次截止时间）：截止时间设为执行结束时刻，
+    任务立刻再跑一次；错过的整周期数加到 skipped，不连续补跑。
+    没有到期任务时只睡到最近的截止时间（不超过 idle_ms）。
+
+    on_error(task, exc)：任务抛异常时调用；为 None 时异常继续往外抛。
+    """
+
+    def __init__(self, clock=None, sleep=None, idle_ms=50, on_error=None):
+        self.clock = clock or time.ticks_ms
+        self.sleep = sleep or time.sleep_ms
+        self.idle_ms = int(idle_ms)
+        self.on_error = on_error
+        self.tasks = []
+        self.idle_total = 0
+
+    def add(self, name, fn, period_ms, priority=10, offset_ms=0):
+        t = Task(name, fn, period_ms, priority)
+        t.deadline = _ticks_add(self.clock(), int(offset_ms))
+        self.tasks.append(t)
+        return t
+
+    def get(self, name):
+        for t in self.tasks:
+            if t.name == name:
+                return t
+        return None
+
+    def _pick(self, now):
+        # 落后满一个周期的任务（饿着的）先于其他到期任务：超时任务截止时间设为“现在”，
+        # 不能靠高优先级一直霸占
+        best = None
+        best_starved = False
+        for t in self.tasks:
+            late = _ticks_diff(now, t.deadline)
+            if not t.enabled or late < 0:
+                continue
+            starved = late >= t.period
+            if (
+                best is None
+                or (starved and not best_starved)
+                or (
+                    starved == best_starved
+                    and (
+                        t.priority < best.priority
+                        or (
+                            t.priority == best.priority
+                            and _ticks_diff(t.deadline, best.deadline) < 0
+                        )
+                    )
+                )
+            ):
+                best = t
+                best_starved = starved
+        return best
+
+    def next_wait(self, now):
+        wait = self.idle_ms
+        for t in self.tasks:
+            if t.enabled:
+                wait = min(wait, max(0, _ticks_diff(t.deadline, now)))
+        return wait
+
+    def run_once(self):
+        now = self.clock()
+        t = self._pick(now)
+        if t is None:
+            wait = self.next_wait(now)
+            if wait > 0:
+                self.sleep(wait)
+                self.idle_total += wait
+            return None
+
+        jitter = _ticks_diff(now, t.deadline)
+        try:
+            t.fn()
+        except Exception as e:
+            t.errors += 1
+            if self.on_error is None:
+                raise
+            self.on_error(t, e)
+        end = self.clock()
+        dt = _ticks_diff(end, now)
+
+        t.runs += 1
+        t.jitter_sum += jitter
+        t.exec_sum += dt
+        if jitter > t.jitter_max:
+            t.jitter_max = jitter
+        if dt > t.exec_max:
+            t.exec_max = dt
+        if dt > t.period:
+            t.overruns += 1
+
+        nxt = _ticks_add(t.deadline, t.period)
+        late = _ticks_diff(end, nxt)
+        if late >= 0:
+            # 下一个周期已经开始：马上跑，不再空等到再下一个节拍
+            t.skipped += late // t.period
+            nxt = end
+        t.deadline = nxt
+        return t
+
+    def run(self, forever=True):
+        while forever:
+            self.run_once()
+
+    def stats(self):
+        out = {"idle_ms": self.idle_total}
+        for t in self.tasks:
+            out[t.name] = t.stats()
+        return out
+
+    def report(self):
+        lines = []
+        for t in self.tasks:
+            s = t.stats()
+            lines.append(
+                "[SCHED] %-8s p=%d runs=%d jit=%d/%d exec=%d/%d over=%d skip=%d err=%d"
+                % (
+                    t.name,
+                    t.priority,
+                    s["runs"],
+                    s["jitter_avg"],
+                    s["jitter_max"],
+                    s["exec_avg"],
+                    s["exec_max"],
+                    s["overruns"],
+                    s["skipped"],
+                    s["errors"],
+                )
+            )
+        return "\n".join(lines)
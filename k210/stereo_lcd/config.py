@@ -7,3 +7,6 @@ SWITCH_MS = 200  # show each eye for 200ms
 
 # If you have LCD
 USE_LCD = True
+
+# Print scheduler jitter/overrun stats every N ms
+HOUSEKEEPING_MS = 10000
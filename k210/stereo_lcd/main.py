@@ -7,6 +7,7 @@ except Exception:
     lcd = None
 
 import config
+from scheduler import Scheduler
 
 
 # -------------------------
@@ -183,45 +184,55 @@ def main():
             time.sleep_ms(1000)
 
     # Simple heartbeat so you know loop is alive even if display freezes
-    beat = 0
+    state = {"side": 0, "beat": 0}
 
-    while True:
-        try:
-            # Left
+    def preview():
+        # One eye per tick, alternating; the scheduler keeps the cadence
+        beat = state["beat"]
+        if state["side"] == 0:
             imgL = capture_left()
             if lcd_ok():
                 lcd.display(imgL)
                 lcd_msg("L %d" % beat, y=0)
             print("[L] %dx%d" % (imgL.width(), imgL.height()))
-            time.sleep_ms(int(getattr(config, "SWITCH_MS", 200)))
-
-            # Right
+        else:
             imgR = capture_right()
             if lcd_ok():
                 lcd.display(imgR)
                 lcd_msg("R %d" % beat, y=0)
             print("[R] %dx%d" % (imgR.width(), imgR.height()))
-            time.sleep_ms(int(getattr(config, "SWITCH_MS", 200)))
+            state["beat"] = (beat + 1) % 10000
+        state["side"] ^= 1
 
-            beat = (beat + 1) % 10000
+    def recover(task, e):
+        print("[LOOP] error:", e)
+        if lcd_ok():
+            lcd_msg("LOOP ERR", y=24)
 
-        except Exception as e:
-            print("[LOOP] error:", e)
+        # Try to recover camera
+        time.sleep_ms(200)
+        try:
+            init_binocular(warmup_pairs=10)
             if lcd_ok():
-                lcd_msg("LOOP ERR", y=24)
-
-            # Try to recover camera
-            time.sleep_ms(200)
-            try:
-                init_binocular(warmup_pairs=10)
-                if lcd_ok():
-                    lcd_msg("RECOVER OK", y=24)
-            except Exception as e2:
-                print("[RECOVER] failed:", e2)
-                if lcd_ok():
-                    lcd_msg("RECOVER FAIL", y=24)
-                # wait a bit and retry again
-                time.sleep_ms(800)
+                lcd_msg("RECOVER OK", y=24)
+        except Exception as e2:
+            print("[RECOVER] failed:", e2)
+            if lcd_ok():
+                lcd_msg("RECOVER FAIL", y=24)
+            # wait a bit and retry again
+            time.sleep_ms(800)
+
+    housekeeping_ms = int(getattr(config, "HOUSEKEEPING_MS", 10000))
+    sched = Scheduler(on_error=recover)
+    sched.add("preview", preview, int(getattr(config, "SWITCH_MS", 200)), priority=0)
+    sched.add(
+        "house",
+        lambda: print(sched.report()),
+        housekeeping_ms,
+        priority=9,
+        offset_ms=housekeeping_ms,
+    )
+    sched.run()
 
 
 if __name__ == "__main__":
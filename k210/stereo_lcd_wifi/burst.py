@@ -0,0 +1,70 @@
+# k210/stereo_lcd_wifi/burst.py
+# 连拍：N 对左右帧不间断采集+压缩进预分配环形缓冲，之后一次性上传
+import time
+
+from pipeline import ReuseBuffer
+
+_ticks_diff = getattr(time, "ticks_diff", lambda a, b: a - b)
+
+
+class BurstRing:
+    """
+    npairs 个槽位，每槽 L/R 各一块复用缓冲 + 采集时间戳（us）。
+    cap 是单帧 payload 的预估大小，构造时就把 2 * npairs 块缓冲分配好；
+    实际帧比 cap 大（如 JPEG 压得不如预估）时那一块才在连拍中扩容一次。
+    """
+
+    def __init__(self, npairs, cap=0):
+        self.n = int(npairs)
+        self.bufs = [[ReuseBuffer(cap), ReuseBuffer(cap)] for _ in range(self.n)]
+        self.views = [[None, None] for _ in range(self.n)]
+        self.t_us = [[0, 0] for _ in range(self.n)]
+        self.count = 0
+        self.burst_id = 0
+
+    def reset(self):
+        self.count = 0
+        self.burst_id += 1
+        for v in self.views:
+            v[0] = v[1] = None
+
+    def put(self, i, side, payload, t_us):
+        self.views[i][side] = self.bufs[i][side].load(payload)
+        self.t_us[i][side] = t_us
+        if i + 1 > self.count:
+            self.count = i + 1
+
+    def skew_us(self, i):
+        # 同一对内右眼相对左眼的采集时间差
+        return _ticks_diff(self.t_us[i][1], self.t_us[i][0])
+
+    def skew_stats(self):
+        n = self.count
+        if n == 0:
+            return {"pairs": 0}
+        skews = [self.skew_us(i) for i in range(n)]
+        out = {
+            "pairs": n,
+            "skew_min": min(skews),
+            "skew_max": max(skews),
+            "skew_avg": sum(skews) // n,
+        }
+        if n > 1:
+            # 对与对之间的间隔 -> 实际连拍帧率
+            span = _ticks_diff(self.t_us[n - 1][0], self.t_us[0][0])
+            out["pair_period_avg"] = span // (n - 1)
+        return out
+
+
+def capture_burst(ring, grab, encode, clock_us):
+    """
+    grab(side) -> image（0 = 左, 1 = 右），encode(image) -> buffer，clock_us() -> us。
+    时间戳取 snapshot 返回时刻；编码后立刻拷进环形缓冲，下一次 snapshot 可以覆盖 framebuffer。
+    """
+    ring.reset()
+    for i in range(ring.n):
+        for side in (0, 1):
+            img = grab(side)
+            t = clock_us()
+            ring.put(i, side, encode(img), t)
+    return ring.count
@@ -3,9 +3,15 @@
 # --- Camera/LCD ---
 USE_LCD = True
 FRAME_SIZE = "QVGA"  # "QQVGA" / "QVGA" / "VGA"
-PIXFORMAT = "RGB565"  # "RGB565" or "GRAYSCALE"
+PIXFORMAT = "RGB565"  # "RGB565" or "GRAYSCALE" (RAW: 1 byte/pixel, half the bandwidth)
 SWITCH_MS = 40  # preview switch interval (LCD)
 
+# Upload only part of the frame (preview still shows the full frame).
+# ROI: (x, y, w, h) in full-frame pixels, or None for the whole frame.
+# DECIMATE: 1 (off), 2 or 4 -> upload w/N x h/N. Cuts encode time and airtime.
+ROI = None  # e.g. (0, 80, 320, 80) for a horizontal band on QVGA
+DECIMATE = 1
+
 # Stream payload mode: "JPEG" or "RAW"
 STREAM_MODE = "JPEG"  # ✅ 发 JPEG（强烈推荐）
 # STREAM_MODE = "RAW"  # 发 RGB565 原始流（调试用）
@@ -24,9 +30,79 @@ JPEG_QUALITY = 50  # 10..95 (higher = better quality/larger)
 STREAM_INTERVAL_MS = 100  # upload every N ms (tune for bandwidth)
 SOCKET_TIMEOUT = 12
 
-# If True, send one stitched image (Left|Right). Recommended.
+# Payload send: the encoded image buffer is streamed to the socket in
+# SEND_CHUNK-byte memoryview slices (no per-frame copy).
+SEND_CHUNK = 2048
+# If True, copy each payload once into a preallocated, reused buffer before
+# sending (detaches it from the frame buffer) instead of sending in place.
+PAYLOAD_SAFE_COPY = False
+
+# If True, send one stitched image (Left|Right) per stereo frame:
+# one encode, one connection, server splits it into L/R (perfect pairing). Recommended.
 STITCH_LR = False
 
+# Double-buffered capture/upload: the next pair is captured and compressed
+# while the previous one uploads (background _thread if available, else
+# cooperative). When the network is slower than capture the oldest pending
+# pair is dropped. Each slot holds its own copy: with RAW VGA that is
+# 2 slots x 2 eyes x 614 KB, so prefer JPEG here.
+PIPELINE = True
+PIPELINE_SLOTS = 2
+PIPELINE_THREAD = True
+
+# Deadline scheduler (k210/common/scheduler.py): preview (SWITCH_MS),
+# stereo capture/upload (STREAM_INTERVAL_MS), cooperative upload polling
+# and housekeeping run as independent periodic tasks.
+UPLOAD_POLL_MS = 10  # cooperative pipeline only (no _thread)
+HOUSEKEEPING_MS = 10000  # gc + [SCHED] jitter/overrun report
+SCHED_IDLE_MS = 50  # max sleep when nothing is due
+
+# Burst capture: BURST_PAIRS stereo pairs back-to-back at full sensor rate
+# into a preallocated on-device ring (compressed as they come in), then
+# uploaded as one batch with X-Burst-*/X-Skew-Us headers. 0 disables.
+# Ring memory ~ BURST_PAIRS x 2 x JPEG size (keep JPEG for bursts).
+BURST_PAIRS = 0
+BURST_EVERY_MS = 0  # 0 = one burst BURST_DELAY_MS after boot
+BURST_DELAY_MS = 2000
+BURST_ONLY = False  # True = no regular streaming, bursts only
+
+# Latency tracing: every upload carries X-Device-Id and device ticks_ms
+# stamps (X-T-Capture / X-T-Encoded / X-T-Send). The server maps them onto
+# its own clock using NTP-style /ping round trips (LATENCY_SYNC_PINGS at
+# boot, then one per housekeeping cycle) -> GET /latency on the server.
+DEVICE_ID = None  # None = machine.unique_id() as hex
+LATENCY_SYNC_PINGS = 4
+
+# Telemetry heartbeat: per-frame capture/compress/connect/send/response
+# timings, upload ok/fail/retries/bytes and free heap are aggregated on the
+# device ([n, avg, max] per stage) and POSTed to /telemetry every
+# TELEMETRY_MS (shown on the server index page). 0 disables.
+TELEMETRY_MS = 10000
+
+# Tile delta (RAW only): each frame is compared with the last one the server
+# has, per DELTA_TILE x DELTA_TILE block (crc32, or byte sum within DELTA_TOL
+# when DELTA_TOL > 0 to ride over sensor noise), and only the changed blocks
+# are sent with a block bitmap. A full keyframe goes out every
+# DELTA_KEY_EVERY frames, after any failed upload, and whenever the changed
+# blocks would not be smaller than the frame. Viewers still get full frames.
+DELTA = False
+DELTA_TILE = 16
+DELTA_KEY_EVERY = 50
+DELTA_TOL = 0
+
+# Fast boot: ESP32 power-up wait (WIFI_BOOT_DELAY_MS, skipped after a
+# watchdog/soft reset) and association run in a background thread while the
+# LCD and both sensors are initialised. Warm-up stops as soon as both eyes'
+# mean brightness changes by <= WARMUP_TOL for two pairs in a row (auto
+# exposure settled), at least WARMUP_MIN_PAIRS and at most WARMUP_MAX_PAIRS.
+# A per-phase [BOOT] report is printed at the first successful upload and
+# sent with the first telemetry heartbeat. False = the old serial sequence.
+FAST_BOOT = True
+WIFI_BOOT_DELAY_MS = 1200
+WARMUP_MAX_PAIRS = 10
+WARMUP_MIN_PAIRS = 2
+WARMUP_TOL = 3
+
 # Add a simple increasing frame id in header
 SEND_FRAME_ID = True
 
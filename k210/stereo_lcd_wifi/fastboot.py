@@ -0,0 +1,146 @@
+# k210/stereo_lcd_wifi/fastboot.py
+# 快速启动：ESP32 上电/联网放到后台线程，和 LCD/传感器初始化、预热同时进行；
+# 每个阶段记耗时，首帧上传成功时打印一份启动报告（随第一次遥测发给服务端）。
+import time
+
+try:
+    import _thread
+except ImportError:
+    _thread = None
+
+_ticks_ms = getattr(time, "ticks_ms", lambda: int(time.time() * 1000))
+_ticks_diff = getattr(time, "ticks_diff", lambda a, b: a - b)
+
+
+def reset_cause():
+    # 上电 / 看门狗 / 软复位；固件不支持时返回 None
+    try:
+        import machine
+
+        cause = machine.reset_cause()
+    except Exception:
+        return None
+    for name in ("PWRON_RESET", "HARD_RESET", "WDT_RESET", "SOFT_RESET"):
+        if getattr(machine, name, None) == cause:
+            return name
+    return cause
+
+
+class BootTimer:
+    """
+    mark(name)：上一个点到现在记为一个阶段（主线程上的串行部分）；
+    side(name, ms)：后台并行的阶段单独记（不计入串行总和）。
+    """
+
+    def __init__(self):
+        self.t0 = _ticks_ms()
+        self.last = self.t0
+        self.phases = []
+        self.side_phases = {}
+        self.notes = {}
+        self.done = False
+
+    def mark(self, name):
+        now = _ticks_ms()
+        ms = _ticks_diff(now, self.last)
+        self.phases.append((name, ms))
+        self.last = now
+        return ms
+
+    def side(self, name, ms):
+        self.side_phases[name] = ms
+
+    def note(self, key, value):
+        self.notes[key] = value
+
+    def elapsed(self):
+        return _ticks_diff(_ticks_ms(), self.t0)
+
+    def report(self):
+        out = {
+            "total_ms": _ticks_diff(self.last, self.t0),
+            "phases": [[n, ms] for n, ms in self.phases],
+            "parallel": dict(self.side_phases),
+        }
+        out.update(self.notes)
+        return out
+
+    def format(self):
+        parts = ["%s=%d" % (n, ms) for n, ms in self.phases]
+        for n, ms in self.side_phases.items():
+            parts.append("%s=%d(bg)" % (n, ms))
+        for k, v in self.notes.items():
+            parts.append("%s=%s" % (k, v))
+        return "[BOOT] total=%dms %s" % (
+            _ticks_diff(self.last, self.t0),
+            " ".join(parts),
+        )
+
+
+class Background:
+    """
+    在 _thread 里跑 fn()；没有 _thread 时 start() 里直接同步跑（功能不变，只是不重叠）。
+    join(timeout_ms) 轮询等结果，不依赖 _thread 的锁等待。
+    """
+
+    def __init__(self, fn):
+        self.fn = fn
+        self.done = False
+        self.result = None
+        self.error = None
+        self.ms = 0
+        self.threaded = False
+
+    def _run(self):
+        t0 = _ticks_ms()
+        try:
+            self.result = self.fn()
+        except Exception as e:
+            self.error = e
+        self.ms = _ticks_diff(_ticks_ms(), t0)
+        self.done = True
+
+    def start(self, threaded=True):
+        if threaded and _thread is not None:
+            try:
+                _thread.start_new_thread(self._run, ())
+                self.threaded = True
+                return self
+            except Exception:
+                pass
+        self._run()
+        return self
+
+    def join(self, timeout_ms, poll_ms=20):
+        t0 = _ticks_ms()
+        while not self.done:
+            if _ticks_diff(_ticks_ms(), t0) > timeout_ms:
+                return False
+            time.sleep_ms(poll_ms)
+        return True
+
+
+def warmup(grab_pair, max_pairs=10, min_pairs=2, tol=3, stable=2):
+    """
+    grab_pair() -> (左眼亮度均值, 右眼亮度均值)，取不到统计时返回 None。
+    两眼的均值连续 stable 次变化都不超过 tol 就认为 AE 已稳定；
+    统计不可用时按 max_pairs 固定次数预热（和原来一样）。返回实际预热对数。
+    """
+    prev = None
+    calm = 0
+    n = 0
+    while n < max_pairs:
+        cur = grab_pair()
+        n += 1
+        if cur is None:
+            prev = None
+            continue
+        if prev is not None:
+            if abs(cur[0] - prev[0]) <= tol and abs(cur[1] - prev[1]) <= tol:
+                calm += 1
+            else:
+                calm = 0
+        prev = cur
+        if n >= min_pairs and calm >= stable:
+            break
+    return n
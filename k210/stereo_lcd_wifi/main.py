@@ -9,6 +9,12 @@ except Exception:
     lcd = None
 
 import config
+from pipeline import Pipeline, ReuseBuffer
+from burst import BurstRing, capture_burst
+from fastboot import Background, BootTimer, reset_cause, warmup
+from scheduler import Scheduler
+from telemetry import Telemetry
+from tiledelta import TileDelta
 
 
 # ---------- helpers ----------
@@ -44,6 +50,23 @@ def _pixformat_from_str(s):
     return sensor.RGB565
 
 
+def _raw_format():
+    # RAW 上传的 X-Format 名 + 每像素字节数（与 sensor 像素格式一致）
+    pf = _pixformat_from_str(getattr(config, "PIXFORMAT", "RGB565"))
+    if pf == sensor.GRAYSCALE:
+        return "GRAY8", 1
+    return "RGB565", 2
+
+
+def _payload_cap(geo, stream_mode, parts=1):
+    # 一帧 payload 的预分配大小：RAW 按像素算足，JPEG 按 1/4 估（不够时 ReuseBuffer 再长）
+    _, bpp = _raw_format()
+    cap = geo["w"] * geo["h"] * bpp * parts
+    if stream_mode != "RAW":
+        cap //= 4
+    return cap
+
+
 def lcd_ok():
     return (lcd is not None) and getattr(config, "USE_LCD", True)
 
@@ -59,9 +82,17 @@ def lcd_msg(msg, y=0):
         pass
 
 
-def init_lcd():
+def init_lcd(fast=False):
     if lcd is None or not getattr(config, "USE_LCD", True):
         return False
+    if fast:
+        # 快速启动：先直接 init 一次，失败再走下面带等待的重试
+        try:
+            lcd.init()
+            lcd_msg("LCD OK", 0)
+            return True
+        except Exception:
+            pass
     time.sleep_ms(150)
     for _ in range(3):
         try:
@@ -98,7 +129,29 @@ def _config_one_side():
     time.sleep_ms(30)
 
 
-def init_binocular(warmup_pairs=10):
+def _luma_mean(img):
+    # AE 是否稳定看画面平均亮度；固件没有 get_statistics 时返回 None（退回固定次数预热）
+    try:
+        return img.get_statistics().l_mean()
+    except Exception:
+        return None
+
+
+def _warmup_pair():
+    sensor.shutdown(False)
+    yl = _luma_mean(sensor.snapshot())
+    sensor.shutdown(True)
+    yr = _luma_mean(sensor.snapshot())
+    if yl is None or yr is None:
+        return None
+    return yl, yr
+
+
+def init_binocular(warmup_pairs=10, adaptive=False, boot=None):
+    """
+    adaptive=True：两眼亮度连续几对不再变化（AE 收敛）就结束预热，
+    warmup_pairs 只是上限。返回实际预热对数。
+    """
     try:
         sensor.reset()
         time.sleep_ms(80)
@@ -116,19 +169,41 @@ def init_binocular(warmup_pairs=10):
 
     sensor.run(1)
     time.sleep_ms(80)
+    if boot is not None:
+        boot.mark("camera")
 
-    for _ in range(warmup_pairs):
-        try:
-            sensor.shutdown(False)
-            sensor.snapshot()
-            sensor.shutdown(True)
-            sensor.snapshot()
-        except Exception:
-            pass
-        time.sleep_ms(20)
+    if adaptive:
+
+        def grab_pair():
+            try:
+                return _warmup_pair()
+            except Exception:
+                return None
+
+        n = warmup(
+            grab_pair,
+            warmup_pairs,
+            int(getattr(config, "WARMUP_MIN_PAIRS", 2)),
+            int(getattr(config, "WARMUP_TOL", 3)),
+        )
+    else:
+        n = warmup_pairs
+        for _ in range(warmup_pairs):
+            try:
+                sensor.shutdown(False)
+                sensor.snapshot()
+                sensor.shutdown(True)
+                sensor.snapshot()
+            except Exception:
+                pass
+            time.sleep_ms(20)
+    if boot is not None:
+        boot.mark("warmup")
+        boot.note("warmup_pairs", n)
 
-    print("[CAM] binocular ready")
+    print("[CAM] binocular ready (warmup %d pairs)" % n)
     lcd_msg("CAM OK", 12)
+    return n
 
 
 def capture_left():
@@ -141,12 +216,39 @@ def capture_right():
     return sensor.snapshot()
 
 
+# ---------- telemetry ----------
+# main() 里按 TELEMETRY_MS 创建；None 时所有计时点都是空操作
+_tele = None
+
+
+def _tele_add(stage, t0):
+    # 记一段从 t0（ticks_ms）到现在的耗时，返回现在
+    now = time.ticks_ms()
+    if _tele is not None:
+        _tele.add(stage, time.ticks_diff(now, t0))
+    return now
+
+
+def _tele_count(key, n=1):
+    if _tele is not None:
+        _tele.count(key, n)
+
+
+def _grab(side):
+    # 上传路径的采集（预览不走这里）：返回 (img, snapshot 返回时刻)
+    t0 = time.ticks_ms()
+    img = capture_left() if side == 0 else capture_right()
+    return img, _tele_add("capture", t0)
+
+
 # ---------- WiFi ----------
-def wifi_connect():
+def wifi_connect(boot_delay_ms=None):
     import network
     from fpioa_manager import fm
 
-    time.sleep_ms(int(getattr(config, "WIFI_BOOT_DELAY_MS", 1200)))
+    if boot_delay_ms is None:
+        boot_delay_ms = int(getattr(config, "WIFI_BOOT_DELAY_MS", 1200))
+    time.sleep_ms(boot_delay_ms)
 
     spi_cfg = getattr(config, "ESP32_SPI", {}) or {}
     fpioa = spi_cfg.get("fpioa", spi_cfg)
@@ -241,23 +343,36 @@ def _parse_http_url(url):
     return host, port, path
 
 
-def http_get_raw(url, timeout_s=4):
+def http_get_raw(url, timeout_s=4, headers=None):
     import usocket as socket
 
     host, port, path = _parse_http_url(url)
     addr = socket.getaddrinfo(host, port)[0][-1]
-    s = socket.socket()
-    s.settimeout(timeout_s)
-    s.connect(addr)
-    req = "GET %s HTTP/1.1\r\nHost: %s:%d\r\nConnection: close\r\n\r\n" % (
+    req = "GET %s HTTP/1.1\r\nHost: %s:%d\r\nConnection: close\r\n" % (
         path,
         host,
         port,
     )
-    s.send(req.encode())
-    data = s.recv(96)
-    s.close()
-    return data
+    if headers:
+        for k, v in headers.items():
+            req += "%s: %s\r\n" % (k, v)
+    req += "\r\n"
+    s = socket.socket()
+    try:
+        s.settimeout(timeout_s)
+        s.connect(addr)
+        s.send(req.encode())
+        return s.recv(96)
+    finally:
+        _close_quietly(s)
+
+
+def _close_quietly(s):
+    # ESP32 只有几个 socket：任何出错路径都要还回去
+    try:
+        s.close()
+    except Exception:
+        pass
 
 
 def _to_bytes_maybe(obj):
@@ -282,8 +397,32 @@ def _to_bytes_maybe(obj):
     return None
 
 
-def _jpeg_bytes(img, quality):
-    j = img.compress(quality=quality)
+def _image_view(img):
+    # 零拷贝：bytearray() 直接引用图像内存（to_bytes() 会另外复制一份）
+    try:
+        b = img.bytearray()
+        if isinstance(b, (bytes, bytearray)) and len(b) > 0:
+            return b
+    except Exception:
+        pass
+    return None
+
+
+def _jpeg_bytes(img, quality, zero_copy=False, keep=False):
+    # compress() 是原地压缩：img 之后就成了 JPEG。keep=True（复用的 canvas）时
+    # 用 compressed() 压到新图里，img 保持原始像素；新图不归我们管，不做零拷贝
+    if keep:
+        try:
+            j = img.compressed(quality=quality)
+        except AttributeError:
+            j = img.copy().compress(quality=quality)
+        zero_copy = False
+    else:
+        j = img.compress(quality=quality)
+    if zero_copy:
+        b = _image_view(j)
+        if b and len(b) > 200:
+            return b
     b = _to_bytes_maybe(j)
     if b and len(b) > 200:
         return b
@@ -296,7 +435,11 @@ def _jpeg_bytes(img, quality):
     raise Exception("JPEG encode returned non-bytes Image (cannot extract bytes)")
 
 
-def _rgb565_bytes(img):
+def _raw_bytes(img, zero_copy=False):
+    if zero_copy:
+        b = _image_view(img)
+        if b:
+            return b
     b = _to_bytes_maybe(img)
     if b:
         return b
@@ -306,16 +449,52 @@ def _rgb565_bytes(img):
             return b
     except Exception:
         pass
-    raise Exception("RGB565 image cannot extract bytes")
+    raise Exception("raw image cannot extract bytes")
+
+
+def _encode_payload(img, stream_mode, jpeg_q, copybuf=None, keep=False):
+    """
+    默认零拷贝：返回图像内存本身，由 _send_all 按块切 memoryview 发出。
+    copybuf 非 None（PAYLOAD_SAFE_COPY）时拷进复用缓冲，断开与 framebuffer 的关系。
+    keep=True：img 之后还要复用（STITCH_LR 的 canvas），JPEG 不能原地压缩。
+    """
+    t0 = time.ticks_ms()
+    if stream_mode == "RAW":
+        b = _raw_bytes(img, zero_copy=True)
+    else:
+        b = _jpeg_bytes(img, jpeg_q, zero_copy=True, keep=keep)
+    if copybuf is not None:
+        b = copybuf.load(b)
+    _tele_add("compress", t0)
+    return b
+
+
+def _send_all(s, buf, chunk=2048):
+    # 按固定块发送 memoryview 切片（不复制），处理 send() 只发出一部分的情况
+    mv = memoryview(buf)
+    n = len(mv)
+    off = 0
+    stalls = 0
+    while off < n:
+        k = s.send(mv[off : off + chunk])
+        if k is None:
+            k = min(chunk, n - off)
+        if k <= 0:
+            stalls += 1
+            if stalls > 3:
+                raise OSError("send stalled at %d/%d" % (off, n))
+            time.sleep_ms(10)
+            continue
+        stalls = 0
+        off += k
+    return off
 
 
 def http_post(host, port, path, payload, headers=None, timeout_s=10):
     import usocket as socket
 
+    t0 = time.ticks_ms()
     addr = socket.getaddrinfo(host, port)[0][-1]
-    s = socket.socket()
-    s.settimeout(timeout_s)
-    s.connect(addr)
 
     hdr = ""
     hdr += "POST %s HTTP/1.1\r\n" % path
@@ -327,18 +506,25 @@ def http_post(host, port, path, payload, headers=None, timeout_s=10):
             hdr += "%s: %s\r\n" % (k, v)
     hdr += "\r\n"
 
-    s.send(hdr.encode())
-    s.send(payload)
-
-    resp = b""
-    try:
-        resp = s.recv(96)
-    except Exception:
-        pass
+    chunk = int(getattr(config, "SEND_CHUNK", 2048))
+    s = socket.socket()
     try:
-        s.close()
-    except Exception:
-        pass
+        s.settimeout(timeout_s)
+        s.connect(addr)
+        t0 = _tele_add("connect", t0)
+
+        _send_all(s, hdr.encode(), chunk)
+        _send_all(s, payload, chunk)
+        t0 = _tele_add("send", t0)
+
+        resp = b""
+        try:
+            resp = s.recv(96)
+        except Exception:
+            pass
+        _tele_add("response", t0)
+    finally:
+        _close_quietly(s)
 
     if (b" 200 " in resp) or (b" 201 " in resp):
         return True
@@ -351,7 +537,9 @@ def http_post_with_retry(
     host, port, path, payload, headers=None, timeout_s=10, retry=1
 ):
     last = None
-    for _ in range(int(retry) + 1):
+    for i in range(int(retry) + 1):
+        if i:
+            _tele_count("retries")
         try:
             return http_post(
                 host, port, path, payload, headers=headers, timeout_s=timeout_s
@@ -362,31 +550,441 @@ def http_post_with_retry(
     raise last
 
 
+# ---------- latency tracing ----------
+_device_id = None
+
+
+def device_id():
+    global _device_id
+    if _device_id is None:
+        _device_id = getattr(config, "DEVICE_ID", None)
+        if not _device_id:
+            try:
+                import machine
+
+                _device_id = "".join("%02x" % b for b in machine.unique_id())
+            except Exception:
+                _device_id = "k210"
+    return _device_id
+
+
+def _stamps(tc, te):
+    # 设备 ticks_ms：采集（snapshot 返回）/ 编码完成；服务端用 /ping 估出的偏移换算
+    return {"X-T-Capture": "%d" % tc, "X-T-Encoded": "%d" % te}
+
+
+def _ping_sync(ctx, n=1):
+    """
+    NTP 式时钟同步：每次 ping 带本次发出时刻 X-T0，
+    并带上一次的发出/收到时刻（X-Prev-T0/X-Prev-T3），服务端凑齐四个时间戳。
+    """
+    url = "http://%s:%d/ping" % (ctx["host"], ctx["port"])
+    for _ in range(n):
+        hdr = {"X-Device-Id": device_id()}
+        prev = ctx.get("ping_prev")
+        if prev:
+            hdr["X-Prev-T0"] = "%d" % prev[0]
+            hdr["X-Prev-T3"] = "%d" % prev[1]
+        t0 = time.ticks_ms()
+        hdr["X-T0"] = "%d" % t0
+        try:
+            http_get_raw(url, headers=hdr)
+        except Exception as e:
+            print("[SYNC] ping failed:", e)
+            ctx["ping_prev"] = None
+            continue
+        ctx["ping_prev"] = (t0, time.ticks_ms())
+
+
+# ---------- stereo stitch (STITCH_LR) ----------
+def _raw_row_bytes(w):
+    return w * _raw_format()[1]
+
+
+def _stitch_raw_into(buf, raw, w, h, col):
+    # 行交织：每行 = 左眼一行 + 右眼一行，等价于 (2w x h) 的左右拼接原始图
+    rb = _raw_row_bytes(w)
+    src = memoryview(raw)
+    dst = memoryview(buf)
+    off = col * rb
+    for y in range(h):
+        o = y * 2 * rb + off
+        dst[o : o + rb] = src[y * rb : (y + 1) * rb]
+
+
+def _new_stitch_canvas(w, h):
+    import image
+
+    try:
+        canvas = image.Image(size=(w * 2, h))
+    except Exception:
+        canvas = image.Image(width=w * 2, height=h)
+    if _raw_format()[0] == "GRAY8":
+        # 灰度流：canvas 也用灰度，JPEG 单通道
+        try:
+            canvas = canvas.to_grayscale()
+        except Exception:
+            pass
+    return canvas
+
+
+# ---------- ROI / decimation ----------
+def _stream_geometry(fw, fh):
+    """
+    config.ROI = (x, y, w, h)（全幅像素）或 None；config.DECIMATE = 1/2/4。
+    返回上传帧的几何：裁剪窗口、抽样倍数、上传尺寸。
+    """
+    scale = int(getattr(config, "DECIMATE", 1) or 1)
+    if scale not in (1, 2, 4):
+        scale = 1
+    roi = getattr(config, "ROI", None)
+    if roi:
+        x, y, rw, rh = [int(v) for v in roi]
+        x = max(0, min(x, fw - 1))
+        y = max(0, min(y, fh - 1))
+        rw = max(1, min(rw, fw - x))
+        rh = max(1, min(rh, fh - y))
+    else:
+        x, y, rw, rh = 0, 0, fw, fh
+    # 窗口对齐到抽样倍数，上传尺寸正好整除
+    rw -= rw % scale
+    rh -= rh % scale
+    return {
+        "roi": (x, y, rw, rh),
+        "scale": scale,
+        "full": (fw, fh),
+        "w": rw // scale,
+        "h": rh // scale,
+        "identity": scale == 1 and (x, y, rw, rh) == (0, 0, fw, fh),
+    }
+
+
+def _apply_geometry(img, geo):
+    # 编码之前裁剪 + 缩小，编码时间和空口字节按面积同比下降
+    if geo["identity"]:
+        return img
+    x, y, rw, rh = geo["roi"]
+    if (rw, rh) != geo["full"]:
+        try:
+            img = img.cut(x, y, rw, rh)
+        except Exception:
+            img = img.copy(roi=(x, y, rw, rh))
+    if geo["scale"] > 1:
+        img = img.resize(geo["w"], geo["h"])
+    return img
+
+
+def _make_headers(stream_mode, side, frame_id, geo):
+    if stream_mode == "RAW":
+        hdr = {
+            "Content-Type": "application/octet-stream",
+            "X-Format": _raw_format()[0],
+        }
+    else:
+        hdr = {"Content-Type": "image/jpeg"}
+    hdr["X-Side"] = side
+    hdr["X-Device-Id"] = device_id()
+    hdr["X-Frame-Id"] = "%d%s" % (frame_id, side)
+    hdr["X-W"] = str(geo["w"] * 2 if side == "LR" else geo["w"])
+    hdr["X-H"] = str(geo["h"])
+    if side == "LR":
+        hdr["X-Layout"] = "LR"
+    if not geo["identity"]:
+        # ROI 用全幅坐标（LR 时是每只眼的窗口），服务端据此映射回全幅
+        hdr["X-Roi"] = "%d,%d,%d,%d" % geo["roi"]
+        hdr["X-Scale"] = str(geo["scale"])
+        hdr["X-Full-W"] = str(geo["full"][0])
+        hdr["X-Full-H"] = str(geo["full"][1])
+    return hdr
+
+
+# ---------- tile delta (DELTA=True, RAW only) ----------
+# main() 里开启时设为 {}；每路（L / R / LR）一个编码器，在真正上传的那一刻编码，
+# 流水线丢掉的帧不会打断差分链
+_deltas = None
+
+
+def _delta_for(side, geo):
+    enc = _deltas.get(side)
+    if enc is None:
+        w = geo["w"] * 2 if side == "LR" else geo["w"]
+        enc = _deltas[side] = TileDelta(
+            w,
+            geo["h"],
+            _raw_format()[1],
+            int(getattr(config, "DELTA_TILE", 16)),
+            int(getattr(config, "DELTA_KEY_EVERY", 50)),
+            int(getattr(config, "DELTA_TOL", 0)),
+        )
+    return enc
+
+
+def _upload(
+    host, port, stream_mode, side, payload, frame_id, geo, timeout_s, retry, extra=None
+):
+    path = "/upload_raw/%s" % side if stream_mode == "RAW" else "/upload_jpeg/%s" % side
+    headers = _make_headers(stream_mode, side, frame_id, geo)
+    if extra:
+        headers.update(extra)
+    enc = None
+    if _deltas is not None and stream_mode == "RAW" and "X-Burst-Id" not in headers:
+        t0 = time.ticks_ms()
+        enc = _delta_for(side, geo)
+        payload, dh = enc.encode(payload)
+        headers.update(dh)
+        _tele_add("delta", t0)
+    headers["X-T-Send"] = "%d" % time.ticks_ms()
+    try:
+        ok = http_post_with_retry(
+            host,
+            port,
+            path,
+            payload,
+            headers=headers,
+            timeout_s=timeout_s,
+            retry=retry,
+        )
+    except Exception:
+        _tele_count("fail")
+        if enc is not None:
+            enc.force_key()  # 服务端可能没收到这一帧（或回了 409），下一帧重新对齐
+        raise
+    _tele_count("ok")
+    _tele_count("bytes", len(payload))
+    if _boot is not None:
+        _boot_first_upload()
+    if _tele is not None:
+        _tele.sample_mem()
+    return ok
+
+
+def _show(img, label, lcd_tag=None):
+    try:
+        img.draw_string(2, 2, label, color=0xFFFF, scale=2)
+    except Exception:
+        pass
+    if lcd_ok():
+        lcd.display(img)
+        if lcd_tag:
+            lcd_msg(lcd_tag, 0)
+
+
+def _capture_stitched(stream_mode, geo, jpeg_q, stitch, copybuf=None):
+    """
+    STITCH_LR: 左右合成一张 (2w x h) 图，一次编码、一次连接，服务端保证配对。
+    RAW 用行交织 buffer；JPEG 用预分配 canvas + draw_image。
+    返回 (payload, stamps)，采集时刻取左眼。
+    """
+    w, h = geo["w"], geo["h"]
+
+    # 左眼必须在拍右眼之前拷走：snapshot 复用同一个 framebuffer
+    imgL, tc = _grab(0)
+    _show(imgL, "LEFT", "L")
+    outL = _apply_geometry(imgL, geo)
+    if stream_mode == "RAW":
+        _stitch_raw_into(stitch, _raw_bytes(outL, zero_copy=True), w, h, 0)
+    else:
+        stitch.draw_image(outL, 0, 0)
+
+    imgR, _ = _grab(1)
+    _show(imgR, "RIGHT", "R")
+    outR = _apply_geometry(imgR, geo)
+    if stream_mode == "RAW":
+        _stitch_raw_into(stitch, _raw_bytes(outR, zero_copy=True), w, h, 1)
+    else:
+        stitch.draw_image(outR, w, 0)
+
+    gc.collect()
+    if stream_mode == "RAW":
+        return stitch, _stamps(tc, time.ticks_ms())
+    payload = _encode_payload(stitch, stream_mode, jpeg_q, copybuf, keep=True)
+    return payload, _stamps(tc, time.ticks_ms())
+
+
+def _send_stitched(host, port, stream_mode, frame_id, geo, jpeg_q, stitch, opts):
+    payload, stamps = _capture_stitched(
+        stream_mode, geo, jpeg_q, stitch, opts["copybuf"]
+    )
+    ok = _upload(
+        host,
+        port,
+        stream_mode,
+        "LR",
+        payload,
+        frame_id,
+        geo,
+        opts["timeout_s"],
+        opts["retry"],
+        stamps,
+    )
+    return ok, len(payload)
+
+
+# ---------- pipeline (PIPELINE=True) ----------
+def _produce_pair(pipe, frame_id, stream_mode, geo, jpeg_q, stitch):
+    # 生产端：采集 + 压缩，拷进槽位自己的缓冲；上传由消费端负责
+    slots = pipe.slots
+    slot = slots.claim(frame_id)
+    if slot is None:
+        return False
+    try:
+        if stitch is not None:
+            payload, stamps = _capture_stitched(stream_mode, geo, jpeg_q, stitch)
+            slots.fill(slot, "LR", payload, stamps)
+        else:
+            imgL, tc = _grab(0)
+            _show(imgL, "LEFT", "L")
+            outL = _apply_geometry(imgL, geo)
+            payload = _encode_payload(outL, stream_mode, jpeg_q)
+            slots.fill(slot, "L", payload, _stamps(tc, time.ticks_ms()))
+
+            imgR, tc = _grab(1)
+            _show(imgR, "RIGHT", "R")
+            outR = _apply_geometry(imgR, geo)
+            payload = _encode_payload(outR, stream_mode, jpeg_q)
+            slots.fill(slot, "R", payload, _stamps(tc, time.ticks_ms()))
+    except Exception as e:
+        slots.abandon(slot)
+        print("[ENC] frame=%d failed: %s" % (frame_id, e))
+        return False
+    slots.publish(slot)
+    return True
+
+
+def _make_sender(host, port, stream_mode, geo, opts, post_gap_ms):
+    def send(frame_id, parts):
+        ok_all = True
+        sizes = []
+        for i, (side, view, stamps) in enumerate(parts):
+            if i:
+                time.sleep_ms(post_gap_ms)
+            ok = False
+            try:
+                ok = _upload(
+                    host,
+                    port,
+                    stream_mode,
+                    side,
+                    view,
+                    frame_id,
+                    geo,
+                    opts["timeout_s"],
+                    opts["retry"],
+                    stamps,
+                )
+            except Exception as e:
+                print("[HTTP] %s failed:" % side, e)
+            ok_all = ok_all and ok
+            sizes.append(len(view))
+        print(
+            "[TX] frame=%d ok=%s bytes=%s mode=%s"
+            % (frame_id, ok_all, sizes, stream_mode)
+        )
+        return ok_all
+
+    return send
+
+
+# ---------- boot ----------
+# main() 开始计时，第一帧上传成功时打印报告（并随第一次遥测上报）后置 None
+_boot = None
+
+
+def _boot_first_upload():
+    global _boot
+    b = _boot
+    _boot = None
+    if b is None:
+        return
+    b.mark("first_upload")
+    print(b.format())
+    if _tele is not None:
+        _tele.boot = b.report()
+
+
+def _boot_serial(boot):
+    # 原来的串行启动：固定等待 -> LCD -> 传感器 + 固定次数预热 -> 联网
+    time.sleep_ms(350)
+    boot.mark("settle")
+    if getattr(config, "USE_LCD", True):
+        init_lcd()
+        boot.mark("lcd")
+    init_binocular(boot=boot)
+    nic = None
+    if getattr(config, "WIFI_ENABLE", True):
+        nic = wifi_connect()
+        boot.mark("wifi")
+        lcd_msg("WIFI OK" if nic else "WIFI FAIL", 24)
+    return nic
+
+
+def _boot_fast(boot):
+    """
+    ESP32 上电等待 + 建连放后台线程（SPI1，和 LCD 的 SPI0、摄像头 DVP 互不相干），
+    主线程同时做 LCD、传感器初始化和自适应预热；最后只等联网剩下的那一段。
+    看门狗/软复位时 ESP32 一直有电，跳过 WIFI_BOOT_DELAY_MS。
+    """
+    cause = reset_cause()
+    boot.note("reset", cause)
+    wifi = None
+    if getattr(config, "WIFI_ENABLE", True):
+        delay = int(getattr(config, "WIFI_BOOT_DELAY_MS", 1200))
+        if cause in ("WDT_RESET", "SOFT_RESET"):
+            delay = 0
+        wifi = Background(lambda: wifi_connect(delay)).start()
+        boot.note("wifi_bg", wifi.threaded)
+    boot.mark("wifi_start")
+
+    if getattr(config, "USE_LCD", True):
+        init_lcd(fast=True)
+        boot.mark("lcd")
+    init_binocular(
+        int(getattr(config, "WARMUP_MAX_PAIRS", 10)), adaptive=True, boot=boot
+    )
+
+    nic = None
+    if wifi is not None:
+        spi_cfg = getattr(config, "ESP32_SPI", {}) or {}
+        wifi.join(int(spi_cfg.get("timeout_ms", 20000)) + 5000)
+        boot.side("wifi", wifi.ms)
+        boot.mark("wifi_wait")
+        if wifi.error is not None:
+            print("[WIFI] bring-up failed:", wifi.error)
+        nic = wifi.result
+        lcd_msg("WIFI OK" if nic else "WIFI FAIL", 24)
+    return nic
+
+
 # ---------- main ----------
 def main():
-    time.sleep_ms(350)
+    global _tele, _deltas, _boot
+    boot = _boot = BootTimer()
+    fast_boot = bool(getattr(config, "FAST_BOOT", True))
 
     stream_mode = str(getattr(config, "STREAM_MODE", "RAW")).upper().strip()
     if stream_mode not in ("RAW", "JPEG"):
         stream_mode = "RAW"
+    stitch_lr = bool(getattr(config, "STITCH_LR", False))
 
     fs = _framesize_from_str(getattr(config, "FRAME_SIZE", "QVGA"))
     w, h = _framesize_wh(fs)
+    geo = _stream_geometry(w, h)
+    if not geo["identity"]:
+        print(
+            "[GEO] roi=%s scale=%d -> %dx%d"
+            % (geo["roi"], geo["scale"], geo["w"], geo["h"])
+        )
 
     print(
-        "=== MaixPy Stereo LCD + WiFi Stream (%s %s) ==="
-        % (stream_mode, getattr(config, "FRAME_SIZE", "QVGA"))
+        "=== MaixPy Stereo LCD + WiFi Stream (%s %s%s) ==="
+        % (
+            stream_mode,
+            getattr(config, "FRAME_SIZE", "QVGA"),
+            " LR" if stitch_lr else "",
+        )
     )
 
-    if getattr(config, "USE_LCD", True):
-        init_lcd()
-
-    init_binocular()
-
-    nic = None
-    if getattr(config, "WIFI_ENABLE", True):
-        nic = wifi_connect()
-        lcd_msg("WIFI OK" if nic else "WIFI FAIL", 24)
+    nic = _boot_fast(boot) if fast_boot else _boot_serial(boot)
 
     host = port = base_path = None
     if nic:
@@ -396,12 +994,14 @@ def main():
         if base_path.endswith("/") and base_path != "/":
             base_path = base_path[:-1]
 
-        # 仅用于连通性探测
-        try:
-            resp = http_get_raw("http://%s:%d/ping" % (host, port))
-            print("[PROBE] resp:", resp)
-        except Exception as e:
-            print("[PROBE] failed:", e)
+        if not fast_boot:
+            # 连通性探测（快速启动时由下面第一次同步 ping 兼任）
+            try:
+                resp = http_get_raw("http://%s:%d/ping" % (host, port))
+                print("[PROBE] resp:", resp)
+            except Exception as e:
+                print("[PROBE] failed:", e)
+            boot.mark("probe")
 
     interval_ms = int(getattr(config, "STREAM_INTERVAL_MS", 1200))
     switch_ms = int(getattr(config, "SWITCH_MS", 200))
@@ -412,193 +1012,330 @@ def main():
     # 关键：两次 POST 间隔，缓解 ESP32/EIO（你已经观察到会 EIO）
     post_gap_ms = int(getattr(config, "POST_GAP_MS", 120))
 
-    frame_id = 0
-    last_send = time.ticks_ms()
-
     # 推荐先用这个（JPEG 比 RAW 轻很多）
     post_gap_ms = 80  # 两次 POST 之间给 ESP32 / socket 缓冲
-    switch_ms = int(getattr(config, "SWITCH_MS", 200))
 
-    while True:
-        if not nic or not host:
-            # 仍然允许 LCD 预览
-            imgL = capture_left()
-            try:
-                imgL.draw_string(2, 2, "LEFT", color=0xFFFF, scale=2)
-            except:
-                pass
-            if lcd_ok():
-                lcd.display(imgL)
+    # STITCH_LR 的合成缓冲只分配一次，循环复用
+    stitch = None
+    if stitch_lr and nic:
+        if stream_mode == "RAW":
+            stitch = bytearray(_raw_row_bytes(geo["w"]) * 2 * geo["h"])
+        else:
+            stitch = _new_stitch_canvas(geo["w"], geo["h"])
+    # 默认零拷贝直发；PAYLOAD_SAFE_COPY=True 时拷进一块复用缓冲（不再每帧 new）
+    copybuf = None
+    if getattr(config, "PAYLOAD_SAFE_COPY", False):
+        copybuf = ReuseBuffer(_payload_cap(geo, stream_mode, 2 if stitch_lr else 1))
+    opts = {"timeout_s": timeout_s, "retry": http_retry, "copybuf": copybuf}
+    if getattr(config, "DELTA", False):
+        if stream_mode == "RAW":
+            _deltas = {}
+        else:
+            print("[DELTA] needs STREAM_MODE='RAW', ignored")
+
+    ctx = {
+        "host": host,
+        "port": port,
+        "stream_mode": stream_mode,
+        "geo": geo,
+        "jpeg_q": jpeg_q,
+        "stitch": stitch,
+        "opts": opts,
+        "post_gap_ms": post_gap_ms,
+        "frame_id": 0,
+        "side": 0,
+        "pipe": None,
+        "burst": None,
+        "ping_prev": None,
+    }
+    if nic and host and int(getattr(config, "TELEMETRY_MS", 10000)) > 0:
+        _tele = Telemetry(device_id())
+    if nic and host:
+        # 开机先攒几次往返，服务端才能把设备时间戳换算成延迟；
+        # 快速启动只做一次（兼作连通性探测），其余由 housekeeping 周期补上
+        pings = int(getattr(config, "LATENCY_SYNC_PINGS", 4))
+        _ping_sync(ctx, min(1, pings) if fast_boot else pings)
+        boot.mark("sync")
+
+    burst_pairs = int(getattr(config, "BURST_PAIRS", 0))
+    if nic and host and burst_pairs > 0:
+        # 环形缓冲开机就按单帧大小分配好：内存不够在这里就报，连拍中途不再 gc + 分配
+        gc.collect()
+        ctx["burst"] = BurstRing(burst_pairs, _payload_cap(geo, stream_mode))
+
+    # 双缓冲流水线：有 _thread 时后台线程上传，主循环继续采集 + LCD 预览
+    if nic and host and getattr(config, "PIPELINE", True):
+        pipe = Pipeline(
+            _make_sender(host, port, stream_mode, geo, opts, post_gap_ms),
+            nslots=int(getattr(config, "PIPELINE_SLOTS", 2)),
+            threaded=getattr(config, "PIPELINE_THREAD", True),
+        )
+        pipe.start()
+        ctx["pipe"] = pipe
+        print("[PIPE] started threaded=%s" % pipe.threaded)
+
+    sched = _build_scheduler(ctx, bool(nic and host), interval_ms, switch_ms)
+    boot.mark("setup")
+    if not (nic and host):
+        _boot_first_upload()  # 不联网：启动到此结束
+    sched.run()
 
-            time.sleep_ms(switch_ms)
 
-            imgR = capture_right()
+def _task_preview(ctx):
+    # 每次只拍/显示一只眼，左右交替；不再在两只眼之间 sleep
+    if ctx["side"] == 0:
+        _show(capture_left(), "LEFT")
+    else:
+        _show(capture_right(), "RIGHT")
+    ctx["side"] ^= 1
+
+
+def _task_stream(ctx):
+    pipe = ctx["pipe"]
+    fid = ctx["frame_id"]
+    if pipe is not None:
+        if _produce_pair(
+            pipe, fid, ctx["stream_mode"], ctx["geo"], ctx["jpeg_q"], ctx["stitch"]
+        ):
+            ctx["frame_id"] = fid + 1
+        return
+    _stream_pair_serial(ctx)
+    ctx["frame_id"] = fid + 1
+
+
+def _task_burst(ctx, task=None):
+    ring = ctx["burst"]
+    pipe = ctx["pipe"]
+    if pipe is not None:
+        # 先让流水线把手上的发完，避免两个连接同时挤 ESP32
+        t0 = time.ticks_ms()
+        while pipe.slots.busy() and time.ticks_diff(time.ticks_ms(), t0) < 5000:
+            if pipe.threaded:
+                time.sleep_ms(10)
+            else:
+                pipe.pump()
+
+    stream_mode, geo, jpeg_q = ctx["stream_mode"], ctx["geo"], ctx["jpeg_q"]
+    gc.collect()
+    lcd_msg("BURST", 24)
+
+    # 连拍阶段：不显示、不 sleep、不联网，只 snapshot + 压缩 + 拷进环形缓冲
+    def grab(side):
+        return _grab(side)[0]
+
+    def encode(img):
+        return _encode_payload(_apply_geometry(img, geo), stream_mode, jpeg_q)
+
+    capture_burst(ring, grab, encode, time.ticks_us)
+    print("[BURST] id=%d captured %s" % (ring.burst_id, ring.skew_stats()))
+
+    # 排空阶段：按顺序上传，头里带连拍序号和对内时间差
+    sent = 0
+    for i in range(ring.count):
+        fid = ctx["frame_id"]
+        ctx["frame_id"] = fid + 1
+        extra = {
+            "X-Burst-Id": "%d" % ring.burst_id,
+            "X-Burst-Seq": "%d" % i,
+            "X-Burst-Len": "%d" % ring.count,
+            "X-Skew-Us": "%d" % ring.skew_us(i),
+        }
+        for side, name in ((0, "L"), (1, "R")):
             try:
-                imgR.draw_string(2, 2, "RIGHT", color=0xFFFF, scale=2)
-            except:
-                pass
-            if lcd_ok():
-                lcd.display(imgR)
+                if _upload(
+                    ctx["host"],
+                    ctx["port"],
+                    stream_mode,
+                    name,
+                    ring.views[i][side],
+                    fid,
+                    geo,
+                    ctx["opts"]["timeout_s"],
+                    ctx["opts"]["retry"],
+                    extra,
+                ):
+                    sent += 1
+            except Exception as e:
+                print("[BURST] %d%s failed:" % (fid, name), e)
+            time.sleep_ms(ctx["post_gap_ms"])
+    print("[BURST] id=%d sent %d/%d" % (ring.burst_id, sent, ring.count * 2))
+
+    if task is not None and int(getattr(config, "BURST_EVERY_MS", 0)) <= 0:
+        task.enabled = False  # 只连拍一次
+
+
+def _send_telemetry(ctx, body):
+    try:
+        http_post(
+            ctx["host"],
+            ctx["port"],
+            "/telemetry",
+            body,
+            headers={"Content-Type": "application/json", "X-Device-Id": device_id()},
+            timeout_s=ctx["opts"]["timeout_s"],
+        )
+    except Exception as e:
+        print("[TELE] post failed:", e)
 
-            time.sleep_ms(switch_ms)
-            continue
 
-        now = time.ticks_ms()
-        if time.ticks_diff(now, last_send) < interval_ms:
-            # 仍然做 LCD 预览但不上传
-            imgL = capture_left()
-            try:
-                imgL.draw_string(2, 2, "LEFT", color=0xFFFF, scale=2)
-            except:
-                pass
-            if lcd_ok():
-                lcd.display(imgL)
-            time.sleep_ms(switch_ms)
+def _task_telemetry(ctx):
+    # 取出本窗口的聚合计数；有流水线时交给上传端发，避免两个连接同时挤 ESP32
+    body = _tele.flush()
+    pipe = ctx["pipe"]
+    if pipe is not None:
+        pipe.submit(lambda: _send_telemetry(ctx, body))
+    else:
+        _send_telemetry(ctx, body)
+
+
+def _task_housekeeping(ctx, sched):
+    gc.collect()
+    pipe = ctx["pipe"]
+    if ctx["host"] and (pipe is None or not pipe.slots.busy()):
+        # 周期性补一次同步样本（流水线空闲时，不和上传抢 ESP32）
+        _ping_sync(ctx)
+    print(sched.report())
+    if ctx["pipe"] is not None:
+        print("[PIPE]", ctx["pipe"].stats())
+    if _deltas:
+        print("[DELTA]", dict((k, v.stats) for k, v in _deltas.items()))
+
+
+def _build_scheduler(ctx, streaming, interval_ms, switch_ms):
+    """
+    独立的周期任务（priority 数值越小越优先）：
+      stream  0  STREAM_INTERVAL_MS  采集一对 + 上传（或交给流水线）
+      upload  1  UPLOAD_POLL_MS      协作式流水线：发一个待发槽
+      burst   0  BURST_EVERY_MS      连拍 BURST_PAIRS 对后批量上传（0 = 开机后一次）
+      preview 2  SWITCH_MS           LCD 预览，左右交替
+      tele    8  TELEMETRY_MS        遥测上报（0 = 关）
+      house   9  HOUSEKEEPING_MS     gc + 调度统计
+    """
+    sched = Scheduler(
+        idle_ms=int(getattr(config, "SCHED_IDLE_MS", 50)),
+        on_error=lambda t, e: print("[SCHED] %s error: %s" % (t.name, e)),
+    )
+    if streaming and not (ctx["burst"] and getattr(config, "BURST_ONLY", False)):
+        sched.add("stream", lambda: _task_stream(ctx), interval_ms, priority=0)
+    if streaming and ctx["burst"] is not None:
+        every = int(getattr(config, "BURST_EVERY_MS", 0))
+        bt = sched.add(
+            "burst",
+            lambda: _task_burst(ctx, bt),
+            every if every > 0 else 1000,
+            priority=0,
+            offset_ms=int(getattr(config, "BURST_DELAY_MS", 2000)),
+        )
+        pipe = ctx["pipe"]
+        if pipe is not None and not pipe.threaded:
+            sched.add(
+                "upload",
+                pipe.pump,
+                int(getattr(config, "UPLOAD_POLL_MS", 10)),
+                priority=1,
+            )
+    sched.add("preview", lambda: _task_preview(ctx), switch_ms, priority=2)
+    tele_ms = int(getattr(config, "TELEMETRY_MS", 10000))
+    if streaming and _tele is not None and tele_ms > 0:
+        sched.add(
+            "tele", lambda: _task_telemetry(ctx), tele_ms, priority=8, offset_ms=tele_ms
+        )
+    sched.add(
+        "house",
+        lambda: _task_housekeeping(ctx, sched),
+        int(getattr(config, "HOUSEKEEPING_MS", 10000)),
+        priority=9,
+        offset_ms=int(getattr(config, "HOUSEKEEPING_MS", 10000)),
+    )
+    return sched
 
-            imgR = capture_right()
-            try:
-                imgR.draw_string(2, 2, "RIGHT", color=0xFFFF, scale=2)
-            except:
-                pass
-            if lcd_ok():
-                lcd.display(imgR)
-            time.sleep_ms(switch_ms)
-            continue
 
-        last_send = now
-        okL = okR = False
-        bytesL = bytesR = -1
+def _stream_pair_serial(ctx):
+    # 不用流水线时：采集 -> 编码 -> POST，左右依次（或 STITCH_LR 一次）
+    host, port = ctx["host"], ctx["port"]
+    stream_mode, geo, jpeg_q = ctx["stream_mode"], ctx["geo"], ctx["jpeg_q"]
+    opts = ctx["opts"]
+    frame_id = ctx["frame_id"]
 
-        # ----------------- LEFT: capture -> encode(bytes deep copy) -> POST -----------------
-        imgL = capture_left()
+    if ctx["stitch"] is not None:
+        okLR = False
+        bytesLR = -1
         try:
-            imgL.draw_string(2, 2, "LEFT", color=0xFFFF, scale=2)
-        except Exception:
-            pass
-        if lcd_ok():
-            lcd.display(imgL)
-            lcd_msg("L", 0)
+            okLR, bytesLR = _send_stitched(
+                host, port, stream_mode, frame_id, geo, jpeg_q, ctx["stitch"], opts
+            )
+        except Exception as e:
+            print("[HTTP/ENC] LR failed:", e)
 
-        try:
-            gc.collect()
-            if stream_mode == "RAW":
-                payloadL = _rgb565_bytes(imgL)
-            else:
-                payloadL = _jpeg_bytes(imgL, jpeg_q)
-
-            # ✅ 关键：强制深拷贝，彻底断开与底层 buffer 的关系
-            payloadL = bytearray(payloadL)
-            bytesL = len(payloadL)
-
-            if stream_mode == "RAW":
-                hdrL = {
-                    "Content-Type": "application/octet-stream",
-                    "X-W": str(w),
-                    "X-H": str(h),
-                    "X-Format": "RGB565",
-                    "X-Side": "L",
-                    "X-Frame-Id": "%dL" % frame_id,
-                }
-                okL = http_post_with_retry(
-                    host,
-                    port,
-                    "/upload_raw/L",
-                    payloadL,
-                    headers=hdrL,
-                    timeout_s=timeout_s,
-                    retry=http_retry,
-                )
-            else:
-                hdrL = {
-                    "Content-Type": "image/jpeg",
-                    "X-Side": "L",
-                    "X-Frame-Id": "%dL" % frame_id,
-                    "X-W": str(w),
-                    "X-H": str(h),
-                }
-                okL = http_post_with_retry(
-                    host,
-                    port,
-                    "/upload_jpeg/L",
-                    payloadL,
-                    headers=hdrL,
-                    timeout_s=timeout_s,
-                    retry=http_retry,
-                )
+        print(
+            "[TX] frame=%d okLR=%s bytesLR=%d mode=%s"
+            % (frame_id + 1, okLR, bytesLR, stream_mode)
+        )
+        return
 
-        except Exception as e:
-            print("[HTTP/ENC] L failed:", e)
+    okL = okR = False
+    bytesL = bytesR = -1
 
-        time.sleep_ms(post_gap_ms)
+    # ----------------- LEFT: capture -> encode(zero-copy view) -> POST -----------------
+    imgL, tcL = _grab(0)
+    _show(imgL, "LEFT", "L")
 
-        # ----------------- RIGHT: capture -> encode(bytes deep copy) -> POST -----------------
-        imgR = capture_right()
-        try:
-            imgR.draw_string(2, 2, "RIGHT", color=0xFFFF, scale=2)
-        except Exception:
-            pass
-        if lcd_ok():
-            lcd.display(imgR)
-            lcd_msg("R", 0)
+    try:
+        gc.collect()
+        outL = _apply_geometry(imgL, geo)
+        payloadL = _encode_payload(outL, stream_mode, jpeg_q, opts["copybuf"])
+        stampsL = _stamps(tcL, time.ticks_ms())
+        bytesL = len(payloadL)
+
+        okL = _upload(
+            host,
+            port,
+            stream_mode,
+            "L",
+            payloadL,
+            frame_id,
+            geo,
+            opts["timeout_s"],
+            opts["retry"],
+            stampsL,
+        )
 
-        try:
-            gc.collect()
-            if stream_mode == "RAW":
-                payloadR = _rgb565_bytes(imgR)
-            else:
-                payloadR = _jpeg_bytes(imgR, jpeg_q)
-
-            # ✅ 同样深拷贝
-            payloadR = bytearray(payloadR)
-            bytesR = len(payloadR)
-
-            if stream_mode == "RAW":
-                hdrR = {
-                    "Content-Type": "application/octet-stream",
-                    "X-W": str(w),
-                    "X-H": str(h),
-                    "X-Format": "RGB565",
-                    "X-Side": "R",
-                    "X-Frame-Id": "%dR" % frame_id,
-                }
-                okR = http_post_with_retry(
-                    host,
-                    port,
-                    "/upload_raw/R",
-                    payloadR,
-                    headers=hdrR,
-                    timeout_s=timeout_s,
-                    retry=http_retry,
-                )
-            else:
-                hdrR = {
-                    "Content-Type": "image/jpeg",
-                    "X-Side": "R",
-                    "X-Frame-Id": "%dR" % frame_id,
-                    "X-W": str(w),
-                    "X-H": str(h),
-                }
-                okR = http_post_with_retry(
-                    host,
-                    port,
-                    "/upload_jpeg/R",
-                    payloadR,
-                    headers=hdrR,
-                    timeout_s=timeout_s,
-                    retry=http_retry,
-                )
+    except Exception as e:
+        print("[HTTP/ENC] L failed:", e)
 
-        except Exception as e:
-            print("[HTTP/ENC] R failed:", e)
+    time.sleep_ms(ctx["post_gap_ms"])
 
-        frame_id += 1
-        print(
-            "[TX] frame=%d okL=%s okR=%s bytesL=%d bytesR=%d mode=%s"
-            % (frame_id, okL, okR, bytesL, bytesR, stream_mode)
+    # ----------------- RIGHT: capture -> encode(zero-copy view) -> POST -----------------
+    imgR, tcR = _grab(1)
+    _show(imgR, "RIGHT", "R")
+
+    try:
+        gc.collect()
+        outR = _apply_geometry(imgR, geo)
+        payloadR = _encode_payload(outR, stream_mode, jpeg_q, opts["copybuf"])
+        stampsR = _stamps(tcR, time.ticks_ms())
+        bytesR = len(payloadR)
+
+        okR = _upload(
+            host,
+            port,
+            stream_mode,
+            "R",
+            payloadR,
+            frame_id,
+            geo,
+            opts["timeout_s"],
+            opts["retry"],
+            stampsR,
         )
 
-        # 给 LCD 一点点喘息，否则网络阻塞会“看起来像 freeze”
-        time.sleep_ms(switch_ms)
+    except Exception as e:
+        print("[HTTP/ENC] R failed:", e)
+
+    print(
+        "[TX] frame=%d okL=%s okR=%s bytesL=%d bytesR=%d mode=%s"
+        % (frame_id + 1, okL, okR, bytesL, bytesR, stream_mode)
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,221 @@
+# k210/stereo_lcd_wifi/pipeline.py
+# 采集/上传双缓冲流水线：上一对在上传时，下一对已经在采集+压缩
+import gc
+import time
+
+try:
+    import _thread
+except ImportError:
+    _thread = None
+
+FREE = 0
+FILLING = 1
+READY = 2
+SENDING = 3
+
+
+class _NoLock:
+    def acquire(self, *args):
+        return True
+
+    def release(self):
+        pass
+
+
+def _new_lock(threaded):
+    if threaded and _thread is not None:
+        return _thread.allocate_lock()
+    return _NoLock()
+
+
+class ReuseBuffer:
+    """
+    复用缓冲：预分配一次，每帧只做一次 memcpy，
+    不够大时才扩容（留 1/8 余量），避免每帧 bytearray(payload) 撑高堆峰值。
+    """
+
+    def __init__(self, cap=0):
+        self.buf = bytearray(cap) if cap > 0 else None
+        self.grows = 0
+
+    def load(self, src):
+        n = len(src)
+        if self.buf is None or len(self.buf) < n:
+            self.buf = None
+            gc.collect()
+            self.buf = bytearray(n + n // 8)
+            self.grows += 1
+        mv = memoryview(self.buf)
+        mv[:n] = src
+        return mv[:n]
+
+
+class Slot:
+    def __init__(self, nparts, cap=0):
+        self.state = FREE
+        self.seq = 0
+        self.frame_id = -1
+        self.bufs = [ReuseBuffer(cap) for _ in range(nparts)]
+        self.parts = []  # [(side, memoryview, stamps)]
+
+
+class FrameSlots:
+    """
+    帧槽位：生产者（采集+压缩）填一个槽，消费者（上传）发另一个。
+    生产者从不阻塞：没有空槽时覆盖最旧的待发槽（drop-oldest，计入 dropped）。
+    每个槽自带复用缓冲，snapshot 的 framebuffer 被下一帧覆盖也不影响发送。
+    """
+
+    def __init__(self, nslots=2, nparts=2, lock=None, cap=0):
+        self.slots = [Slot(nparts, cap) for _ in range(nslots)]
+        self.lock = lock or _NoLock()
+        self.seq = 0
+        self.published = 0
+        self.dropped = 0
+
+    def claim(self, frame_id):
+        self.lock.acquire()
+        try:
+            pick = None
+            for s in self.slots:
+                if s.state == FREE:
+                    pick = s
+                    break
+            if pick is None:
+                for s in self.slots:
+                    if s.state == READY and (pick is None or s.seq < pick.seq):
+                        pick = s
+                if pick is not None:
+                    self.dropped += 1
+            if pick is None:
+                return None
+            pick.state = FILLING
+            pick.frame_id = frame_id
+            pick.parts = []
+            return pick
+        finally:
+            self.lock.release()
+
+    def fill(self, slot, side, payload, stamps=None):
+        # 槽处于 FILLING，消费者不会碰它，拷贝不用持锁
+        i = len(slot.parts)
+        if i >= len(slot.bufs):
+            slot.bufs.append(ReuseBuffer())
+        slot.parts.append((side, slot.bufs[i].load(payload), stamps))
+
+    def publish(self, slot):
+        self.lock.acquire()
+        try:
+            self.seq += 1
+            slot.seq = self.seq
+            slot.state = READY
+            self.published += 1
+        finally:
+            self.lock.release()
+
+    def abandon(self, slot):
+        self.release(slot)
+
+    def take(self):
+        self.lock.acquire()
+        try:
+            pick = None
+            for s in self.slots:
+                if s.state == READY and (pick is None or s.seq < pick.seq):
+                    pick = s
+            if pick is not None:
+                pick.state = SENDING
+            return pick
+        finally:
+            self.lock.release()
+
+    def release(self, slot):
+        self.lock.acquire()
+        try:
+            slot.state = FREE
+            slot.parts = []
+        finally:
+            self.lock.release()
+
+    def busy(self):
+        # 还有待发或正在发送的槽
+        for s in self.slots:
+            if s.state in (READY, SENDING):
+                return True
+        return False
+
+    def pending(self):
+        n = 0
+        for s in self.slots:
+            if s.state == READY:
+                n += 1
+        return n
+
+
+class Pipeline:
+    """
+    send_fn(frame_id, parts) -> bool 在消费端执行。
+    有 _thread 时消费者跑在后台线程；否则由主循环在采集间隙调用 pump()（协作式）。
+    """
+
+    def __init__(self, send_fn, nslots=2, threaded=True, idle_ms=5, cap=0):
+        self.threaded = bool(threaded) and _thread is not None
+        self.slots = FrameSlots(nslots, 2, _new_lock(self.threaded), cap)
+        self.send_fn = send_fn
+        self.idle_ms = idle_ms
+        self.sent = 0
+        self.failed = 0
+        self.running = False
+        self.jobs = []
+
+    def start(self):
+        if self.threaded and not self.running:
+            self.running = True
+            _thread.start_new_thread(self._worker, ())
+
+    def stop(self):
+        self.running = False
+
+    def submit(self, fn, limit=4):
+        # 其它联网小任务（遥测上报等）排给消费端顺序执行，不和上传并发用 ESP32
+        if len(self.jobs) >= limit:
+            self.jobs.pop(0)
+        self.jobs.append(fn)
+
+    def pump(self):
+        if self.jobs:
+            fn = self.jobs.pop(0)
+            try:
+                fn()
+            except Exception as e:
+                print("[PIPE] job failed:", e)
+            return True
+        slot = self.slots.take()
+        if slot is None:
+            return False
+        try:
+            if self.send_fn(slot.frame_id, slot.parts):
+                self.sent += 1
+            else:
+                self.failed += 1
+        except Exception as e:
+            self.failed += 1
+            print("[PIPE] send failed:", e)
+        finally:
+            self.slots.release(slot)
+        return True
+
+    def _worker(self):
+        while self.running:
+            if not self.pump():
+                time.sleep_ms(self.idle_ms)
+
+    def stats(self):
+        return {
+            "threaded": self.threaded,
+            "published": self.slots.published,
+            "dropped": self.slots.dropped,
+            "pending": self.slots.pending(),
+            "sent": self.sent,
+            "failed": self.failed,
+        }
@@ -0,0 +1,86 @@
+# k210/stereo_lcd_wifi/telemetry.py
+# 设备端遥测：每帧各阶段耗时聚合成紧凑计数器，定期 POST 到服务端 /telemetry
+import gc
+import time
+
+try:
+    import ujson as json
+except ImportError:
+    import json
+
+_ticks_ms = getattr(time, "ticks_ms", lambda: int(time.time() * 1000))
+_ticks_diff = getattr(time, "ticks_diff", lambda a, b: a - b)
+
+# capture: snapshot   compress: 几何变换 + 编码   connect: DNS + TCP 建连
+# send: 头 + payload 写 socket   response: 等服务端状态行
+STAGES = ("capture", "compress", "connect", "send", "response")
+
+
+class Telemetry:
+    """
+    每个阶段只保留 [次数, 总和, 最大值]（ms），上报后清零；
+    不存逐帧样本，内存占用固定。上传线程和主循环都会写，
+    单次自增在 MicroPython 的 GIL 下足够，不加锁。
+    """
+
+    def __init__(self, device_id):
+        self.device_id = device_id
+        self.seq = 0
+        self.boot = (
+            None  # 启动报告（fastboot.BootTimer.report()），只随下一次上报发一次
+        )
+        self.reset()
+
+    def reset(self):
+        self.t0 = _ticks_ms()
+        self.stages = {}
+        self.counts = {"ok": 0, "fail": 0, "retries": 0, "bytes": 0}
+        self.mem_min = -1
+
+    def add(self, stage, ms):
+        s = self.stages.get(stage)
+        if s is None:
+            s = self.stages[stage] = [0, 0, 0]
+        s[0] += 1
+        s[1] += ms
+        if ms > s[2]:
+            s[2] = ms
+
+    def count(self, key, n=1):
+        self.counts[key] = self.counts.get(key, 0) + n
+
+    def sample_mem(self):
+        try:
+            free = gc.mem_free()
+        except AttributeError:
+            return -1
+        if self.mem_min < 0 or free < self.mem_min:
+            self.mem_min = free
+        return free
+
+    def report(self):
+        # 紧凑格式：stages 里每项是 [n, avg, max]
+        st = {}
+        for k, (n, total, mx) in self.stages.items():
+            st[k] = [n, total // n if n else 0, mx]
+        free = self.sample_mem()
+        self.seq += 1
+        out = {
+            "dev": self.device_id,
+            "seq": self.seq,
+            "uptime_ms": _ticks_ms(),
+            "win_ms": _ticks_diff(_ticks_ms(), self.t0),
+            "counts": dict(self.counts),
+            "stages": st,
+            "mem": [free, self.mem_min],
+        }
+        if self.boot is not None:
+            out["boot"] = self.boot
+            self.boot = None
+        return out
+
+    def flush(self):
+        # 取出本窗口的报告并清零；返回 JSON 字节
+        body = json.dumps(self.report())
+        self.reset()
+        return body.encode() if isinstance(body, str) else body
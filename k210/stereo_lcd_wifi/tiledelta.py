@@ -0,0 +1,154 @@
+# k210/stereo_lcd_wifi/tiledelta.py
+# RAW 差分上传：按 TILE x TILE 块比较本帧和上一帧的校验和，只发变化的块。
+#
+#   关键帧（X-Delta: key）：body = 整帧原始像素（和普通 RAW 上传一样）
+#   差分帧（X-Delta: delta）：body = 块位图 + 变化的块
+#     位图：ceil(ntiles / 8) 字节，块按行优先编号，第 i 块 = byte[i >> 3] 的 bit (i & 7)
+#     块：每块固定 TILE 行 x TILE*bpp 字节；右/下边缘不满一块的部分是填充，服务端丢弃
+#   X-Delta-Seq 每帧 +1，X-Delta-Base = 差分所基于的那一帧；服务端的基准帧对不上时回 409，
+#   上传失败（含 409）后下一帧强制发关键帧。
+try:
+    from ubinascii import crc32
+except ImportError:
+    try:
+        from binascii import crc32
+    except ImportError:
+        crc32 = None
+
+
+def _sum_bytes(mv, acc):
+    return acc + sum(mv)
+
+
+class TileDelta:
+    """
+    w/h/bpp 描述一帧原始像素（STITCH_LR 时是拼好的 2w x h）。
+    tol = 0：块校验和用 crc32（完全相同才算没变）；
+    tol > 0：块内字节和，变化不超过 tol 视为没变（抗传感器噪声，粗但便宜）。
+    每块只记一个 32 位数（服务端当前基准帧的校验和），不保留上一帧像素。
+    """
+
+    def __init__(self, w, h, bpp, tile=16, key_every=50, tol=0):
+        self.w = w
+        self.h = h
+        self.bpp = bpp
+        self.tile = tile
+        self.key_every = key_every
+        self.tol = tol
+        self.ntx = (w + tile - 1) // tile
+        self.nty = (h + tile - 1) // tile
+        self.ntiles = self.ntx * self.nty
+        self.nbitmap = (self.ntiles + 7) // 8
+        self.tile_bytes = tile * tile * bpp
+        self.frame_bytes = w * h * bpp
+        self.prev = None
+        self.cur = [0] * self.ntiles
+        self.buf = None
+        self.seq = 0
+        self.since_key = 0
+        self.need_key = True
+        self.stats = {"key": 0, "delta": 0, "tiles": 0, "bytes": 0}
+        if tol > 0 or crc32 is None:
+            self._fold = _sum_bytes
+        else:
+            self._fold = crc32
+
+    def force_key(self):
+        self.need_key = True
+
+    def _checksums(self, mv):
+        # 逐行：每个块列把这一行的一段折进该块的校验和
+        t, ntx, bpp = self.tile, self.ntx, self.bpp
+        rb = self.w * bpp
+        seg = t * bpp
+        fold = self._fold
+        cur = self.cur
+        for i in range(self.ntiles):
+            cur[i] = 0
+        for y in range(self.h):
+            row = y * rb
+            base = (y // t) * ntx
+            for tx in range(ntx):
+                o = row + tx * seg
+                e = o + seg
+                if e > row + rb:
+                    e = row + rb
+                cur[base + tx] = fold(mv[o:e], cur[base + tx])
+        return cur
+
+    def _changed(self, i):
+        if self.tol > 0:
+            d = self.cur[i] - self.prev[i]
+            return d > self.tol or d < -self.tol
+        return self.cur[i] != self.prev[i]
+
+    def _pack(self, mv, changed):
+        # 位图 + 按编号顺序的变化块；边缘块只拷有效部分
+        t, ntx, bpp = self.tile, self.ntx, self.bpp
+        rb = self.w * bpp
+        seg = t * bpp
+        need = self.nbitmap + len(changed) * self.tile_bytes
+        if self.buf is None:
+            self.buf = bytearray(self.nbitmap + self.ntiles * self.tile_bytes)
+        out = memoryview(self.buf)
+        for i in range(self.nbitmap):
+            out[i] = 0
+        off = self.nbitmap
+        for i in changed:
+            out[i >> 3] |= 1 << (i & 7)
+            ty, tx = divmod(i, ntx)
+            x0 = tx * seg
+            n = min(seg, rb - x0)
+            for r in range(t):
+                y = ty * t + r
+                if y < self.h:
+                    s = y * rb + x0
+                    out[off : off + n] = mv[s : s + n]
+                off += seg
+        return out[:need]
+
+    def encode(self, raw):
+        """
+        raw -> (body, headers)。body 可能是 raw 本身（关键帧）或内部缓冲的 view，
+        下次 encode 前有效。
+        """
+        mv = memoryview(raw)
+        if len(mv) != self.frame_bytes:
+            raise ValueError("frame size %d != %d" % (len(mv), self.frame_bytes))
+        cur = self._checksums(mv)
+        base = self.seq
+        self.seq += 1
+        key = self.need_key or self.prev is None
+        if not key and self.key_every > 0 and self.since_key >= self.key_every:
+            key = True
+        body = None
+        if not key:
+            changed = [i for i in range(self.ntiles) if self._changed(i)]
+            # 变化的块多到不比整帧省时，直接发关键帧
+            if self.nbitmap + len(changed) * self.tile_bytes >= self.frame_bytes:
+                key = True
+            else:
+                body = self._pack(mv, changed)
+        # 基准 = 服务端手上那一帧的校验和：关键帧整组换掉（cur/prev 交换，不分配），
+        # 差分帧只更新发出去的块——tol 模式下缓慢漂移也会累计到超过阈值再发
+        if key:
+            self.cur = self.prev if self.prev is not None else [0] * self.ntiles
+            self.prev = cur
+        else:
+            for i in changed:
+                self.prev[i] = cur[i]
+        hdr = {"X-Delta-Seq": "%d" % self.seq, "X-Tile": "%d" % self.tile}
+        if key:
+            self.need_key = False
+            self.since_key = 0
+            self.stats["key"] += 1
+            self.stats["bytes"] += len(mv)
+            hdr["X-Delta"] = "key"
+            return mv, hdr
+        self.since_key += 1
+        self.stats["delta"] += 1
+        self.stats["tiles"] += len(changed)
+        self.stats["bytes"] += len(body)
+        hdr["X-Delta"] = "delta"
+        hdr["X-Delta-Base"] = "%d" % base
+        return body, hdr
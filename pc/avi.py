@@ -0,0 +1,337 @@
+# pc/avi.py
+# 已存的 JPEG 帧直接封装成 MJPEG AVI（不解码、不重编码），边生成边输出，内存占用与帧数无关。
+#
+#   python avi.py -o left.avi --side L
+#   python avi.py -o stereo.avi --side stereo --since 2026-01-21T10:00:00 --until 2026-01-21T10:05:00
+#
+# stereo：两路视频流（00dc = 左，01dc = 右）逐对交织在同一个 AVI 里；
+# 拼成一张左右并排的画面必须重编码，这里不做。
+from array import array
+from pathlib import Path
+import argparse
+import os
+import struct
+import sys
+
+import frameindex
+import jpegmeta
+
+AVIF_HASINDEX = 0x10
+AVIF_ISINTERLEAVED = 0x100
+AVIIF_KEYFRAME = 0x10
+READ_CHUNK = 1 << 16
+MAX_RIFF = 0xFFFFFFFF  # AVI 1.0 单个 RIFF 上限（约 4 GB）
+
+_STRL_SIZE = 4 + (8 + 56) + (8 + 40)
+
+
+class Plan:
+    """
+    第一遍只 stat：每块 JPEG 的大小存进 array('I')（4 字节/帧），
+    容器里所有长度字段和 idx1 都能预先算出，于是可以从头到尾顺序输出
+    （HTTP 也能给 Content-Length）。第二遍输出时重新遍历 index 拿路径，
+    不在内存里留整段序列的文件列表。
+    groups_fn() -> 可迭代的 (rec,) / (recL, recR)，两次调用必须给出相同的前缀
+    （index.jsonl 只追加，满足这一点）。
+    """
+
+    def __init__(self, frames_dir, groups_fn, nstreams, fps=None, limit=None):
+        self.frames_dir = Path(frames_dir)
+        self.groups_fn = groups_fn
+        self.nstreams = nstreams
+        self.sizes = array("I")
+        self.keep = bytearray()  # 每个候选行一个字节：1 = 输出（文件都在）
+        self.first = None
+        self.max_chunk = 0
+        t0 = t1 = None
+        payload = 0
+        for group in groups_fn():
+            if limit and self.frames >= limit:
+                break
+            row = []
+            for rec in group:
+                try:
+                    row.append((self.frames_dir / rec["file"]).stat().st_size)
+                except OSError:
+                    break  # 文件已删：整行丢掉，保持左右成对
+            ok = len(row) == len(group)
+            self.keep.append(1 if ok else 0)
+            if not ok:
+                continue
+            self.sizes.extend(row)
+            payload += sum(8 + n + (n & 1) for n in row)
+            self.max_chunk = max(self.max_chunk, max(row))
+            if self.first is None:
+                self.first = group[0]
+            t = group[0].get("t")
+            if t is not None:
+                t0 = t if t0 is None else min(t0, t)
+                t1 = t if t1 is None else max(t1, t)
+        if not self.sizes:
+            raise LookupError("no frames in range")
+
+        if not fps:
+            frames = self.frames
+            fps = (frames - 1) / (t1 - t0) if t0 is not None and t1 > t0 else 10.0
+        self.fps = float(fps)
+        w, h = self.first.get("w"), self.first.get("h")
+        if not w or not h:
+            w, h = _jpeg_size(self.frames_dir / self.first["file"])
+        self.width, self.height = int(w), int(h)
+
+        self.movi_size = 4 + payload
+        self.nchunks = len(self.sizes)
+        self.hdrl_size = 4 + (8 + 56) + nstreams * (8 + _STRL_SIZE)
+        self.riff_size = (
+            4 + (8 + self.hdrl_size) + (8 + self.movi_size) + (8 + 16 * self.nchunks)
+        )
+        if self.riff_size > MAX_RIFF:
+            raise ValueError(
+                f"sequence too large for a single AVI ({self.riff_size} bytes); "
+                "narrow the time range"
+            )
+
+    @property
+    def total_size(self) -> int:
+        return 8 + self.riff_size
+
+    @property
+    def frames(self) -> int:
+        return len(self.sizes) // self.nstreams
+
+    def rows(self):
+        # 第二遍：按第一遍的保留标记重新走 index，大小用第一遍记下的
+        k = 0
+        n = len(self.keep)
+        for i, group in enumerate(self.groups_fn()):
+            if i >= n:
+                break
+            if not self.keep[i]:
+                continue
+            row = []
+            for rec in group:
+                row.append((self.frames_dir / rec["file"], self.sizes[k]))
+                k += 1
+            yield row
+
+
+def _chunk_id(stream: int) -> bytes:
+    return b"%02ddc" % stream
+
+
+def _header(plan: Plan) -> bytes:
+    usec = int(round(1e6 / plan.fps)) if plan.fps > 0 else 0
+    max_chunk = plan.max_chunk
+    flags = AVIF_HASINDEX | (AVIF_ISINTERLEAVED if plan.nstreams > 1 else 0)
+    avih = struct.pack(
+        "<14I",
+        usec,
+        int(max_chunk * plan.nstreams * plan.fps),
+        0,
+        flags,
+        plan.frames,
+        0,
+        plan.nstreams,
+        max_chunk,
+        plan.width,
+        plan.height,
+        0,
+        0,
+        0,
+        0,
+    )
+    out = [
+        b"RIFF",
+        struct.pack("<I", plan.riff_size),
+        b"AVI ",
+        b"LIST",
+        struct.pack("<I", plan.hdrl_size),
+        b"hdrl",
+        b"avih",
+        struct.pack("<I", len(avih)),
+        avih,
+    ]
+    for _ in range(plan.nstreams):
+        strh = struct.pack(
+            "<4s4sIHHIIIIIIII4h",
+            b"vids",
+            b"MJPG",
+            0,
+            0,
+            0,
+            0,
+            1000,
+            int(round(plan.fps * 1000)),
+            0,
+            plan.frames,
+            max_chunk,
+            0xFFFFFFFF,
+            0,
+            0,
+            0,
+            plan.width,
+            plan.height,
+        )
+        strf = struct.pack(
+            "<IiiHH4sIiiII",
+            40,
+            plan.width,
+            plan.height,
+            1,
+            24,
+            b"MJPG",
+            plan.width * plan.height * 3,
+            0,
+            0,
+            0,
+            0,
+        )
+        out += [
+            b"LIST",
+            struct.pack("<I", _STRL_SIZE),
+            b"strl",
+            b"strh",
+            struct.pack("<I", len(strh)),
+            strh,
+            b"strf",
+            struct.pack("<I", len(strf)),
+            strf,
+        ]
+    out += [b"LIST", struct.pack("<I", plan.movi_size), b"movi"]
+    return b"".join(out)
+
+
+def _read_exact(path: Path, size: int):
+    # 按 stat 时的大小输出：文件中途变了也不破坏容器（截断 / 补零）
+    left = size
+    try:
+        with open(path, "rb") as f:
+            while left > 0:
+                b = f.read(min(READ_CHUNK, left))
+                if not b:
+                    break
+                left -= len(b)
+                yield b
+    except OSError:
+        pass
+    if left > 0:
+        yield bytes(left)
+
+
+def _index(plan: Plan):
+    # idx1：偏移从 'movi' 四字符码算起
+    yield b"idx1" + struct.pack("<I", 16 * plan.nchunks)
+    off = 4
+    buf = []
+    for i, size in enumerate(plan.sizes):
+        buf.append(
+            struct.pack(
+                "<4sIII", _chunk_id(i % plan.nstreams), AVIIF_KEYFRAME, off, size
+            )
+        )
+        off += 8 + size + (size & 1)
+        if len(buf) >= 4096:
+            yield b"".join(buf)
+            buf = []
+    if buf:
+        yield b"".join(buf)
+
+
+def stream_avi(plan: Plan):
+    """逐块产出整个 AVI；除大小表外同一时刻只持有一个 READ_CHUNK 或一批索引项。"""
+    yield _header(plan)
+    for row in plan.rows():
+        for stream, (path, size) in enumerate(row):
+            yield _chunk_id(stream) + struct.pack("<I", size)
+            yield from _read_exact(path, size)
+            if size & 1:
+                yield b"\0"
+    yield from _index(plan)
+
+
+def _jpeg_size(path: Path):
+    jinfo = jpegmeta.scan_file(path)  # 只读头
+    return jinfo["w"], jinfo["h"]
+
+
+def _jpeg_only(groups):
+    # 原始像素归档（.raw）不能直接进 MJPEG 流
+    return (g for g in groups if all(r["file"].endswith(".jpg") for r in g))
+
+
+def plan_export(
+    frames_dir, side="L", since=None, until=None, fps=None, limit=None, dev=None
+):
+    """
+    side: "L" / "R" / "stereo"。since/until: frameindex.parse_time 能认的时间。
+    fps 缺省按 index 时间戳估算（算不出来用 10）。
+    dev: 只导出这台设备的帧；不给时范围内有多台设备则 ValueError（见 pick_device）。
+    """
+    frames_dir = Path(frames_dir)
+    since, until = frameindex.parse_time(since), frameindex.parse_time(until)
+    dev = frameindex.pick_device(frames_dir, dev, since, until)
+    if side == "stereo":
+        return Plan(
+            frames_dir,
+            lambda: _jpeg_only(frameindex.pairs(frames_dir, since, until, dev)),
+            2,
+            fps,
+            limit,
+        )
+    if side in ("L", "R"):
+        return Plan(
+            frames_dir,
+            lambda: _jpeg_only(
+                (r,) for r in frameindex.records(frames_dir, side, since, until, dev)
+            ),
+            1,
+            fps,
+            limit,
+        )
+    raise ValueError(f"bad side: {side}")
+
+
+def main():
+    ap = argparse.ArgumentParser(
+        description="Wrap stored JPEG frames into an MJPEG AVI"
+    )
+    ap.add_argument("-o", "--out", required=True, help="output .avi ('-' = stdout)")
+    ap.add_argument(
+        "--frames-dir", default=str(Path(__file__).resolve().parent / "frames")
+    )
+    ap.add_argument("--side", default="L", choices=("L", "R", "stereo"))
+    ap.add_argument("--since", help="unix seconds or ISO time")
+    ap.add_argument("--until", help="unix seconds or ISO time")
+    ap.add_argument("--fps", type=float)
+    ap.add_argument("--limit", type=int)
+    ap.add_argument("--dev", help="device id (required when several rigs uploaded)")
+    args = ap.parse_args()
+
+    try:
+        plan = plan_export(
+            args.frames_dir,
+            args.side,
+            args.since,
+            args.until,
+            args.fps,
+            args.limit,
+            args.dev,
+        )
+    except (LookupError, ValueError) as e:
+        sys.exit(f"[AVI] {e}")
+
+    out = sys.stdout.buffer if args.out == "-" else open(args.out + ".tmp", "wb")
+    with out:
+        for b in stream_avi(plan):
+            out.write(b)
+    if args.out != "-":
+        os.replace(args.out + ".tmp", args.out)
+    print(
+        f"[AVI] {plan.frames} frames x{plan.nstreams} {plan.width}x{plan.height} "
+        f"@ {plan.fps:.2f} fps -> {args.out} ({plan.total_size} bytes)",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
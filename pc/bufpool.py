@@ -0,0 +1,80 @@
+# pc/bufpool.py
+# 按 key（(w, h, 格式) 及其派生的数组形状）复用的大块缓冲：接收 body 的 bytearray、
+# RGB565 换算输出的数组。持续上传时内存占用稳定在一个平台，不再每帧分配/释放几 MB。
+from collections import OrderedDict
+import sys
+import threading
+
+# 在空闲/借出列表里、且别处没人引用时 sys.getrefcount 的值（列表一份 + 参数一份）
+_IDLE_REFS = 2
+
+
+class BufferPool:
+    """
+    take(key, make) 取一块（没有可用的就 make() 新建），用完 give(key, buf) 归还。
+
+    归还不等于马上能复用：数组可能还以 view 的形式挂在 latest pair、
+    待配对的单边帧或运动门控的预录队列里（view 会引用底层 buffer）。
+    所以归还的先放进 lent，等引用计数回到只剩池自己时才重新发出去——
+    也就是“被新帧挤掉（evicted）”之后。
+    每个 key 最多留 per_key 块，最多留 max_keys 种尺寸（最久没用的整组丢弃）。
+    """
+
+    def __init__(self, per_key: int = 4, max_keys: int = 8):
+        self.per_key = per_key
+        self.max_keys = max_keys
+        self._slots = OrderedDict()  # key -> [free, lent]
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "dropped": 0}
+
+    def _slot(self, key):
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._slots[key] = ([], [])
+            while len(self._slots) > self.max_keys:
+                _, (free, lent) = self._slots.popitem(last=False)
+                self.stats["dropped"] += len(free) + len(lent)
+        else:
+            self._slots.move_to_end(key)
+        return slot
+
+    def take(self, key, make):
+        with self._lock:
+            free, lent = self._slot(key)
+            if not free:
+                # 被挤掉的借出块回收到空闲列表
+                i = 0
+                while i < len(lent):
+                    if sys.getrefcount(lent[i]) <= _IDLE_REFS:
+                        free.append(lent.pop(i))
+                    else:
+                        i += 1
+            if free:
+                self.stats["hits"] += 1
+                return free.pop()
+            self.stats["misses"] += 1
+        return make()
+
+    def give(self, key, buf):
+        with self._lock:
+            free, lent = self._slot(key)
+            lent.append(buf)
+            # 超出上限：最老的不再跟踪，交给 GC（引用都消失后自然释放）
+            while len(free) + len(lent) > self.per_key:
+                (free if free else lent).pop(0)
+                self.stats["dropped"] += 1
+
+    def summary(self) -> dict:
+        with self._lock:
+            keys = {
+                str(k): {"free": len(free), "lent": len(lent)}
+                for k, (free, lent) in self._slots.items()
+            }
+            nbytes = sum(
+                _nbytes(b) for free, lent in self._slots.values() for b in free + lent
+            )
+            return dict(self.stats, bytes=nbytes, keys=keys)
+
+
+def _nbytes(buf) -> int:
+    return getattr(buf, "nbytes", None) or len(buf)
@@ -0,0 +1,180 @@
+# pc/composite.py
+# 每台设备最新同步帧对的合成视图：左右并排（sbs）、红青立体（anaglyph）、左右差（diff）。
+# 每个 (视图, 设备) 一块常驻画布（尺寸变了才重新分配），NumPy 整块写入，
+# 同一个 pair 代号只编码一次 JPEG，所有观看者 / MJPEG 流共享结果。
+import io
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+VIEWS = ("sbs", "anaglyph", "diff")
+
+
+def _as_rgb(img: np.ndarray, out: np.ndarray):
+    # 灰度帧广播到三个通道，彩色帧直接拷
+    if img.ndim == 2:
+        out[...] = img[..., None]
+    else:
+        np.copyto(out, img)
+
+
+def _luma(img: np.ndarray, out: np.ndarray, tmp: np.ndarray) -> np.ndarray:
+    # (77 R + 150 G + 29 B) >> 8，uint16 累加，不产生临时数组
+    if img.ndim == 2:
+        np.copyto(out, img, casting="unsafe")
+        return out
+    np.multiply(img[..., 0], 77, out=out, dtype=np.uint16)
+    np.multiply(img[..., 1], 150, out=tmp, dtype=np.uint16)
+    out += tmp
+    np.multiply(img[..., 2], 29, out=tmp, dtype=np.uint16)
+    out += tmp
+    out >>= 8
+    return out
+
+
+class _View:
+    __slots__ = ("lock", "shape", "bufs", "gen", "jpg", "renders")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.shape = None
+        self.bufs = None
+        self.gen = None
+        self.jpg = None
+        self.renders = 0
+
+
+class Composite:
+    def __init__(self, quality: int = 80, diff_gain: int = 2):
+        self.quality = quality
+        self.diff_gain = diff_gain
+        self._views = {}  # (视图, 设备) -> _View，第一次有人看时建
+        self._gens = {}  # 设备 -> 最新 pair 代号
+        self._changed = threading.Condition()
+        self.stats = {"hits": 0, "renders": 0}
+
+    # ---------- 发布路径 ----------
+    def publish(self, dev: str, gen: int):
+        """新 pair 发布后调用：只记代号、叫醒等待的流。"""
+        with self._changed:
+            self._gens[dev] = gen
+            self._changed.notify_all()
+
+    def wait(self, dev: str, after_gen: int, timeout: float) -> int:
+        # 等到这台设备有新 pair（代号超过 after_gen）或超时，返回当前代号
+        with self._changed:
+            self._changed.wait_for(lambda: self._gens.get(dev, 0) > after_gen, timeout)
+            return self._gens.get(dev, 0)
+
+    def _view(self, view: str, dev: str) -> _View:
+        with self._changed:
+            v = self._views.get((view, dev))
+            if v is None:
+                v = self._views[(view, dev)] = _View()
+            return v
+
+    # ---------- 渲染 ----------
+    def _alloc(self, view: str, h: int, w: int) -> dict:
+        if view == "sbs":
+            return {"out": np.empty((h, 2 * w, 3), np.uint8)}
+        if view == "anaglyph":
+            return {"out": np.empty((h, w, 3), np.uint8)}
+        return {
+            "out": np.empty((h, w), np.uint8),
+            "l": np.empty((h, w), np.uint16),
+            "r": np.empty((h, w), np.uint16),
+            "tmp": np.empty((h, w), np.uint16),
+        }
+
+    def _draw(self, view: str, b: dict, left: np.ndarray, right: np.ndarray):
+        out = b["out"]
+        if view == "sbs":
+            w = left.shape[1]
+            _as_rgb(left, out[:, :w])
+            _as_rgb(right, out[:, w:])
+        elif view == "anaglyph":
+            # 红 = 左眼，青（绿+蓝）= 右眼；灰度帧就是左灰度进红、右灰度进绿蓝
+            # 先整块拷右眼（连续内存，最快），再只覆盖红通道
+            _as_rgb(right, out)
+            out[..., 0] = left if left.ndim == 2 else left[..., 0]
+        else:
+            # |L - R| 的亮度差，乘增益后截到 255；uint16 上做减法前先比较避免下溢
+            l = _luma(left, b["l"], b["tmp"])
+            r = _luma(right, b["r"], b["tmp"])
+            np.maximum(l, r, out=b["tmp"])
+            np.minimum(l, r, out=l)
+            np.subtract(b["tmp"], l, out=b["tmp"])
+            if self.diff_gain != 1:
+                np.multiply(b["tmp"], self.diff_gain, out=b["tmp"])
+            np.minimum(b["tmp"], 255, out=b["tmp"])
+            np.copyto(out, b["tmp"], casting="unsafe")
+        return out
+
+    def render(self, view: str, pair):
+        """
+        pair 是 server.latest_pair() 的结果（带 dev）。返回 (gen, jpeg)；
+        同一设备同一代号直接返回缓存。左右尺寸不一致时 ValueError。
+        """
+        v = self._view(view, pair["dev"])
+        gen = pair["gen"]
+        with v.lock:
+            if v.gen == gen:
+                self.stats["hits"] += 1
+                return gen, v.jpg
+            left, right = pair["L"], pair["R"]
+            if left.shape != right.shape:
+                raise ValueError(f"pair shapes differ: L={left.shape} R={right.shape}")
+            h, w = left.shape[:2]
+            if v.shape != (h, w):
+                v.bufs = self._alloc(view, h, w)
+                v.shape = (h, w)
+            out = self._draw(view, v.bufs, left, right)
+            buf = io.BytesIO()
+            Image.fromarray(out).save(buf, format="JPEG", quality=self.quality)
+            v.gen, v.jpg = gen, buf.getvalue()
+            v.renders += 1
+            self.stats["renders"] += 1
+            return gen, v.jpg
+
+    def stream(
+        self,
+        view: str,
+        dev: str,
+        get_pair,
+        max_fps: float = 10.0,
+        timeout: float = 5.0,
+    ):
+        """
+        每个观看者一个生成器，跟一台设备：它的 pair 代号变了才出一张（最多 max_fps），
+        超时重发上一张保活。get_pair(dev) 取最新一对。
+        渲染按 (设备, 代号) 缓存，多一个观看者不多一次渲染。
+        """
+        gap = 1.0 / max_fps if max_fps > 0 else 0.0
+        last_gen = -1
+        last_t = 0.0
+        while True:
+            wait = gap - (time.time() - last_t)
+            if wait > 0:
+                time.sleep(wait)
+            last_gen = self.wait(dev, last_gen, timeout)
+            last_t = time.time()
+            pair = get_pair(dev)
+            if pair is None:
+                continue
+            try:
+                _, jpg = self.render(view, pair)
+            except ValueError:
+                continue
+            yield jpg
+
+    def summary(self) -> dict:
+        with self._changed:
+            items = list(self._views.items())
+            gens = dict(self._gens)
+        views = {
+            f"{name}/{dev}": {"gen": v.gen, "shape": v.shape, "renders": v.renders}
+            for (name, dev), v in items
+        }
+        return {"gens": gens, "views": views, "stats": dict(self.stats)}
@@ -0,0 +1,269 @@
+# pc/dataset.py
+# 一段时间内的同步左右帧 -> 预分配的 .npy（memmap）数据集 (N, 2, H, W, C) + 元数据表。
+#
+#   python dataset.py -o ds/ --since 2026-01-21T10:00:00 --until 2026-01-21T10:05:00
+#   python dataset.py -o ds/ --dev 192.168.1.50   # 多台设备上传过时必须选一台
+#
+# 读取端不需要加载步骤：
+#   ds = StereoDataset("ds/")      # np.load(mmap_mode="r")，用到哪页读哪页
+#   left, right = ds[100]
+#   ds.meta["t_L"], ds.info["shape"]
+#
+# 服务端开了 STEREO_ARCHIVE_RAW 时，RAW 上传的帧按原始像素（.raw）归档，
+# 这里直接把原始像素换算进数组，全程不经过 JPEG。
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import argparse
+import io
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+import frameindex
+import jpegmeta
+import pixfmt
+
+FRAMES_FILE = "frames.npy"
+META_FILE = "meta.npy"
+INFO_FILE = "dataset.json"
+
+META_DTYPE = np.dtype(
+    [
+        ("dev", "U64"),
+        ("frame_id", "i8"),
+        ("t_L", "f8"),
+        ("t_R", "f8"),
+        ("mode", "U8"),
+        ("burst_id", "i4"),
+        ("burst_seq", "i4"),
+        ("file_L", "U64"),
+        ("file_R", "U64"),
+    ]
+)
+
+_RAW_FORMATS = {"raw565": "RGB565", "gray8": "GRAY8"}
+
+
+def _channels(rec: dict) -> int:
+    # 上传时扫过的 JPEG 头（index 里的 jpeg.components）优先，灰度 JPEG 也能识别
+    jinfo = rec.get("jpeg")
+    if jinfo:
+        return 1 if jinfo.get("components") == 1 else 3
+    return 1 if rec.get("mode") == "gray8" else 3
+
+
+def _decode(path: Path, rec: dict) -> np.ndarray:
+    """index 记录 -> HxW（灰度）或 HxWx3 数组。.raw 直接按原始像素换算。"""
+    data = path.read_bytes()
+    if path.suffix == ".raw":
+        fmt = _RAW_FORMATS.get(rec.get("mode"))
+        if fmt is None:
+            raise ValueError(f"unknown raw mode: {rec.get('mode')}")
+        w, h = rec["w"], rec["h"]
+        if fmt == "GRAY8":
+            return pixfmt.gray8_to_array(data, w, h)
+        return pixfmt.rgb565_to_rgb888(data, w, h, bool(rec.get("swap")))
+    im = Image.open(io.BytesIO(data))
+    return np.asarray(im if im.mode in ("L", "RGB") else im.convert("RGB"))
+
+
+def _fit(img: np.ndarray, c: int) -> np.ndarray:
+    # 同一数据集里混了灰度和彩色帧时统一通道数
+    if img.ndim == 2:
+        img = img[..., None]
+    if img.shape[2] == c:
+        return img
+    if c == 1:
+        return pixfmt.to_luma(img)[..., None]
+    return np.repeat(img, 3, axis=2)
+
+
+def _plan(frames_dir: Path, since, until, limit, dev=None):
+    """
+    第一遍只看 index：选出尺寸一致、文件都在的对，左右都来自同一台设备。
+    数据集尺寸取第一对（index 里的 w/h/mode/jpeg；没有 index 时只扫 JPEG 头）。
+    """
+    keep, skipped = [], 0
+    shape = None
+    for recL, recR in frameindex.pairs(frames_dir, since, until, dev):
+        if limit and len(keep) >= limit:
+            break
+        pL, pR = frames_dir / recL["file"], frames_dir / recR["file"]
+        if not (pL.exists() and pR.exists()):
+            skipped += 1
+            continue
+        w, h = recL.get("w"), recL.get("h")
+        if not w or not h:
+            jinfo = jpegmeta.scan_file(pL)
+            (w, h), c = (jinfo["w"], jinfo["h"]), _channels({"jpeg": jinfo})
+        else:
+            c = _channels(recL)
+        if recR.get("w") and (recR["w"], recR.get("h")) != (w, h):
+            skipped += 1
+            continue
+        if shape is None:
+            shape = (h, w, c)
+        elif (h, w) != shape[:2]:
+            skipped += 1
+            continue
+        keep.append((recL, recR))
+    return keep, shape, skipped
+
+
+def _meta_row(recL: dict, recR: dict):
+    burst = recL.get("burst") or {}
+    fid = recL.get("frame_id")
+    return (
+        recL.get("dev") or "",
+        -1 if fid is None else fid,
+        recL.get("t") or np.nan,
+        recR.get("t") or np.nan,
+        recL.get("mode") or "",
+        burst.get("id", -1),
+        burst.get("seq", -1),
+        recL["file"],
+        recR["file"],
+    )
+
+
+def export(
+    frames_dir, out_dir, since=None, until=None, workers=None, limit=None, dev=None
+):
+    # dev 不给时范围内有多台设备则 ValueError（见 frameindex.pick_device）
+    frames_dir, out_dir = Path(frames_dir), Path(out_dir)
+    since, until = frameindex.parse_time(since), frameindex.parse_time(until)
+    dev = frameindex.pick_device(frames_dir, dev, since, until)
+    pairs, shape, skipped = _plan(frames_dir, since, until, limit, dev)
+    if not pairs:
+        raise LookupError("no synchronized pairs in range")
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    info_path = out_dir / INFO_FILE
+    if info_path.exists():
+        info_path.unlink()  # dataset.json 最后写，存在即代表导出完整
+
+    n = len(pairs)
+    h, w, c = shape
+    frames = np.lib.format.open_memmap(
+        out_dir / FRAMES_FILE, mode="w+", dtype=np.uint8, shape=(n, 2, h, w, c)
+    )
+    meta = np.empty(n, dtype=META_DTYPE)
+    for i, (recL, recR) in enumerate(pairs):
+        meta[i] = _meta_row(recL, recR)
+    np.save(out_dir / META_FILE, meta)
+
+    # PIL 解码 / numpy 换算大多释放 GIL；每个任务直接写进 memmap 自己那一行
+    def work(i):
+        recL, recR = pairs[i]
+        for s, rec in ((0, recL), (1, recR)):
+            img = _fit(_decode(frames_dir / rec["file"], rec), c)
+            if img.shape[:2] != (h, w):
+                raise ValueError(f"{rec['file']}: {img.shape[:2]} != {(h, w)}")
+            frames[i, s] = img
+        return i
+
+    t0 = time.time()
+    failed = []
+    with ThreadPoolExecutor(max_workers=workers or min(8, os.cpu_count() or 2)) as ex:
+        futs = [ex.submit(work, i) for i in range(n)]
+        for i, f in enumerate(futs):
+            try:
+                f.result()
+            except Exception as e:
+                failed.append({"index": i, "error": str(e)})
+    frames.flush()
+    del frames
+
+    first = pairs[0][0]
+    info = {
+        "shape": [n, 2, h, w, c],
+        "dtype": "uint8",
+        "layout": "N,side(L=0,R=1),H,W,C",
+        "color": "GRAY" if c == 1 else "RGB",
+        "frames": FRAMES_FILE,
+        "meta": META_FILE,
+        "source": str(frames_dir),
+        "dev": first.get("dev"),
+        "since": since,
+        "until": until,
+        "skipped_pairs": skipped,
+        "failed": failed,
+        "geometry": {k: first.get(k) for k in ("roi", "scale", "full")},
+        "export_s": round(time.time() - t0, 3),
+    }
+    tmp = info_path.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(info, indent=2), encoding="utf-8")
+    os.replace(tmp, info_path)
+    return info
+
+
+class StereoDataset:
+    """
+    惰性读取：frames / meta 都是 np.load(mmap_mode="r")，打开时不读像素，
+    ds[i] 返回 (left, right) 两个只读 view，访问时才按页读盘。
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        info_path = self.path / INFO_FILE
+        if not info_path.exists():
+            raise FileNotFoundError(f"{info_path} missing (export incomplete?)")
+        self.info = json.loads(info_path.read_text(encoding="utf-8"))
+        self.frames = np.load(self.path / self.info["frames"], mmap_mode="r")
+        self.meta = np.load(self.path / self.info["meta"], mmap_mode="r")
+
+    def __len__(self):
+        return self.frames.shape[0]
+
+    def __getitem__(self, i):
+        pair = self.frames[i]
+        return pair[0], pair[1]
+
+    def gray(self, i):
+        # 单通道数据集直接去掉通道维
+        left, right = self[i]
+        if left.shape[-1] == 1:
+            return left[..., 0], right[..., 0]
+        return pixfmt.to_luma(left), pixfmt.to_luma(right)
+
+
+def main():
+    ap = argparse.ArgumentParser(
+        description="Export stereo pairs to a memmap .npy dataset"
+    )
+    ap.add_argument("-o", "--out", required=True, help="output directory")
+    ap.add_argument(
+        "--frames-dir", default=str(Path(__file__).resolve().parent / "frames")
+    )
+    ap.add_argument("--since", help="unix seconds or ISO time")
+    ap.add_argument("--until", help="unix seconds or ISO time")
+    ap.add_argument("--workers", type=int)
+    ap.add_argument("--limit", type=int)
+    ap.add_argument("--dev", help="device id (required when several rigs uploaded)")
+    args = ap.parse_args()
+
+    try:
+        info = export(
+            args.frames_dir,
+            args.out,
+            args.since,
+            args.until,
+            args.workers,
+            args.limit,
+            args.dev,
+        )
+    except (LookupError, ValueError) as e:
+        sys.exit(f"[DATASET] {e}")
+    print(
+        f"[DATASET] {info['shape']} {info['color']} -> {args.out} "
+        f"(skipped={info['skipped_pairs']} failed={len(info['failed'])} "
+        f"{info['export_s']}s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# pc/deltaframe.py
+# 设备 RAW 差分上传（k210/stereo_lcd_wifi/tiledelta.py）的服务端还原：
+# 每个 (设备, 路) 保留一张基准帧，差分帧的变化块一次向量化 scatter 写回基准帧，
+# 再拷出一整帧交给正常的 RAW 处理流程——下游（latest_*、pair、归档）看到的仍是完整帧。
+from collections import OrderedDict
+import threading
+
+import numpy as np
+
+
+class DeltaMismatch(ValueError):
+    """基准帧不存在 / 序号或尺寸对不上：设备需要重发关键帧。"""
+
+
+class _Base:
+    def __init__(self, w, h, bpp, tile):
+        self.w, self.h, self.bpp, self.tile = w, h, bpp, tile
+        self.ntx = (w + tile - 1) // tile
+        self.nty = (h + tile - 1) // tile
+        self.ntiles = self.ntx * self.nty
+        self.nbitmap = (self.ntiles + 7) // 8
+        self.tile_bytes = tile * tile * bpp
+        # 按整块补齐的画布：(nty*T) 行 x (ntx*T*bpp) 字节，边缘填充区只写不读
+        self.buf = np.zeros((self.nty * tile, self.ntx * tile * bpp), np.uint8)
+        # (nty, ntx, T, T*bpp) 的 view：tiles[ty, tx] 就是一块
+        self.tiles = self.buf.reshape(self.nty, tile, self.ntx, tile * bpp).swapaxes(
+            1, 2
+        )
+        self.frame = self.buf[:h, : w * bpp]
+        self.seq = None
+
+    def fits(self, w, h, bpp, tile) -> bool:
+        return (self.w, self.h, self.bpp, self.tile) == (w, h, bpp, tile)
+
+
+class DeltaStore:
+    def __init__(self, max_streams: int = 64):
+        self.max_streams = max_streams
+        self._bases = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"key": 0, "delta": 0, "tiles": 0, "bytes_in": 0, "bytes_full": 0}
+
+    def _get(self, stream):
+        base = self._bases.get(stream)
+        if base is not None:
+            self._bases.move_to_end(stream)
+        return base
+
+    def key(self, stream, raw, w: int, h: int, bpp: int, tile: int, seq: int):
+        """关键帧：整帧拷进（必要时新建的）基准帧。"""
+        src = np.frombuffer(raw, np.uint8).reshape(h, w * bpp)
+        with self._lock:
+            base = self._get(stream)
+            if base is None or not base.fits(w, h, bpp, tile):
+                base = self._bases[stream] = _Base(w, h, bpp, tile)
+                while len(self._bases) > self.max_streams:
+                    self._bases.popitem(last=False)
+            base.frame[...] = src
+            base.seq = seq
+            self.stats["key"] += 1
+            self.stats["bytes_in"] += len(raw)
+            self.stats["bytes_full"] += len(raw)
+
+    def apply(self, stream, body, w, h, bpp, tile, seq, base_seq, out) -> dict:
+        """
+        差分帧：位图 + 变化块 scatter 进基准帧，然后把整帧拷进 out（h*w*bpp 字节的可写 buffer）。
+        基准帧序号必须等于 base_seq，否则 DeltaMismatch。
+        """
+        body = memoryview(body)
+        with self._lock:
+            base = self._get(stream)
+            if base is None or base.seq is None:
+                raise DeltaMismatch("no keyframe yet")
+            if not base.fits(w, h, bpp, tile):
+                raise DeltaMismatch(
+                    f"geometry changed: base={base.w}x{base.h}x{base.bpp}/{base.tile} "
+                    f"delta={w}x{h}x{bpp}/{tile}"
+                )
+            if base.seq != base_seq:
+                raise DeltaMismatch(f"base seq {base_seq} != {base.seq}")
+            if len(body) < base.nbitmap:
+                raise ValueError("delta body shorter than tile bitmap")
+            bits = np.unpackbits(
+                np.frombuffer(body[: base.nbitmap], np.uint8), bitorder="little"
+            )
+            idx = np.flatnonzero(bits[: base.ntiles])
+            expect = base.nbitmap + len(idx) * base.tile_bytes
+            if len(body) != expect:
+                raise ValueError(
+                    f"delta size mismatch: got={len(body)} expect={expect} "
+                    f"tiles={len(idx)}"
+                )
+            if len(idx):
+                tiles = np.frombuffer(body[base.nbitmap :], np.uint8).reshape(
+                    len(idx), tile, tile * bpp
+                )
+                base.tiles[idx // base.ntx, idx % base.ntx] = tiles
+            base.seq = seq
+            np.copyto(np.frombuffer(out, np.uint8).reshape(h, w * bpp), base.frame)
+            self.stats["delta"] += 1
+            self.stats["tiles"] += len(idx)
+            self.stats["bytes_in"] += len(body)
+            self.stats["bytes_full"] += h * w * bpp
+        return {"tiles": int(len(idx)), "of": base.ntiles, "bytes": len(body)}
+
+    def summary(self) -> dict:
+        with self._lock:
+            s = dict(self.stats)
+            s["streams"] = len(self._bases)
+        s["ratio"] = s["bytes_in"] / s["bytes_full"] if s["bytes_full"] else None
+        return s
@@ -0,0 +1,125 @@
+# pc/frameindex.py
+# frames/index.jsonl（server.py 每归档一帧追加一行）的读取、按时间/路/设备筛选、左右配对
+from datetime import datetime
+from pathlib import Path
+import json
+
+
+def parse_time(s):
+    """None / 秒级 unix 时间戳 / ISO 时间（"2026-01-21T10:00:00"）-> float 或 None。"""
+    if s is None or s == "":
+        return None
+    try:
+        return float(s)
+    except (TypeError, ValueError):
+        return datetime.fromisoformat(str(s)).timestamp()
+
+
+def read_index(index_file: Path):
+    # 逐行读，不整文件进内存；写了一半的末行直接跳过
+    index_file = Path(index_file)
+    if not index_file.exists():
+        return
+    with open(index_file, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            if "file" in rec and "side" in rec:
+                yield rec
+
+
+def select(records, side=None, since=None, until=None, dev=None):
+    for rec in records:
+        if side and rec["side"] != side:
+            continue
+        if dev is not None and rec.get("dev") != dev:
+            continue
+        t = rec.get("t")
+        if since is not None and (t is None or t < since):
+            continue
+        if until is not None and (t is None or t > until):
+            continue
+        yield rec
+
+
+def pair_records(records):
+    """
+    按到达顺序把同一设备、同一 frame_id 的 L / R 配成一对（和 server 的 _offer_side 一样
+    按 (设备, 路) 等待：只和同一台对面最近一条待配的比，多台同时上传不会串台，
+    设备重启帧号归零也不会配错）。没有 dev 的旧记录算作同一台。
+    """
+    pending = {}
+    for rec in records:
+        side = rec["side"]
+        if side not in ("L", "R"):
+            continue
+        dev = rec.get("dev")
+        other = (dev, "R" if side == "L" else "L")
+        p = pending.get(other)
+        fid = rec.get("frame_id")
+        if p is not None and fid is not None and p.get("frame_id") == fid:
+            del pending[other]
+            yield (rec, p) if side == "L" else (p, rec)
+        else:
+            pending[(dev, side)] = rec
+
+
+def glob_frames(frames_dir: Path, side: str):
+    # 没有 index.jsonl 的旧目录：文件名里的时间戳本身就按时间排序
+    for p in sorted(Path(frames_dir).glob(f"{side}_*.jpg")):
+        yield {"file": p.name, "side": side, "t": None, "frame_id": None}
+
+
+def devices(frames_dir: Path, since=None, until=None) -> list:
+    """时间范围内在 index 里出现过的设备（没有 dev 的旧记录是 None）。"""
+    index_file = Path(frames_dir) / "index.jsonl"
+    found = {
+        rec.get("dev") for rec in select(read_index(index_file), None, since, until)
+    }
+    return sorted(found, key=lambda d: (d is not None, d or ""))
+
+
+def pick_device(frames_dir: Path, dev=None, since=None, until=None):
+    """
+    导出只能来自一台设备（尺寸、配对都按台）：给了 dev 就用它；
+    没给时范围内只有一台就用那台，有多台则 ValueError 并列出设备。
+    """
+    if dev is not None:
+        return dev
+    found = devices(frames_dir, since, until)
+    if len(found) > 1:
+        raise ValueError(
+            "frames from several devices, pick one with dev: "
+            + ", ".join(str(d) for d in found)
+        )
+    return None  # 一台（或旧 index 没有 dev）：不用筛
+
+
+def records(frames_dir: Path, side=None, since=None, until=None, dev=None):
+    frames_dir = Path(frames_dir)
+    index_file = frames_dir / "index.jsonl"
+    if index_file.exists():
+        return select(read_index(index_file), side, since, until, dev)
+    if since is not None or until is not None:
+        raise ValueError("time range needs frames/index.jsonl")
+    if dev is not None:
+        raise ValueError("device filter needs frames/index.jsonl")
+    sides = (side,) if side else ("L", "R")
+    return (rec for s in sides for rec in glob_frames(frames_dir, s))
+
+
+def pairs(frames_dir: Path, since=None, until=None, dev=None):
+    frames_dir = Path(frames_dir)
+    if (frames_dir / "index.jsonl").exists():
+        return pair_records(records(frames_dir, None, since, until, dev))
+    if since is not None or until is not None:
+        raise ValueError("time range needs frames/index.jsonl")
+    if dev is not None:
+        raise ValueError("device filter needs frames/index.jsonl")
+    # 没有帧号可依：按时间顺序一一对应
+    return zip(glob_frames(frames_dir, "L"), glob_frames(frames_dir, "R"))
@@ -0,0 +1,153 @@
+# pc/index_check.py
+# frames/index.jsonl 读取端（frameindex 配对）的主机端检查，不用起服务：
+# 在临时目录里造一份两台设备交错上传的归档（A-L1, B-L1, A-R1, B-R1 ...），
+# 每帧像素里写进设备号和帧号，检查配出来的左右都来自同一台、同一帧，
+# AVI 导出（avi.plan_export）和 .npy 数据集导出（dataset.export）只含指定设备的帧，
+# 不指定设备时拒绝；数据集里每对左右的像素都来自同一台同一帧。
+#
+#   python index_check.py
+#   python index_check.py --frames 20 --keep
+import argparse
+import json
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+import avi
+import dataset
+import frameindex
+
+DEVICES = ("rig-A", "rig-B")
+W, H = 16, 8
+
+
+def _pixels(dev_i, fid, side):
+    # 第 0 行：设备序号、帧号、路（0=L 1=R），读回来就能核对来源
+    img = np.zeros((H, W), np.uint8)
+    img[0, :3] = (dev_i, fid, 0 if side == "L" else 1)
+    return img
+
+
+def _make_archive(root: Path, frames: int, ext: str = ".raw") -> Path:
+    """两台设备同一时刻上传同号帧，到达顺序交错：A-L, B-L, A-R, B-R。"""
+    root.mkdir(parents=True, exist_ok=True)
+    t = 1_700_000_000.0
+    with open(root / "index.jsonl", "w", encoding="utf-8") as f:
+        for fid in range(1, frames + 1):
+            for side in ("L", "R"):
+                for dev_i, dev in enumerate(DEVICES):
+                    name = f"{dev}_{side}_{fid:04d}{ext}"
+                    img = _pixels(dev_i, fid, side)
+                    if ext == ".jpg":
+                        Image.fromarray(img).save(root / name, quality=95)
+                    else:
+                        (root / name).write_bytes(img.tobytes())
+                    rec = {
+                        "t": t,
+                        "side": side,
+                        "file": name,
+                        "dev": dev,
+                        "frame_id": fid,
+                        "mode": "gray8",
+                        "w": W,
+                        "h": H,
+                    }
+                    f.write(json.dumps(rec) + "\n")
+                    t += 0.01
+    return root
+
+
+def main():
+    ap = argparse.ArgumentParser(description="frames index pairing check (host)")
+    ap.add_argument("--frames", type=int, default=8, help="frames per device")
+    ap.add_argument("--keep", action="store_true", help="keep the temp archive")
+    args = ap.parse_args()
+
+    tmp = Path(tempfile.mkdtemp(prefix="index_check_"))
+    frames_dir = _make_archive(tmp / "frames", args.frames)
+    results = []
+
+    def check(name, ok, detail):
+        results.append((name, ok, detail))
+
+    try:
+        got = list(frameindex.pairs(frames_dir))
+        mixed = [(l["file"], r["file"]) for l, r in got if l["dev"] != r["dev"]]
+        check(
+            "pairs: same device",
+            len(got) == args.frames * len(DEVICES) and not mixed,
+            "pairs=%d mixed=%d" % (len(got), len(mixed)),
+        )
+        for dev in DEVICES:
+            got = list(frameindex.pairs(frames_dir, dev=dev))
+            ok = len(got) == args.frames and all(
+                l["dev"] == r["dev"] == dev and l["frame_id"] == r["frame_id"]
+                for l, r in got
+            )
+            check("pairs: dev=%s" % dev, ok, "pairs=%d" % len(got))
+        try:
+            frameindex.pick_device(frames_dir)
+            raised = False
+        except ValueError:
+            raised = True
+        check("pick_device: ambiguous", raised, "devices=%s" % ",".join(DEVICES))
+
+        jpeg_dir = _make_archive(tmp / "frames_jpg", args.frames, ".jpg")
+        for side in ("L", "stereo"):
+            try:
+                avi.plan_export(jpeg_dir, side)
+                raised = False
+            except ValueError:
+                raised = True
+            check("avi %s: no dev" % side, raised, "400 on the endpoint")
+            plan = avi.plan_export(jpeg_dir, side, dev=DEVICES[1])
+            devs = {r["dev"] for g in plan.groups_fn() for r in g}
+            check(
+                "avi %s: dev=%s" % (side, DEVICES[1]),
+                plan.frames == args.frames and devs == {DEVICES[1]},
+                "frames=%d devices=%s" % (plan.frames, ",".join(sorted(devs))),
+            )
+
+        try:
+            dataset.export(frames_dir, tmp / "ds_any")
+            raised = False
+        except ValueError:
+            raised = True
+        check("dataset: no dev", raised, "devices=%s" % ",".join(DEVICES))
+        for dev_i, dev in enumerate(DEVICES):
+            dataset.export(frames_dir, tmp / dev, dev=dev)
+            ds = dataset.StereoDataset(tmp / dev)
+            bad_rows = 0
+            for i in range(len(ds)):
+                left, right = ds.gray(i)
+                fid = int(ds.meta["frame_id"][i])
+                ok = (
+                    list(left[0, :3]) == [dev_i, fid, 0]
+                    and list(right[0, :3]) == [dev_i, fid, 1]
+                    and ds.meta["dev"][i] == dev
+                )
+                bad_rows += not ok
+            check(
+                "dataset: dev=%s" % dev,
+                len(ds) == args.frames and bad_rows == 0 and ds.info["dev"] == dev,
+                "pairs=%d mismatched=%d" % (len(ds), bad_rows),
+            )
+    finally:
+        if args.keep:
+            print("archive kept at", tmp)
+        else:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    bad = 0
+    for name, ok, detail in results:
+        print("%-24s %-4s %s" % (name, "ok" if ok else "FAIL", detail))
+        bad += not ok
+    sys.exit(1 if bad else 0)
+
+
+if __name__ == "__main__":
+    main()
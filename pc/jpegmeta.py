@@ -0,0 +1,130 @@
+# pc/jpegmeta.py
+# 只扫 JPEG 标记段（不解码熵编码数据）：校验 SOI/EOI，取 SOF 里的宽高、分量数、采样方式。
+# 一帧只看头部几百字节 + 末尾两字节，比 PIL 的 verify() 便宜得多。
+from pathlib import Path
+import struct
+
+SOI = b"\xff\xd8"
+EOI = b"\xff\xd9"
+
+# SOF0..SOF15，除去 DHT(C4) / JPG(C8) / DAC(CC)
+_SOF = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+_PROGRESSIVE = frozenset((0xC2, 0xC6, 0xCA, 0xCE))
+# 没有长度字段的独立标记：TEM、RST0..7
+_STANDALONE = frozenset([0x01] + list(range(0xD0, 0xD8)))
+
+_SUBSAMPLING = {
+    (1, 1): "4:4:4",
+    (2, 1): "4:2:2",
+    (2, 2): "4:2:0",
+    (4, 1): "4:1:1",
+    (1, 2): "4:4:0",
+}
+
+
+class JpegError(ValueError):
+    pass
+
+
+def _subsampling(factors) -> str:
+    if len(factors) == 1:
+        return "gray"
+    (h0, v0), rest = factors[0], factors[1:]
+    if any(f != rest[0] for f in rest) or h0 % rest[0][0] or v0 % rest[0][1]:
+        return ",".join(f"{h}x{v}" for h, v in factors)
+    return _SUBSAMPLING.get(
+        (h0 // rest[0][0], v0 // rest[0][1]),
+        ",".join(f"{h}x{v}" for h, v in factors),
+    )
+
+
+def scan_header(data) -> dict:
+    """
+    从 SOI 走到第一个 SOS，返回
+    {"w", "h", "components", "subsampling", "precision", "progressive"}。
+    只看头部：末尾的 EOI 由 scan() 检查（文件头读取时用不到）。
+    """
+    mv = memoryview(data)
+    n = len(mv)
+    if n < 4 or mv[:2] != SOI:
+        raise JpegError("missing SOI")
+    pos = 2
+    info = None
+    while True:
+        # 段之间允许任意个 0xFF 填充
+        if pos >= n or mv[pos] != 0xFF:
+            raise JpegError(f"bad marker at {pos}")
+        while pos < n and mv[pos] == 0xFF:
+            pos += 1
+        if pos >= n:
+            raise JpegError("truncated marker")
+        marker = mv[pos]
+        pos += 1
+        if marker in _STANDALONE:
+            continue
+        if marker == 0xD9:
+            raise JpegError("EOI before SOS")
+        if pos + 2 > n:
+            raise JpegError("truncated segment length")
+        (seg,) = struct.unpack_from(">H", mv, pos)
+        if seg < 2 or pos + seg > n:
+            raise JpegError(f"bad segment length {seg} for 0xFF{marker:02X}")
+        if marker in _SOF:
+            if info is not None:
+                raise JpegError("multiple SOF segments")
+            if seg < 8:
+                raise JpegError("short SOF")
+            prec, h, w, nc = struct.unpack_from(">BHHB", mv, pos + 2)
+            if seg < 8 + 3 * nc:
+                raise JpegError("short SOF component table")
+            if not w or not h or nc not in (1, 3, 4):
+                raise JpegError(f"bad SOF: {w}x{h} components={nc}")
+            factors = [
+                (mv[pos + 9 + 3 * i] >> 4, mv[pos + 9 + 3 * i] & 0x0F)
+                for i in range(nc)
+            ]
+            info = {
+                "w": w,
+                "h": h,
+                "components": nc,
+                "subsampling": _subsampling(factors),
+                "precision": prec,
+                "progressive": marker in _PROGRESSIVE,
+            }
+        elif marker == 0xDA:
+            if info is None:
+                raise JpegError("SOS before SOF")
+            return info
+        pos += seg
+
+
+def scan(data) -> dict:
+    """整帧校验：头部标记合法 + 以 EOI 结尾（允许尾部补零）。"""
+    info = scan_header(data)
+    end = len(data)
+    while end > 2 and data[end - 1] == 0:
+        end -= 1
+    if data[end - 2 : end] != EOI:
+        raise JpegError("missing EOI (truncated?)")
+    return info
+
+
+def scan_file(path, head: int = 4096) -> dict:
+    # 只读文件头；大多数 JPEG 的 SOF 在前几百字节，遇到大 EXIF/ICC 再整块读
+    path = Path(path)
+    with open(path, "rb") as f:
+        data = f.read(head)
+        try:
+            return scan_header(data)
+        except JpegError:
+            if len(data) < head:
+                raise
+            return scan_header(data + f.read())
+
+
+def check_dims(info: dict, w, h):
+    """和设备报的 X-W/X-H 对比；头里没给就不比。"""
+    if w is not None and info["w"] != w:
+        raise JpegError(f"width mismatch: sof={info['w']} X-W={w}")
+    if h is not None and info["h"] != h:
+        raise JpegError(f"height mismatch: sof={info['h']} X-H={h}")
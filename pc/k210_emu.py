@@ -0,0 +1,793 @@
+# pc/k210_emu.py
+# 在 Linux 上跑 k210/stereo_lcd_wifi/main.py 的真实 main()：
+# 假的 sensor / image / lcd / network / fpioa_manager / usocket / machine 模块
+# + 模拟的摄像头/编码/SPI-WiFi 链路耗时，对本机 server.py（进程内）做上传基准。
+#
+#   python k210_emu.py                          # 默认 config.py，跑 20 s
+#   python k210_emu.py --set STREAM_MODE=RAW --set STITCH_LR=True --kbps 1500
+#   python k210_emu.py --preset jpeg --preset jpeg-lr --preset raw-gray --seconds 15
+#   python k210_emu.py --fail-rate 0.05 --json
+#
+# 多个 --preset 时每个配置在独立子进程里跑（设备模块、服务端状态互不影响），最后汇总成表。
+import argparse
+import ast
+import io
+import json
+import logging
+import os
+import random
+import socket as _socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+BASE_DIR = Path(__file__).resolve().parent
+DEVICE_DIR = BASE_DIR.parent / "k210" / "stereo_lcd_wifi"
+COMMON_DIR = BASE_DIR.parent / "k210" / "common"
+
+# 常用组合；--set 在 preset 之后生效
+PRESETS = {
+    "jpeg": {"STREAM_MODE": "JPEG", "STITCH_LR": False},
+    "jpeg-lr": {"STREAM_MODE": "JPEG", "STITCH_LR": True},
+    "jpeg-serial": {"STREAM_MODE": "JPEG", "STITCH_LR": False, "PIPELINE": False},
+    "raw": {"STREAM_MODE": "RAW", "STITCH_LR": False},
+    "raw-lr": {"STREAM_MODE": "RAW", "STITCH_LR": True},
+    "raw-gray": {"STREAM_MODE": "RAW", "PIXFORMAT": "GRAYSCALE"},
+    "raw-roi": {"STREAM_MODE": "RAW", "ROI": (0, 80, 320, 80), "DECIMATE": 2},
+    "boot-serial": {"STREAM_MODE": "JPEG", "FAST_BOOT": False},
+    "raw-delta": {"STREAM_MODE": "RAW", "DELTA": True},
+    "burst": {"STREAM_MODE": "JPEG", "BURST_PAIRS": 8, "BURST_EVERY_MS": 5000},
+}
+
+_PERIOD = 1 << 30  # MicroPython ticks 回绕周期
+_HALF = _PERIOD >> 1
+
+
+# ---------- MicroPython time ----------
+def _install_time(gc_ms: float):
+    t = time
+    t.ticks_ms = lambda: int(time.monotonic() * 1000) & (_PERIOD - 1)
+    t.ticks_us = lambda: int(time.monotonic() * 1000000) & (_PERIOD - 1)
+    t.ticks_diff = lambda a, b: ((a - b + _HALF) & (_PERIOD - 1)) - _HALF
+    t.ticks_add = lambda a, d: (a + d) & (_PERIOD - 1)
+    t.sleep_ms = lambda ms: time.sleep(max(0, ms) / 1000.0)
+    t.sleep_us = lambda us: time.sleep(max(0, us) / 1000000.0)
+
+    # CPython 的 gc.collect() 在装了 flask/numpy 的进程里要几十 ms，
+    # 设备每帧都调；换成固定的模拟耗时，真正的回收交给 CPython 自己
+    import gc
+
+    gc.collect = lambda: time.sleep(gc_ms / 1000.0)
+
+
+def _busy(ms: float):
+    if ms > 0:
+        time.sleep(ms / 1000.0)
+
+
+# ---------- image ----------
+def _rgb_to_565(rgb: np.ndarray) -> bytes:
+    r = rgb[..., 0].astype(np.uint16) >> 3
+    g = rgb[..., 1].astype(np.uint16) >> 2
+    b = rgb[..., 2].astype(np.uint16) >> 3
+    return ((r << 11) | (g << 5) | b).astype(">u2").tobytes()
+
+
+def _565_to_rgb(buf, w: int, h: int) -> np.ndarray:
+    v = np.frombuffer(buf, dtype=">u2", count=w * h).reshape(h, w)
+    r = ((v >> 11) & 0x1F).astype(np.uint8)
+    g = ((v >> 5) & 0x3F).astype(np.uint8)
+    b = (v & 0x1F).astype(np.uint8)
+    return np.stack([(r << 3) | (r >> 2), (g << 2) | (g >> 4), (b << 3) | (b >> 2)], -1)
+
+
+class EmuImage:
+    """
+    MaixPy image.Image 的子集。像素存在一个 bytearray 里（RGB565 大端 / GRAY8 / JPEG），
+    bytearray() 返回的就是这块内存本身 —— 与设备一样，snapshot 覆盖 framebuffer
+    后，之前拿到的零拷贝 view 会跟着变。
+    """
+
+    costs = {"jpeg_ms": 12.0, "copy_ms": 1.0}
+
+    def __init__(
+        self, w=0, h=0, fmt="RGB565", buf=None, size=None, width=None, height=None
+    ):
+        if size is not None:
+            w, h = size
+        if width is not None:
+            w, h = width, height
+        self.w, self.h, self.fmt = int(w), int(h), fmt
+        bpp = 1 if fmt == "GRAY" else 2
+        self.buf = buf if buf is not None else bytearray(self.w * self.h * bpp)
+
+    def width(self):
+        return self.w
+
+    def height(self):
+        return self.h
+
+    def format(self):
+        return self.fmt
+
+    def size(self):
+        return len(self.buf)
+
+    def bytearray(self):
+        return self.buf
+
+    def get_statistics(self, *args, **kwargs):
+        # MaixPy 的 l_mean 是 LAB 的 L（0..100），这里用亮度近似
+        px = self.pixels().astype(np.uint16)
+        if px.ndim == 3:
+            px = (px[..., 0] * 77 + px[..., 1] * 150 + px[..., 2] * 29) >> 8
+        mean = float(px.mean()) * 100.0 / 255.0
+        return types.SimpleNamespace(l_mean=lambda: int(mean))
+
+    def to_bytes(self):
+        return bytes(self.buf)
+
+    def pixels(self) -> np.ndarray:
+        if self.fmt == "GRAY":
+            return np.frombuffer(self.buf, np.uint8, self.w * self.h).reshape(
+                self.h, self.w
+            )
+        if self.fmt == "JPEG":
+            return np.asarray(Image.open(io.BytesIO(bytes(self.buf))))
+        return _565_to_rgb(self.buf, self.w, self.h)
+
+    @classmethod
+    def from_pixels(cls, arr: np.ndarray, fmt: str):
+        h, w = arr.shape[:2]
+        if fmt == "GRAY":
+            return cls(w, h, "GRAY", bytearray(np.ascontiguousarray(arr).tobytes()))
+        return cls(w, h, "RGB565", bytearray(_rgb_to_565(arr)))
+
+    def load(self, arr: np.ndarray):
+        # 原地覆盖像素（framebuffer 语义）
+        if self.fmt == "GRAY":
+            self.buf[:] = np.ascontiguousarray(arr).tobytes()
+        else:
+            self.buf[:] = _rgb_to_565(arr)
+
+    def _encode(self, quality):
+        px = self.pixels()
+        _busy(self.costs["jpeg_ms"] * (self.w * self.h) / (320 * 240))
+        out = io.BytesIO()
+        Image.fromarray(px).save(out, "JPEG", quality=int(quality))
+        return bytearray(out.getvalue())
+
+    def compress(self, quality=50):
+        # 和 MaixPy 一样原地压缩：之后这张图就是 JPEG，不能再当像素图用
+        self.buf = self._encode(quality)
+        self.fmt = "JPEG"
+        return self
+
+    def compressed(self, quality=50):
+        return EmuImage(self.w, self.h, "JPEG", self._encode(quality))
+
+    def cut(self, x, y, w, h):
+        return EmuImage.from_pixels(self.pixels()[y : y + h, x : x + w], self.fmt)
+
+    def copy(self, roi=None):
+        _busy(self.costs["copy_ms"])
+        if roi is None:
+            return EmuImage(self.w, self.h, self.fmt, bytearray(self.buf))
+        return self.cut(*roi)
+
+    def resize(self, w, h):
+        px = self.pixels()
+        ys = np.arange(h) * self.h // h
+        xs = np.arange(w) * self.w // w
+        return EmuImage.from_pixels(px[ys][:, xs], self.fmt)
+
+    def to_grayscale(self, copy=False):
+        px = self.pixels()
+        if px.ndim == 3:
+            px = (px[..., 0] * 77 + px[..., 1] * 150 + px[..., 2] * 29) >> 8
+        return EmuImage.from_pixels(px.astype(np.uint8), "GRAY")
+
+    def draw_image(self, img, x, y):
+        if self.fmt == "JPEG":
+            raise OSError("Operation not supported on JPEG images")
+        dst = self.pixels().copy()
+        src = img.pixels()
+        if dst.ndim == 2 and src.ndim == 3:
+            src = (
+                (src[..., 0] * 77 + src[..., 1] * 150 + src[..., 2] * 29) >> 8
+            ).astype(np.uint8)
+        dst[y : y + src.shape[0], x : x + src.shape[1]] = src
+        self.load(dst)
+        return self
+
+    def draw_string(self, *args, **kwargs):
+        return self
+
+
+# ---------- sensor ----------
+class Scene:
+    """
+    合成场景：带纹理的背景水平漂移，右眼相对左眼有固定视差。
+    pattern: moving（默认）/ static（每帧相同，走去重路径）/ noise（最坏情况 JPEG 大小）/
+             partial（背景不动，只有一小块在移动：差分上传的典型场景）
+    """
+
+    def __init__(self, pattern="moving", disparity=8, drift=2, seed=0):
+        self.pattern = pattern
+        self.disparity = disparity
+        self.drift = drift
+        self.rng = np.random.default_rng(seed)
+        self.frame = 0
+        self._tex = {}
+
+    def _texture(self, w, h):
+        key = (w, h)
+        if key not in self._tex:
+            tw = w * 2 + self.disparity
+            x = np.arange(tw)[None, :]
+            y = np.arange(h)[:, None]
+            base = 128 + 60 * np.sin(x / 9.0) * np.cos(y / 13.0)
+            blocks = ((x // 24 + y // 24) % 2) * 50
+            noise = self.rng.integers(0, 24, (h, tw))
+            lum = np.clip(base + blocks + noise, 0, 255).astype(np.uint8)
+            tex = np.stack([lum, np.roll(lum, 7, 1), np.roll(lum, 13, 0)], -1)
+            self._tex[key] = tex
+        return self._tex[key]
+
+    def render(self, w, h, side):
+        if self.pattern == "noise":
+            return self.rng.integers(0, 256, (h, w, 3), dtype=np.uint8)
+        tex = self._texture(w, h)
+        shift = (
+            0
+            if self.pattern in ("static", "partial")
+            else (self.frame * self.drift) % w
+        )
+        x0 = shift + (self.disparity if side == 1 else 0)
+        if self.pattern != "partial":
+            return tex[:, x0 : x0 + w]
+        img = tex[:, x0 : x0 + w].copy()
+        bw, bh = max(8, w // 10), max(8, h // 10)
+        bx = (self.frame * 3 * self.drift) % (w - bw)
+        by = (self.frame * self.drift) % (h - bh)
+        img[by : by + bh, bx : bx + bw] = (255, 32, 32)
+        return img
+
+
+def _make_sensor(scene: Scene, snapshot_ms: float):
+    m = types.ModuleType("sensor")
+    m.QQVGA, m.QVGA, m.VGA = 1, 2, 3
+    m.RGB565, m.GRAYSCALE = 10, 11
+    sizes = {1: (160, 120), 2: (320, 240), 3: (640, 480)}
+    st = {"fs": 2, "pf": 10, "side": 0, "fb": None, "snaps": 0, "ae": [0, 0]}
+
+    def _fb():
+        w, h = sizes[st["fs"]]
+        fmt = "GRAY" if st["pf"] == m.GRAYSCALE else "RGB565"
+        fb = st["fb"]
+        if fb is None or (fb.w, fb.h, fb.fmt) != (w, h, fmt):
+            fb = st["fb"] = EmuImage(w, h, fmt)
+        return fb
+
+    def snapshot():
+        _busy(snapshot_ms)
+        fb = _fb()
+        px = scene.render(fb.w, fb.h, 1 if st["side"] else 0)
+        # 自动曝光收敛：run() 之后每只眼的前几帧偏暗，按几何级数逼近正常亮度
+        n = st["ae"][st["side"]]
+        if n < 16:
+            st["ae"][st["side"]] = n + 1
+            px = (px * (1.0 - 0.7 * 0.7**n)).astype(np.uint8)
+        if fb.fmt == "GRAY":
+            px = ((px[..., 0] * 77 + px[..., 1] * 150 + px[..., 2] * 29) >> 8).astype(
+                np.uint8
+            )
+        fb.load(px)
+        st["snaps"] += 1
+        if st["side"]:
+            scene.frame += 1
+        return fb
+
+    def shutdown(enable):
+        st["side"] = 1 if enable else 0
+
+    m.snapshot = snapshot
+    m.shutdown = shutdown
+    m.set_framesize = lambda fs: st.__setitem__("fs", fs)
+    m.set_pixformat = lambda pf: st.__setitem__("pf", pf)
+    m.run = lambda *a, **k: st.__setitem__("ae", [0, 0])
+    for name in (
+        "reset",
+        "binocular_reset",
+        "skip_frames",
+        "set_auto_gain",
+        "set_auto_exposure",
+        "set_auto_whitebal",
+        "set_hmirror",
+        "set_vflip",
+    ):
+        setattr(m, name, lambda *a, **k: None)
+    m._state = st
+    return m
+
+
+def _make_lcd(display_ms: float):
+    m = types.ModuleType("lcd")
+    m.WHITE, m.BLACK = 0xFFFF, 0x0000
+    m.init = m.deinit = lambda *a, **k: None
+    m.draw_string = lambda *a, **k: None
+    m.display = lambda img, *a, **k: _busy(display_ms)
+    return m
+
+
+def _make_image():
+    m = types.ModuleType("image")
+    m.Image = EmuImage
+    return m
+
+
+def _make_network(assoc_ms: float):
+    m = types.ModuleType("network")
+
+    class ESP32_SPI:
+        def __init__(self, **pins):
+            self._up = False
+
+        def version(self):
+            return "emu-1.0"
+
+        def connect(self, ssid=None, key=None):
+            _busy(assoc_ms)
+            self._up = True
+
+        def isconnected(self):
+            return self._up
+
+        def ifconfig(self):
+            return ("127.0.0.1", "255.0.0.0", "127.0.0.1", "127.0.0.1")
+
+    m.ESP32_SPI = ESP32_SPI
+    return m
+
+
+def _make_fpioa():
+    m = types.ModuleType("fpioa_manager")
+    fm = types.SimpleNamespace(
+        fpioa=types.SimpleNamespace(GPIOHS0=24), register=lambda *a, **k: None
+    )
+    m.fm = fm
+    return m
+
+
+def _make_machine():
+    m = types.ModuleType("machine")
+    m.unique_id = lambda: b"\x0e\x4d\x00\x00\x21\x0a"
+    m.reset = lambda: None
+    return m
+
+
+# ---------- ESP32 SPI / WiFi link ----------
+class Link:
+    """
+    kbps：SPI + WiFi 的有效吞吐；connect_ms：建连（含 ESP32 命令往返）；
+    rtt_ms：发完到收到状态行；send_max：ESP32 一次 send 最多接受的字节数（部分发送）；
+    fail_rate：每次 connect/send 以该概率抛 EIO。
+    """
+
+    def __init__(
+        self,
+        kbps=1500.0,
+        connect_ms=20.0,
+        rtt_ms=6.0,
+        send_max=2048,
+        fail_rate=0.0,
+        seed=0,
+    ):
+        self.bytes_per_s = kbps * 1000.0 / 8.0
+        self.connect_ms = connect_ms
+        self.rtt_ms = rtt_ms
+        self.send_max = int(send_max)
+        self.fail_rate = fail_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = []
+        self.faults = 0
+        self.opened = 0
+        self.closed = 0
+        self.busy_until = 0.0
+
+    def fault(self, where):
+        if self.fail_rate > 0 and self.rng.random() < self.fail_rate:
+            with self.lock:
+                self.faults += 1
+            raise OSError(5, "EIO (emulated, %s)" % where)
+
+    def airtime(self, n):
+        # ESP32 只有一条 SPI：并发连接共享带宽，按串行排队算完成时刻
+        with self.lock:
+            start = max(time.monotonic(), self.busy_until)
+            self.busy_until = start + n / self.bytes_per_s
+            done = self.busy_until
+        wait = done - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+
+    def record(self, rec):
+        with self.lock:
+            self.requests.append(rec)
+
+
+class EmuSocket:
+    def __init__(self, link: Link):
+        self.link = link
+        self.s = _socket.socket(_socket.AF_INET, _socket.SOCK_STREAM)
+        self.head = b""
+        self.rec = None
+        with link.lock:
+            link.opened += 1
+
+    def settimeout(self, t):
+        self.s.settimeout(t)
+
+    def connect(self, addr):
+        self.link.fault("connect")
+        _busy(self.link.connect_ms)
+        self.s.connect(addr)
+
+    def send(self, data):
+        try:
+            self.link.fault("send")
+        except OSError:
+            # 请求中途 EIO：记一次失败（status -1）
+            if self.rec is not None and self.rec["status"] is None:
+                self.rec["status"] = -1
+                self.rec["t1"] = time.monotonic()
+                self.link.record(self.rec)
+            raise
+        mv = memoryview(data)[: self.link.send_max]
+        n = len(mv)
+        if self.rec is None:
+            self._parse_head(bytes(mv))
+        else:
+            self.rec["sent"] += n
+        self.link.airtime(n)
+        self.s.sendall(mv)
+        return n
+
+    write = send
+
+    def _parse_head(self, chunk):
+        # 第一块是请求头（http_post / http_get_raw 都先单独发头）
+        self.head += chunk
+        if b"\r\n\r\n" not in self.head:
+            return
+        lines = self.head.split(b"\r\n")
+        method, path = lines[0].split(b" ")[:2]
+        clen = 0
+        for ln in lines[1:]:
+            if ln.lower().startswith(b"content-length:"):
+                clen = int(ln.split(b":", 1)[1])
+        self.rec = {
+            "method": method.decode(),
+            "path": path.decode(),
+            "len": clen,
+            "sent": 0,
+            "t0": time.monotonic(),
+            "status": None,
+        }
+
+    def recv(self, n):
+        _busy(self.link.rtt_ms)
+        data = self.s.recv(n)
+        if self.rec is not None and self.rec["status"] is None:
+            parts = data.split(b" ", 2)
+            self.rec["status"] = (
+                int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 0
+            )
+            self.rec["t1"] = time.monotonic()
+            self.link.record(self.rec)
+        return data
+
+    read = recv
+
+    def close(self):
+        if self.rec is not None and self.rec["status"] is None:
+            self.rec["status"] = 0
+            self.rec["t1"] = time.monotonic()
+            self.link.record(self.rec)
+        with self.link.lock:
+            self.link.closed += 1
+        self.s.close()
+
+
+def _make_usocket(link: Link):
+    m = types.ModuleType("usocket")
+    m.getaddrinfo = lambda host, port, *a: _socket.getaddrinfo(
+        host, port, _socket.AF_INET, _socket.SOCK_STREAM
+    )
+    m.socket = lambda *a, **k: EmuSocket(link)
+    m.AF_INET, m.SOCK_STREAM = _socket.AF_INET, _socket.SOCK_STREAM
+    return m
+
+
+# ---------- server ----------
+def _start_server(frames_dir: str):
+    os.environ["STEREO_FRAMES_DIR"] = frames_dir
+    sys.path.insert(0, str(BASE_DIR))
+    import server
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    srv = make_server("127.0.0.1", 0, server.app, threaded=True)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return server, srv.server_port
+
+
+# ---------- one run ----------
+def _parse_value(v: str):
+    try:
+        return ast.literal_eval(v)
+    except (ValueError, SyntaxError):
+        return v
+
+
+def _summarize(link: Link, seconds: float, server_mod, overrides: dict) -> dict:
+    reqs = list(link.requests)
+    uploads = [r for r in reqs if r["path"].startswith("/upload_")]
+    if not uploads:
+        return {
+            "config": overrides,
+            "uploads": 0,
+            "faults": link.faults,
+            "leaked": link.opened - link.closed,
+        }
+    t_first = min(r["t0"] for r in uploads)
+    t_last = max(r["t1"] for r in uploads)
+    window = max(1e-3, t_last - t_first)
+    ok = [r for r in uploads if r["status"] in (200, 201)]
+    by_side = {}
+    for r in ok:
+        side = r["path"].rsplit("/", 1)[-1]
+        by_side[side] = by_side.get(side, 0) + 1
+    pairs = by_side.get("LR", 0) + min(by_side.get("L", 0), by_side.get("R", 0))
+    sizes = [r["len"] for r in ok]
+    durs = sorted((r["t1"] - r["t0"]) * 1000.0 for r in ok)
+    out = {
+        "config": overrides,
+        "window_s": round(window, 2),
+        "uploads": len(uploads),
+        "uploads_ok": len(ok),
+        "upload_fail": len(uploads) - len(ok),
+        "faults": link.faults,
+        # 设备没 close 的 socket（异常路径泄漏；ESP32 上 socket 数很有限）
+        "leaked": link.opened - link.closed,
+        "pairs": pairs,
+        "pair_fps": round(pairs / window, 2),
+        "bytes_per_upload": int(sum(sizes) / len(sizes)) if sizes else 0,
+        "bytes_per_pair": (
+            int(sum(sizes) / len(sizes) * (1 if "LR" in by_side else 2)) if sizes else 0
+        ),
+        "kbps": round(sum(sizes) * 8 / 1000.0 / window, 1),
+        "upload_ms_p50": round(durs[len(durs) // 2], 1) if durs else None,
+        "upload_ms_max": round(durs[-1], 1) if durs else None,
+    }
+    with server_mod._METRICS_LOCK:
+        out["server"] = dict(server_mod._metrics)
+    if server_mod._deltas.stats["key"]:
+        out["delta"] = server_mod._deltas.summary()
+    tele = server_mod._telemetry.summary(1)
+    if tele:
+        out["telemetry"] = next(iter(tele.values()))["latest"]
+    return out
+
+
+def run_one(args, overrides: dict) -> dict:
+    _install_time(args.gc_ms)
+    EmuImage.costs["jpeg_ms"] = args.jpeg_ms
+    link = Link(
+        args.kbps,
+        args.connect_ms,
+        args.rtt_ms,
+        args.send_max,
+        args.fail_rate,
+        args.seed,
+    )
+    scene = Scene(args.pattern, args.disparity, args.drift, args.seed)
+
+    frames_dir = tempfile.mkdtemp(prefix="k210_emu_")
+    server_mod, port = _start_server(frames_dir)
+
+    sys.modules.update(
+        {
+            "sensor": _make_sensor(scene, args.snapshot_ms),
+            "lcd": _make_lcd(args.lcd_ms),
+            "image": _make_image(),
+            "network": _make_network(args.assoc_ms),
+            "fpioa_manager": _make_fpioa(),
+            "machine": _make_machine(),
+            "usocket": _make_usocket(link),
+        }
+    )
+    # 设备端的模块名（telemetry 等）和 pc/ 下的重名：服务端已经导入完，换成设备的
+    sys.path[:0] = [str(DEVICE_DIR), str(COMMON_DIR)]
+    for d in (DEVICE_DIR, COMMON_DIR):
+        for f in d.glob("*.py"):
+            sys.modules.pop(f.stem, None)
+    import config
+
+    config.SERVER_URL = "http://127.0.0.1:%d/upload" % port
+    config.WIFI_SSID = config.WIFI_SSID or "emu"
+    config.WIFI_BOOT_DELAY_MS = args.esp32_boot_ms
+    for k, v in overrides.items():
+        setattr(config, k, v)
+
+    import main as device
+
+    log = open(args.log, "w") if args.log else open(os.devnull, "w")
+    real_stdout = sys.stdout
+    sys.stdout = log
+    th = threading.Thread(target=device.main, daemon=True)
+    try:
+        th.start()
+        th.join(args.seconds)
+    finally:
+        sys.stdout = real_stdout
+    res = _summarize(link, args.seconds, server_mod, overrides)
+    # 启动报告：已随遥测上报的在服务端，还没上报的还挂在设备的 Telemetry 上
+    boot = server_mod._telemetry.boot(device.device_id())
+    if boot is None and device._tele is not None:
+        boot = device._tele.boot
+    if boot is not None:
+        res["boot"] = boot
+    res["frames_dir"] = frames_dir
+    res["alive"] = th.is_alive()  # False = main() 提前退出（异常见 --log）
+    return res
+
+
+def _row(name, r):
+    boot = r.get("boot") or {}
+    return "%-12s %7s %6s %8s %9s %7s %6s %6s %6s %7s %8s" % (
+        name,
+        r.get("pair_fps", "-"),
+        r.get("pairs", 0),
+        r.get("bytes_per_pair", "-"),
+        r.get("kbps", "-"),
+        r.get("upload_ms_p50", "-"),
+        r.get("upload_fail", 0),
+        r.get("faults", 0),
+        r.get("leaked", 0),
+        boot.get("total_ms", "-"),
+        "ok" if r.get("alive") else "EXITED",
+    )
+
+
+def _header():
+    return "%-12s %7s %6s %8s %9s %7s %6s %6s %6s %7s %8s" % (
+        "config",
+        "fps",
+        "pairs",
+        "B/pair",
+        "kbps",
+        "up_p50",
+        "fail",
+        "EIO",
+        "leak",
+        "boot_ms",
+        "main()",
+    )
+
+
+def main():
+    ap = argparse.ArgumentParser(description="K210 stereo stream emulator / benchmark")
+    ap.add_argument(
+        "--preset", action="append", choices=sorted(PRESETS), help="may repeat"
+    )
+    ap.add_argument(
+        "--set",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="override config.py",
+    )
+    ap.add_argument("--seconds", type=float, default=20.0)
+    ap.add_argument(
+        "--kbps", type=float, default=1500.0, help="effective SPI/WiFi throughput"
+    )
+    ap.add_argument("--connect-ms", type=float, default=20.0)
+    ap.add_argument("--rtt-ms", type=float, default=6.0)
+    ap.add_argument(
+        "--send-max", type=int, default=2048, help="max bytes per socket send"
+    )
+    ap.add_argument(
+        "--fail-rate", type=float, default=0.0, help="EIO probability per connect/send"
+    )
+    ap.add_argument(
+        "--esp32-boot-ms",
+        type=int,
+        default=0,
+        help="WIFI_BOOT_DELAY_MS (ESP32 power-up wait before bring-up)",
+    )
+    ap.add_argument(
+        "--assoc-ms", type=float, default=300.0, help="WiFi association time"
+    )
+    ap.add_argument("--snapshot-ms", type=float, default=25.0)
+    ap.add_argument(
+        "--jpeg-ms", type=float, default=12.0, help="JPEG encode per QVGA-sized frame"
+    )
+    ap.add_argument("--lcd-ms", type=float, default=8.0)
+    ap.add_argument("--gc-ms", type=float, default=1.0)
+    ap.add_argument(
+        "--pattern",
+        choices=("moving", "static", "noise", "partial"),
+        default="moving",
+    )
+    ap.add_argument("--disparity", type=int, default=8)
+    ap.add_argument("--drift", type=int, default=2, help="scene shift per frame (px)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--log", help="device stdout (default: discarded)")
+    ap.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    args = ap.parse_args()
+
+    extra = {}
+    for kv in args.set:
+        k, _, v = kv.partition("=")
+        extra[k.strip()] = _parse_value(v.strip())
+
+    presets = args.preset or []
+    if len(presets) <= 1:
+        overrides = dict(PRESETS[presets[0]]) if presets else {}
+        overrides.update(extra)
+        res = run_one(args, overrides)
+        if args.json:
+            print(json.dumps(res, default=str))
+        else:
+            print(_header())
+            print(_row(presets[0] if presets else "config.py", res))
+            if "telemetry" in res:
+                print("device telemetry:", res["telemetry"])
+        # 设备主循环/上传线程还在跑：不等它们，直接结束进程
+        sys.stdout.flush()
+        os._exit(0)
+
+    # 多个配置：每个一个子进程
+    results = {}
+    base = [a for a in sys.argv[1:]]
+    for name in presets:
+        cmd = [sys.executable, __file__]
+        skip = False
+        for a in base:
+            if skip:
+                skip = False
+                continue
+            if a == "--preset":
+                skip = True
+                continue
+            if a.startswith("--preset=") or a == "--json":
+                continue
+            cmd.append(a)
+        cmd += ["--preset", name, "--json"]
+        out = subprocess.run(cmd, capture_output=True, text=True)
+        line = out.stdout.strip().splitlines()[-1] if out.stdout.strip() else "{}"
+        try:
+            results[name] = json.loads(line)
+        except ValueError:
+            results[name] = {"error": out.stderr[-400:]}
+    if args.json:
+        print(json.dumps(results, default=str))
+        return
+    print(_header())
+    for name, r in results.items():
+        print(
+            _row(name, r) if "error" not in r else "%-12s ERROR %s" % (name, r["error"])
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+# pc/latency.py
+# 端到端延迟：设备时钟偏移估计（/ping 往返，NTP 式）+ 分阶段延迟直方图
+from bisect import bisect_left
+from collections import deque
+import threading
+
+# 直方图桶上界（ms），最后一个桶收 > 10000
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+# encode: 采集 -> 编码完成（设备）   queue: 编码完成 -> 开始发送（设备）
+# uplink: 开始发送 -> 服务端收完 body  server: 收完 body -> 处理完
+# total: 采集 -> 服务端处理完
+STAGES = ("encode", "queue", "uplink", "server", "total")
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.n = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def add(self, v: float):
+        v = max(0.0, float(v))
+        self.counts[bisect_left(BUCKETS_MS, v)] += 1
+        self.n += 1
+        self.sum += v
+        if v > self.max:
+            self.max = v
+
+    def quantile(self, q: float) -> float:
+        # 按桶估计：返回所在桶的上界（最后一桶用观测到的最大值）
+        if self.n == 0:
+            return 0.0
+        target = q * self.n
+        acc = 0
+        for i, c in enumerate(self.counts):
+            acc += c
+            if acc >= target:
+                return float(BUCKETS_MS[i]) if i < len(BUCKETS_MS) else self.max
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            "count": self.n,
+            "mean": self.sum / self.n if self.n else 0.0,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "max": self.max,
+            "buckets": dict(zip([str(b) for b in BUCKETS_MS] + ["inf"], self.counts)),
+        }
+
+
+class ClockSync:
+    """
+    设备每次 /ping 带 X-T0（设备发出时刻），下一次 ping 再带上上一次的
+    X-Prev-T0 / X-Prev-T3（设备收到回复时刻）。服务端记下自己的 t1/t2，
+    凑齐四个时间戳得到一个样本：
+        offset = ((t1 - t0) + (t2 - t3)) / 2    （服务端时钟 - 设备时钟）
+        delay  = (t3 - t0) - (t2 - t1)
+    取最近 window 个样本里往返延迟最小的那个（NTP 的时钟过滤思路）。
+    """
+
+    def __init__(self, window: int = 8, reset_ms: float = 1000.0):
+        self.window = window
+        self.reset_ms = reset_ms
+        self._pending = {}
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def observe(self, dev: str, t0: int, t1: float, t2: float, prev=None):
+        with self._lock:
+            if prev is not None:
+                p = self._pending.get(dev)
+                if p is not None and p[0] == prev[0]:
+                    self._add_sample(dev, p[0], p[1], p[2], prev[1])
+            self._pending[dev] = (t0, t1, t2)
+
+    def _add_sample(self, dev, t0, t1, t2, t3):
+        offset = ((t1 - t0) + (t2 - t3)) / 2.0
+        delay = (t3 - t0) - (t2 - t1)
+        if delay < -2:
+            # 设备时间戳是整数 ms，小于 1~2ms 的负值只是取整误差
+            return
+        delay = max(0.0, delay)
+        q = self._samples.setdefault(dev, deque(maxlen=self.window))
+        best = min(q, key=lambda s: s[1]) if q else None
+        if best is not None and abs(best[0] - offset) > self.reset_ms + delay:
+            # 设备重启（ticks 归零）之类：旧样本作废
+            q.clear()
+        q.append((offset, delay))
+
+    def offset(self, dev: str):
+        with self._lock:
+            q = self._samples.get(dev)
+            if not q:
+                return None
+            return min(q, key=lambda s: s[1])
+
+    def summary(self) -> dict:
+        with self._lock:
+            out = {}
+            for dev, q in self._samples.items():
+                if q:
+                    off, delay = min(q, key=lambda s: s[1])
+                    out[dev] = {"offset_ms": off, "rtt_ms": delay, "samples": len(q)}
+            return out
+
+
+class LatencyBook:
+    """每个 (设备, 路) 每个阶段一个直方图。"""
+
+    def __init__(self):
+        self._hists = {}
+        self._lock = threading.Lock()
+
+    def record(self, dev: str, side: str, stages: dict):
+        with self._lock:
+            per = self._hists.setdefault(dev, {}).setdefault(side, {})
+            for k, v in stages.items():
+                if v is None:
+                    continue
+                h = per.get(k)
+                if h is None:
+                    h = per[k] = Histogram()
+                h.add(v)
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                dev: {
+                    side: {k: h.summary() for k, h in per.items()}
+                    for side, per in sides.items()
+                }
+                for dev, sides in self._hists.items()
+            }
+
+
+def stages_ms(tc, te, ts, offset, t_body_ms: float, t_done_ms: float) -> dict:
+    """
+    tc/te/ts：设备时钟（ms）的采集/编码完成/开始发送时刻，可能缺失（None）。
+    offset：ClockSync.offset() 的偏移，None 表示还没同步 -> 跨时钟的阶段不算。
+    """
+    out = {"server": t_done_ms - t_body_ms}
+    if tc is not None and te is not None:
+        out["encode"] = te - tc
+    if te is not None and ts is not None:
+        out["queue"] = ts - te
+    if offset is not None:
+        if ts is not None:
+            out["uplink"] = t_body_ms - (ts + offset)
+        if tc is not None:
+            out["total"] = t_done_ms - (tc + offset)
+    return out
@@ -0,0 +1,189 @@
+# pc/mosaic.py
+# 多台双目设备的总览拼图：每台一行“左 | 右”，按设备数排成近似方形的网格，
+# 编成一张 JPEG / 一路 MJPEG。看的人再多也只渲染一次，和设备数无关地只开一个连接。
+#
+# 上传路径只记下每路最新 JPEG 的引用并把代号 +1（不解码）；
+# 有人看时才渲染，而且只重画代号变了的格子：
+# JPEG draft 按 DCT 直接缩小解码 -> 缩放到格子大小 -> 缓存 -> 贴进常驻画布。
+from math import ceil, sqrt
+import io
+import threading
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+SIDES = ("L", "R")
+
+
+class _Source:
+    __slots__ = ("jpg", "gen", "t")
+
+    def __init__(self):
+        self.jpg = None
+        self.gen = 0
+        self.t = 0.0
+
+
+class _Tile:
+    __slots__ = ("gen", "img")
+
+    def __init__(self, gen, img):
+        self.gen = gen
+        self.img = img
+
+
+def _fit_tile(jpg: bytes, tw: int, th: int, label: str) -> np.ndarray:
+    im = Image.open(io.BytesIO(jpg))
+    im.draft("RGB", (tw, th))  # 1/2 ~ 1/8 DCT 缩放解码
+    im = im.convert("RGB")
+    im.thumbnail((tw, th), Image.BILINEAR)
+    tile = Image.new("RGB", (tw, th))
+    tile.paste(im, ((tw - im.width) // 2, (th - im.height) // 2))
+    ImageDraw.Draw(tile).text((4, 2), label, fill=(255, 255, 0))
+    return np.asarray(tile)
+
+
+class Mosaic:
+    def __init__(
+        self,
+        tile_w: int = 320,
+        tile_h: int = 240,
+        quality: int = 70,
+        stale_s: float = 10.0,
+    ):
+        self.tile_w = tile_w
+        self.tile_h = tile_h
+        self.quality = quality
+        self.stale_s = stale_s
+        self._sources = {}  # (dev, side) -> _Source
+        self._tiles = {}  # (dev, side) -> _Tile
+        self._gen = 0  # 任一路更新就 +1
+        self._src_lock = threading.Lock()
+        self._changed = threading.Condition(self._src_lock)
+        # 渲染状态：同一时刻只有一个线程渲染，其他看的人直接拿结果
+        self._render_lock = threading.Lock()
+        self._layout = None
+        self._cols = 1
+        self._canvas = None
+        self._out = (None, None)  # ((gen, 陈旧格子), jpeg)
+        self.stats = {"renders": 0, "tiles_drawn": 0, "tiles_cached": 0}
+
+    # ---------- 上传路径 ----------
+    def update(self, dev: str, side: str, jpg: bytes):
+        """只记引用 + 代号，O(1)。"""
+        with self._changed:
+            src = self._sources.get((dev, side))
+            if src is None:
+                src = self._sources[(dev, side)] = _Source()
+            src.jpg = jpg
+            src.gen += 1
+            src.t = time.time()
+            self._gen += 1
+            self._changed.notify_all()
+
+    def devices(self) -> list:
+        with self._src_lock:
+            return sorted({dev for dev, _ in self._sources})
+
+    def wait(self, after_gen: int, timeout: float) -> int:
+        # 等到有新帧（代号超过 after_gen）或超时，返回当前代号
+        with self._changed:
+            self._changed.wait_for(lambda: self._gen > after_gen, timeout)
+            return self._gen
+
+    # ---------- 渲染 ----------
+    def _grid(self, ndev: int):
+        # 每台设备占一个“左右对”格，排成近似正方形
+        cols = max(1, ceil(sqrt(ndev)))
+        rows = max(1, ceil(ndev / cols))
+        return rows, cols
+
+    def render(self):
+        """
+        返回 (key, jpeg)；新帧或“变陈旧”的格子都没有时直接返回上次的结果。
+        没有任何设备时 (None, None)。
+        """
+        with self._render_lock:
+            now = time.time()
+            with self._src_lock:
+                snap = {k: (s.jpg, s.gen, s.t) for k, s in self._sources.items()}
+                gen = self._gen
+            if not snap:
+                return None, None
+            stale = frozenset(k for k, v in snap.items() if now - v[2] > self.stale_s)
+            key = (gen, stale)
+            if key == self._out[0]:
+                return self._out
+
+            devs = sorted({dev for dev, _ in snap})
+            tw, th = self.tile_w, self.tile_h
+            relayout = self._layout != devs
+            if relayout:
+                # 设备增减：重新排版，所有格子重贴（缩放好的格子缓存照用）
+                rows, self._cols = self._grid(len(devs))
+                self._canvas = np.zeros((rows * th, self._cols * 2 * tw, 3), np.uint8)
+                self._layout = devs
+
+            for i, dev in enumerate(devs):
+                r, c = divmod(i, self._cols)
+                for j, side in enumerate(SIDES):
+                    k = (dev, side)
+                    item = snap.get(k)
+                    if item is None:
+                        continue
+                    want = (item[1], k in stale)
+                    tile = self._tiles.get(k)
+                    if tile is not None and tile.gen == want:
+                        self.stats["tiles_cached"] += 1
+                        if not relayout:
+                            continue  # 画布上已经是这一格
+                    else:
+                        try:
+                            img = _fit_tile(item[0], tw, th, f"{dev} {side}")
+                        except Exception:
+                            continue
+                        if want[1]:
+                            img = img // 3  # 太久没更新：压暗
+                        tile = self._tiles[k] = _Tile(want, img)
+                        self.stats["tiles_drawn"] += 1
+                    x0, y0 = (2 * c + j) * tw, r * th
+                    self._canvas[y0 : y0 + th, x0 : x0 + tw] = tile.img
+
+            for k in list(self._tiles):
+                if k not in snap:
+                    del self._tiles[k]
+
+            buf = io.BytesIO()
+            Image.fromarray(self._canvas).save(buf, format="JPEG", quality=self.quality)
+            self._out = (key, buf.getvalue())
+            self.stats["renders"] += 1
+            return self._out
+
+    def stream(self, max_fps: float = 10.0, timeout: float = 5.0):
+        """
+        每个观看者一个生成器：有新帧才出一张（最多 max_fps），
+        超时没有新帧时重发一张保活（顺带把陈旧的格子压暗）。渲染结果在观看者之间共享。
+        """
+        gap = 1.0 / max_fps if max_fps > 0 else 0.0
+        last_gen = -1
+        last_t = 0.0
+        while True:
+            wait = gap - (time.time() - last_t)
+            if wait > 0:
+                time.sleep(wait)
+            last_gen = self.wait(last_gen, timeout)
+            last_t = time.time()
+            _, jpg = self.render()
+            if jpg is not None:
+                yield jpg
+
+    def summary(self) -> dict:
+        with self._src_lock:
+            now = time.time()
+            sources = {
+                f"{dev}/{side}": {"gen": s.gen, "age_s": now - s.t}
+                for (dev, side), s in self._sources.items()
+            }
+            gen = self._gen
+        return {"gen": gen, "sources": sources, "stats": dict(self.stats)}
@@ -0,0 +1,84 @@
+# pc/motion.py
+# 运动门控录制：缩略亮度图 vs 滑动背景，滞回开关 + 预录/后录
+from collections import deque
+import threading
+import numpy as np
+
+
+class MotionGate:
+    """
+    每路视频一个实例。feed() 输入一帧的缩略亮度图和待归档的帧，
+    返回 (本次需要写盘的帧列表, 是否处于活动状态, 运动分数)。
+
+    - 分数 = 缩略图中 |thumb - 背景| > pixel_thresh 的像素比例
+    - 分数 >= on_frac 开始录制；连续 post_roll 帧 < off_frac 才停止（滞回）
+    - 静止时最近 pre_roll 帧留在内存环形缓冲，开始录制时先落盘
+    """
+
+    def __init__(
+        self,
+        pixel_thresh=18,
+        on_frac=0.02,
+        off_frac=0.005,
+        alpha=0.05,
+        pre_roll=10,
+        post_roll=20,
+    ):
+        self.pixel_thresh = float(pixel_thresh)
+        self.on_frac = float(on_frac)
+        self.off_frac = float(off_frac)
+        self.alpha = float(alpha)
+        self.post_roll = int(post_roll)
+        self._ring = deque(maxlen=max(0, int(pre_roll)))
+        self._bg = None
+        self._active = False
+        self._quiet = 0
+        self._lock = threading.Lock()
+
+    def score(self, thumb: np.ndarray) -> float:
+        if self._bg is None or self._bg.shape != thumb.shape:
+            return 0.0
+        diff = np.abs(thumb.astype(np.float32) - self._bg)
+        return float(np.count_nonzero(diff > self.pixel_thresh)) / diff.size
+
+    def _update_bg(self, thumb: np.ndarray):
+        t = thumb.astype(np.float32)
+        if self._bg is None or self._bg.shape != t.shape:
+            self._bg = t
+            return
+        # 原地 EMA，不分配新背景数组
+        self._bg *= 1.0 - self.alpha
+        self._bg += self.alpha * t
+
+    def feed(self, thumb: np.ndarray, item):
+        with self._lock:
+            s = self.score(thumb)
+            self._update_bg(thumb)
+
+            if self._active:
+                if s < self.off_frac:
+                    self._quiet += 1
+                    if self._quiet > self.post_roll:
+                        self._active = False
+                else:
+                    self._quiet = 0
+            elif s >= self.on_frac:
+                self._active = True
+                self._quiet = 0
+
+            if not self._active:
+                self._ring.append(item)
+                return [], False, s
+
+            out = list(self._ring)
+            self._ring.clear()
+            out.append(item)
+            return out, True, s
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "active": self._active,
+                "quiet_frames": self._quiet,
+                "pre_roll_buffered": len(self._ring),
+            }
@@ -0,0 +1,162 @@
+# pc/pixfmt.py
+# 设备上传的原始像素格式 -> numpy 数组 -> JPEG
+import io
+from contextlib import nullcontext
+import numpy as np
+from PIL import Image
+
+# 每像素字节数；key 即 X-Format 头的规范名
+BPP = {"RGB565": 2, "GRAY8": 1}
+
+_ALIASES = {
+    "RGB565": "RGB565",
+    "RGB": "RGB565",
+    "GRAY8": "GRAY8",
+    "GRAYSCALE": "GRAY8",
+    "GRAY": "GRAY8",
+    "L": "GRAY8",
+}
+
+
+def normalize_format(s) -> str:
+    # 缺省按 RGB565（兼容旧固件不带 X-Format）
+    if not s:
+        return "RGB565"
+    fmt = _ALIASES.get(str(s).upper().strip())
+    if fmt is None:
+        raise ValueError(f"unsupported raw format: {s}")
+    return fmt
+
+
+def raw_size(w: int, h: int, fmt: str) -> int:
+    return w * h * BPP[fmt]
+
+
+def _new(shape, dtype) -> np.ndarray:
+    # 默认分配器；服务端传入池化的 alloc(shape, dtype)，见 bufpool.py
+    return np.empty(shape, dtype)
+
+
+def _rgb565_lut() -> np.ndarray:
+    # 65536 x 3 查表：5/6 bit 扩展到 8 bit（高位复制到低位）。
+    # 换算就是一次 take 直接写进输出数组，没有 uint16/分通道的中间量
+    v = np.arange(65536, dtype=np.uint32)
+    r = (v >> 11) & 0x1F
+    g = (v >> 5) & 0x3F
+    b = v & 0x1F
+    rgb = np.stack([(r << 3) | (r >> 2), (g << 2) | (g >> 4), (b << 3) | (b >> 2)], -1)
+    return rgb.astype(np.uint8)
+
+
+_RGB565_LUT = _rgb565_lut()
+
+
+def rgb565_to_rgb888(
+    raw: bytes, w: int, h: int, swap_bytes: bool, alloc=_new
+) -> np.ndarray:
+    if len(raw) != w * h * 2:
+        raise ValueError(f"raw size mismatch: got={len(raw)} expect={w*h*2}")
+
+    # 设备端默认大端（高字节在前）；swap 时按小端读，都是零拷贝 view
+    v = np.frombuffer(raw, dtype="<u2" if swap_bytes else ">u2").reshape(h, w)
+    out = alloc((h, w, 3), np.uint8)
+    np.take(_RGB565_LUT, v, axis=0, out=out)
+    return out
+
+
+def gray8_to_array(raw: bytes, w: int, h: int) -> np.ndarray:
+    # 1 字节/像素，直接零拷贝 view
+    if len(raw) != w * h:
+        raise ValueError(f"raw size mismatch: got={len(raw)} expect={w*h}")
+    return np.frombuffer(raw, dtype=np.uint8).reshape(h, w)
+
+
+def score_natural(img: np.ndarray, alloc=_new) -> float:
+    x = alloc(img.shape, np.int16)
+    d = alloc(img.shape, np.int16)
+    x[...] = img
+    dx, dy = d[:, 1:], d[1:]
+    np.subtract(x[:, 1:], x[:, :-1], out=dx)
+    gx = np.abs(dx, out=dx).mean()
+    np.subtract(x[1:], x[:-1], out=dy)
+    gy = np.abs(dy, out=dy).mean()
+    return float(gx + gy)
+
+
+def _no_stage(name):
+    return nullcontext()
+
+
+def raw565_to_rgb_best(raw: bytes, w: int, h: int, stage=_no_stage, alloc=_new):
+    # stage(name) -> 上下文管理器，供服务端分阶段计时（见 profiler.py）
+    with stage("convert"):
+        rgb0 = rgb565_to_rgb888(raw, w, h, False, alloc)
+        rgb1 = rgb565_to_rgb888(raw, w, h, True, alloc)
+
+    with stage("score"):
+        s0 = score_natural(rgb0, alloc)
+        s1 = score_natural(rgb1, alloc)
+
+    rgb = rgb1 if s1 < s0 else rgb0
+    used_swap = s1 < s0
+    return rgb, used_swap, (s0, s1)
+
+
+def decode_raw(raw: bytes, w: int, h: int, fmt: str, stage=_no_stage, alloc=_new):
+    """
+    raw -> (HxWx3 RGB 或 HxW 灰度数组, info)。
+    info 只包含该格式相关的字段（RGB565 的字节序判定结果）。
+    alloc(shape, dtype) 提供输出/临时数组（缺省 np.empty）。
+    """
+    if fmt == "GRAY8":
+        with stage("convert"):
+            return gray8_to_array(raw, w, h), {}
+    rgb, used_swap, scores = raw565_to_rgb_best(raw, w, h, stage, alloc)
+    return rgb, {
+        "swap": used_swap,
+        "score_no_swap": scores[0],
+        "score_swap": scores[1],
+    }
+
+
+def encode_jpeg(img: np.ndarray, quality: int = 85) -> bytes:
+    mode = "L" if img.ndim == 2 else "RGB"
+    im = Image.fromarray(img, mode=mode)
+    buf = io.BytesIO()
+    if mode == "L":
+        im.save(buf, format="JPEG", quality=quality, optimize=False)
+    else:
+        im.save(buf, format="JPEG", quality=quality, subsampling=0, optimize=False)
+    return buf.getvalue()
+
+
+def to_luma(img: np.ndarray) -> np.ndarray:
+    # 灰度直接返回；RGB 用整数 BT.601 近似 (77R + 150G + 29B) >> 8
+    if img.ndim == 2:
+        return img
+    x = img.astype(np.uint16)
+    y = (77 * x[..., 0] + 150 * x[..., 1] + 29 * x[..., 2]) >> 8
+    return y.astype(np.uint8)
+
+
+# 运动检测 / 去重用的固定尺寸缩略亮度图
+THUMB_SIZE = (64, 48)
+
+
+def thumb_from_array(img: np.ndarray, size=THUMB_SIZE) -> np.ndarray:
+    h, w = img.shape[:2]
+    step = max(1, min(w // size[0], h // size[1]))
+    small = to_luma(img[::step, ::step])
+    if small.shape[1] != size[0] or small.shape[0] != size[1]:
+        small = np.asarray(Image.fromarray(small).resize(size, Image.BILINEAR))
+    return small
+
+
+def thumb_from_jpeg(jpg: bytes, size=THUMB_SIZE) -> np.ndarray:
+    # draft() 让 libjpeg 直接按 1/2~1/8 DCT 缩放解码，只解灰度，比完整解码便宜得多
+    im = Image.open(io.BytesIO(jpg))
+    im.draft("L", size)
+    im = im.convert("L")
+    if im.size != size:
+        im = im.resize(size, Image.BILINEAR)
+    return np.asarray(im)
@@ -0,0 +1,194 @@
+# pc/profiler.py
+# 上传请求分阶段计时（最近 N 个请求的环形缓冲）+ 按需 cProfile 采样窗口
+from collections import deque
+import cProfile
+import io
+import pstats
+import threading
+import time
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    __slots__ = ("trace", "name", "t0")
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        dt = (time.perf_counter() - self.t0) * 1000.0
+        st = self.trace.stages
+        st[self.name] = st.get(self.name, 0.0) + dt
+        return False
+
+
+class Trace:
+    """一个请求的阶段耗时（ms）；同名阶段多次进入时累加。"""
+
+    __slots__ = ("route", "side", "t", "t0", "stages", "status", "total_ms", "bytes")
+
+    def __init__(self, route: str, side: str = None):
+        self.route = route
+        self.side = side
+        self.t = time.time()
+        self.t0 = time.perf_counter()
+        self.stages = {}
+        self.status = None
+        self.total_ms = 0.0
+        self.bytes = 0
+
+    def stage(self, name: str):
+        return _Stage(self, name)
+
+    def to_dict(self) -> dict:
+        return {
+            "route": self.route,
+            "side": self.side,
+            "t": self.t,
+            "status": self.status,
+            "bytes": self.bytes,
+            "total_ms": round(self.total_ms, 3),
+            "stages": {k: round(v, 3) for k, v in self.stages.items()},
+            # 没被任何阶段覆盖的时间（框架开销、锁等待等）
+            "other_ms": round(max(0.0, self.total_ms - sum(self.stages.values())), 3),
+        }
+
+
+class StageProfiler:
+    """
+    enabled=False 时 begin() 返回 None，调用方拿到的都是 NULL_STAGE，
+    每个阶段只剩一次属性查找。
+    """
+
+    def __init__(self, enabled: bool = False, capacity: int = 512):
+        self.enabled = enabled
+        self._recent = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    def begin(self, route: str, side: str = None):
+        if not self.enabled:
+            return None
+        return Trace(route, side)
+
+    def finish(self, trace: Trace, status: int):
+        trace.status = status
+        trace.total_ms = (time.perf_counter() - trace.t0) * 1000.0
+        with self._lock:
+            self._recent.append(trace)
+
+    def slowest(self, n: int = 20, route: str = None) -> list:
+        with self._lock:
+            recent = list(self._recent)
+        if route:
+            recent = [t for t in recent if t.route == route]
+        recent.sort(key=lambda t: t.total_ms, reverse=True)
+        return [t.to_dict() for t in recent[:n]]
+
+    def stage_summary(self) -> dict:
+        # 环形缓冲内每个路由每个阶段的 count/mean/max
+        with self._lock:
+            recent = list(self._recent)
+        acc = {}
+        for t in recent:
+            per = acc.setdefault(t.route, {})
+            for k, v in list(t.stages.items()) + [("total", t.total_ms)]:
+                s = per.setdefault(k, [0, 0.0, 0.0])
+                s[0] += 1
+                s[1] += v
+                s[2] = max(s[2], v)
+        return {
+            route: {
+                k: {"count": n, "mean": round(tot / n, 3), "max": round(mx, 3)}
+                for k, (n, tot, mx) in per.items()
+            }
+            for route, per in acc.items()
+        }
+
+    def __len__(self):
+        with self._lock:
+            return len(self._recent)
+
+
+class ProfileWindow:
+    """
+    按需 cProfile：窗口打开期间每个请求在自己的线程里开一个 Profile，
+    请求结束时把统计合并进窗口（cProfile 只采当前线程）。
+    同时只允许一个窗口。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._deadline = 0.0
+        self._stats = None
+        self._requests = 0
+        self._skipped = 0
+        self._busy = False
+
+    def active(self) -> bool:
+        return self._deadline > time.monotonic()
+
+    def start_request(self):
+        if not self.active():
+            return None
+        prof = cProfile.Profile()
+        try:
+            prof.enable()
+        except ValueError:
+            # 同一解释器里已有别的 profiler 在跑（3.12+ 全局只允许一个）
+            with self._lock:
+                self._skipped += 1
+            return None
+        return prof
+
+    def end_request(self, prof):
+        prof.disable()
+        with self._lock:
+            if self._stats is None:
+                self._stats = pstats.Stats(prof)
+            else:
+                self._stats.add(prof)
+            self._requests += 1
+
+    def capture(self, seconds: float, sort: str = "cumulative", limit: int = 40):
+        """打开窗口 seconds 秒，返回聚合后的 pstats 文本；已有窗口在跑时返回 None。"""
+        with self._lock:
+            if self._busy:
+                return None
+            self._busy = True
+            self._stats = None
+            self._requests = 0
+            self._skipped = 0
+        try:
+            self._deadline = time.monotonic() + seconds
+            time.sleep(seconds)
+            self._deadline = 0.0
+            # 给窗口末尾还在跑的请求一点时间合并
+            time.sleep(0.05)
+            with self._lock:
+                stats, n, skipped = self._stats, self._requests, self._skipped
+            out = io.StringIO()
+            out.write(
+                f"# window={seconds:.1f}s requests={n} skipped={skipped} sort={sort}\n"
+            )
+            if stats is not None:
+                stats.stream = out
+                stats.sort_stats(sort).print_stats(limit)
+            return out.getvalue()
+        finally:
+            with self._lock:
+                self._busy = False
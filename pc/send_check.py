@@ -0,0 +1,248 @@
+# pc/send_check.py
+# 设备上传发送路径（main._encode_payload + http_post / http_get_raw）的主机端检查，不用烧板子：
+# 假图像（bytearray() 就是帧内存本身）+ 假 socket（每次 send 只收一部分、可注入失败、
+# 记开/关次数，收到的字节写进预分配的缓冲），tracemalloc 统计发送一帧新分配的字节数。
+#
+#   python send_check.py                 # VGA RAW（614 KB）
+#   python send_check.py --w 320 --h 240 --chunk 1024 --send-max 700
+#
+# 检查项：零拷贝发送的分配与帧大小无关；PAYLOAD_SAFE_COPY 的复用缓冲只分配一次；
+# 部分发送后服务端收到的字节与帧完全一致；connect/send/recv 任一步失败都会关闭 socket。
+import argparse
+import sys
+import tracemalloc
+import types
+
+import k210_emu as emu
+
+_RESP_OK = b"HTTP/1.1 200 OK\r\n\r\n"
+
+
+class Sink:
+    """假服务端：预分配收包缓冲（不让接收端的分配算进设备发送路径）。"""
+
+    def __init__(self, cap):
+        self.buf = bytearray(cap)
+        self.n = 0
+        self.head_done = False
+        self.body_at = 0
+
+    def reset(self):
+        self.n = 0
+        self.head_done = False
+        self.body_at = 0
+
+    def take(self, mv):
+        k = len(mv)
+        self.buf[self.n : self.n + k] = mv
+        self.n += k
+        if not self.head_done:
+            i = self.buf.find(b"\r\n\r\n", 0, self.n)
+            if i >= 0:
+                self.head_done = True
+                self.body_at = i + 4
+
+    def body(self):
+        return memoryview(self.buf)[self.body_at : self.n]
+
+
+class FakeSocket:
+    """
+    plan 描述这一轮的链路行为：
+      send_max: 每次 send 最多收多少字节（模拟 ESP32 只发出一部分）
+      fail: None / "connect" / "send" / "recv" / "stall"（send 一直返回 0）
+      fail_after: send 失败前先正常收多少字节
+    """
+
+    plan = {"send_max": 1500, "fail": None, "fail_after": 0}
+    sink = None
+    opened = 0
+    closed = 0
+
+    def __init__(self, *args):
+        FakeSocket.opened += 1
+        self.sent = 0
+        self.is_closed = False
+
+    def settimeout(self, t):
+        pass
+
+    def connect(self, addr):
+        if self.plan["fail"] == "connect":
+            raise OSError("connect refused")
+
+    def send(self, data):
+        fail = self.plan["fail"]
+        if fail == "stall":
+            return 0
+        if fail == "send" and self.sent >= self.plan["fail_after"]:
+            raise OSError(5)  # EIO
+        mv = memoryview(data)[: self.plan["send_max"]]
+        self.sink.take(mv)
+        self.sent += len(mv)
+        return len(mv)
+
+    def recv(self, n):
+        if self.plan["fail"] == "recv":
+            raise OSError("recv timeout")
+        return _RESP_OK
+
+    def close(self):
+        if not self.is_closed:
+            self.is_closed = True
+            FakeSocket.closed += 1
+
+
+class FakeImage:
+    """只给发送路径用：bytearray() 返回帧内存本身（和 MaixPy 一样不复制）。"""
+
+    def __init__(self, buf):
+        self.buf = buf
+        self.copies = 0
+
+    def bytearray(self):
+        return self.buf
+
+    def to_bytes(self):
+        self.copies += 1
+        return bytes(self.buf)
+
+
+def _load_device(chunk):
+    emu._install_time(0.0)
+    usocket = types.ModuleType("usocket")
+    usocket.socket = FakeSocket
+    usocket.getaddrinfo = lambda host, port: [(0, 0, 0, "", (host, port))]
+    sys.modules.update(
+        {
+            "sensor": emu._make_sensor(emu.Scene("static"), 0.0),
+            "lcd": emu._make_lcd(0.0),
+            "image": emu._make_image(),
+            "network": emu._make_network(0.0),
+            "fpioa_manager": emu._make_fpioa(),
+            "machine": emu._make_machine(),
+            "usocket": usocket,
+        }
+    )
+    sys.path[:0] = [str(emu.DEVICE_DIR), str(emu.COMMON_DIR)]
+    for d in (emu.DEVICE_DIR, emu.COMMON_DIR):
+        for f in d.glob("*.py"):
+            sys.modules.pop(f.stem, None)
+    import config
+
+    config.SEND_CHUNK = chunk
+    import main as device
+    from pipeline import ReuseBuffer
+
+    return device, ReuseBuffer
+
+
+def _send_frame(device, img, copybuf=None):
+    # 和上传路径一样：取 payload（零拷贝或拷进复用缓冲）-> http_post；返回本帧新分配的峰值字节数
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    payload = device._encode_payload(img, "RAW", 50, copybuf)
+    device.http_post("127.0.0.1", 5005, "/upload_raw/L", payload, {"X-Frame-Id": "1L"})
+    return tracemalloc.get_traced_memory()[1] - base
+
+
+def main():
+    ap = argparse.ArgumentParser(description="K210 send path check (host)")
+    ap.add_argument("--w", type=int, default=640)
+    ap.add_argument("--h", type=int, default=480)
+    ap.add_argument("--chunk", type=int, default=2048, help="SEND_CHUNK")
+    ap.add_argument("--send-max", type=int, default=1460, help="bytes per send()")
+    ap.add_argument("--frames", type=int, default=5)
+    args = ap.parse_args()
+
+    device, ReuseBuffer = _load_device(args.chunk)
+    n = args.w * args.h * 2
+    frame = bytearray((i * 7) & 0xFF for i in range(n))
+    img = FakeImage(frame)
+    FakeSocket.sink = Sink(n + 4096)
+    FakeSocket.plan = {"send_max": args.send_max, "fail": None, "fail_after": 0}
+    # 发送路径本身的固定开销（请求头字符串、memoryview 切片）的上限，与帧大小无关
+    budget = 16 * 1024
+
+    results = []
+
+    def check(name, ok, detail):
+        results.append((name, ok, detail))
+
+    tracemalloc.start()
+
+    peaks = []
+    for _ in range(args.frames):
+        FakeSocket.sink.reset()
+        peaks.append(_send_frame(device, img))
+    body = FakeSocket.sink.body()
+    check(
+        "zero-copy alloc",
+        max(peaks) < budget and img.copies == 0,
+        "frame=%d B peak/frame=%d B to_bytes=%d" % (n, max(peaks), img.copies),
+    )
+    check(
+        "partial sends",
+        len(body) == n and body == frame,
+        "received=%d B in %d-byte sends" % (len(body), args.send_max),
+    )
+
+    copybuf = ReuseBuffer(0)
+    peaks = []
+    for _ in range(args.frames):
+        FakeSocket.sink.reset()
+        peaks.append(_send_frame(device, img, copybuf))
+    check(
+        "safe-copy reuse",
+        copybuf.grows == 1 and max(peaks[1:] or [0]) < budget,
+        "grows=%d first=%d B later max=%d B"
+        % (copybuf.grows, peaks[0], max(peaks[1:] or [0])),
+    )
+    body = FakeSocket.sink.body()
+    check("safe-copy bytes", body == frame, "received=%d B" % len(body))
+    tracemalloc.stop()
+
+    for fail, after in (
+        ("connect", 0),
+        ("send", 0),
+        ("send", n // 2),
+        ("stall", 0),
+        ("recv", 0),
+    ):
+        FakeSocket.plan = {"send_max": args.send_max, "fail": fail, "fail_after": after}
+        FakeSocket.sink.reset()
+        opened, closed = FakeSocket.opened, FakeSocket.closed
+        try:
+            device.http_post_with_retry(
+                "127.0.0.1", 5005, "/upload_raw/L", memoryview(frame), retry=2
+            )
+            raised = False
+        except Exception:
+            raised = True
+        leaked = (FakeSocket.opened - opened) - (FakeSocket.closed - closed)
+        check(
+            "post fails: %s@%d" % (fail, after),
+            raised and leaked == 0,
+            "raised=%s sockets=%d leaked=%d"
+            % (raised, FakeSocket.opened - opened, leaked),
+        )
+
+    for fail in ("connect", "send", "recv"):
+        FakeSocket.plan = {"send_max": args.send_max, "fail": fail, "fail_after": 0}
+        opened, closed = FakeSocket.opened, FakeSocket.closed
+        try:
+            device.http_get_raw("http://127.0.0.1:5005/ping")
+        except Exception:
+            pass
+        leaked = (FakeSocket.opened - opened) - (FakeSocket.closed - closed)
+        check("get fails: %s" % fail, leaked == 0, "leaked=%d" % leaked)
+
+    bad = 0
+    for name, ok, detail in results:
+        print("%-24s %-4s %s" % (name, "ok" if ok else "FAIL", detail))
+        bad += not ok
+    sys.exit(1 if bad else 0)
+
+
+if __name__ == "__main__":
+    main()
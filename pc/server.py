@@ -1,31 +1,150 @@
 # pc/server.py
-from flask import Flask, request, jsonify, send_file, abort, Response
+from flask import Flask, request, jsonify, send_file, abort, Response, g
 from pathlib import Path
 from datetime import datetime
+from collections import Counter
 import os
-import shutil
 import io
+import hashlib
+import json
+import threading
+import time
 import numpy as np
 from PIL import Image
 
+import avi
+from bufpool import BufferPool
+from composite import VIEWS, Composite
+from deltaframe import DeltaMismatch, DeltaStore
+import jpegmeta
+import pixfmt
+import stereo
+from motion import MotionGate
+from mosaic import Mosaic
+from latency import ClockSync, LatencyBook, stages_ms
+from profiler import NULL_STAGE, ProfileWindow, StageProfiler
+from telemetry import TelemetryStore
+
 app = Flask(__name__)
 
+
+def _env_flag(name: str, default: bool = False) -> bool:
+    v = os.environ.get(name)
+    if v is None:
+        return default
+    return v.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_num(name: str, default):
+    v = os.environ.get(name)
+    return type(default)(v) if v else default
+
+
 # 关键：用 server.py 所在目录作为根，避免“从别的目录启动导致 frames 写到别处”
 BASE_DIR = Path(__file__).resolve().parent
-FRAMES_DIR = BASE_DIR / "frames"
+# STEREO_FRAMES_DIR 可改到别处（k210_emu.py 跑基准时用临时目录）
+FRAMES_DIR = Path(os.environ.get("STEREO_FRAMES_DIR") or BASE_DIR / "frames")
 FRAMES_DIR.mkdir(parents=True, exist_ok=True)
 
 LATEST_L = FRAMES_DIR / "latest_L.jpg"
 LATEST_R = FRAMES_DIR / "latest_R.jpg"
 
+# 每存一帧追加一行 JSON 元数据（几何/格式/帧号），导出等后续环节直接读，不再解析图片
+INDEX_FILE = FRAMES_DIR / "index.jsonl"
+_INDEX_LOCK = threading.Lock()
+_latest_meta = {}
+
+# 运动门控：只在有活动时归档（latest_* 照常更新），静止场景几乎不写盘
+MOTION_GATE = _env_flag("STEREO_MOTION_GATE")
+MOTION_OPTS = {
+    "pixel_thresh": _env_num("STEREO_MOTION_PIXEL", 18.0),
+    "on_frac": _env_num("STEREO_MOTION_ON", 0.02),
+    "off_frac": _env_num("STEREO_MOTION_OFF", 0.005),
+    "alpha": _env_num("STEREO_MOTION_ALPHA", 0.05),
+    "pre_roll": _env_num("STEREO_MOTION_PRE_ROLL", 10),
+    "post_roll": _env_num("STEREO_MOTION_POST_ROLL", 20),
+}
+_gates = {}  # (设备, 路) -> MotionGate，各台各自的背景基准
+_GATES_LOCK = threading.Lock()
+
+# 原始像素归档（可选）：RAW 上传的帧归档为 .raw（原样字节，不经 JPEG），
+# index 里带 format/swap，dataset.py 直接按原始像素导出；latest_* 仍是 JPEG
+ARCHIVE_RAW = _env_flag("STEREO_ARCHIVE_RAW")
+
+# JPEG 上传默认只扫标记段（SOI/SOF/SOS/EOI + 与 X-W/X-H 对尺寸），
+# STEREO_JPEG_STRICT=1 时再额外让 PIL 完整 verify 一遍
+JPEG_STRICT = _env_flag("STEREO_JPEG_STRICT")
+
+# 重复帧抑制：与同一设备同一路上一张被接收的帧比较指纹，
+# 完全相同（payload 哈希）或近似相同（缩略图平均绝对差 < DEDUP_NEAR）
+# 的帧跳过校验/编码/写盘，只刷新存活时间和计数
+DEDUP = _env_flag("STEREO_DEDUP", True)
+DEDUP_NEAR = _env_num("STEREO_DEDUP_NEAR", 0.5)  # 0 = 只去完全相同
+_DEDUP_LOCK = threading.Lock()
+_last_fp = {}  # (设备, 路) -> (payload 哈希, 缩略图)
+
+# RAW 上传的接收 buffer / 换算输出按 (w, h, 格式) 池化复用，见 bufpool.py；
+# 每种尺寸最多留 STEREO_POOL_PER_KEY 块
+_pool = BufferPool(_env_num("STEREO_POOL_PER_KEY", 8), _env_num("STEREO_POOL_KEYS", 16))
+
+# 差分上传（设备 DELTA=True）：每个 (设备, 路) 一张基准帧
+_deltas = DeltaStore()
+
+# 多设备总览（/mosaic.mjpg）：上传只记引用，有人看时才按格子增量渲染
+_mosaic = Mosaic(
+    _env_num("STEREO_MOSAIC_TILE_W", 320),
+    _env_num("STEREO_MOSAIC_TILE_H", 240),
+    _env_num("STEREO_MOSAIC_QUALITY", 70),
+    _env_num("STEREO_MOSAIC_STALE_S", 10.0),
+)
+MOSAIC_FPS = _env_num("STEREO_MOSAIC_FPS", 5.0)
+
+# 最新一对的合成视图（/pair/<sbs|anaglyph|diff>.jpg / .mjpg）：按 pair 代号只渲染一次
+_composite = Composite(
+    _env_num("STEREO_COMPOSITE_QUALITY", 80), _env_num("STEREO_DIFF_GAIN", 2)
+)
+COMPOSITE_FPS = _env_num("STEREO_COMPOSITE_FPS", 10.0)
+
+# 延迟追踪：设备时钟偏移（/ping 往返估计）+ 每设备每路分阶段直方图
+_clock = ClockSync()
+_latency = LatencyBook()
+
+# 分阶段计时（可选）：STEREO_PROFILE=1 时记录最近 STEREO_PROFILE_KEEP 个上传请求，
+# /debug/slow 看最慢的，/debug/profile?seconds=N 开一个 cProfile 采样窗口
+PROFILE = _env_flag("STEREO_PROFILE")
+_profiler = StageProfiler(PROFILE, _env_num("STEREO_PROFILE_KEEP", 512))
+_profile_window = ProfileWindow()
+_PROFILED_ENDPOINTS = ("upload_raw", "upload_jpeg")
+
+# 设备遥测心跳（/telemetry），每设备保留最近 STEREO_TELEMETRY_KEEP 个窗口
+_telemetry = TelemetryStore(_env_num("STEREO_TELEMETRY_KEEP", 360))
+
+_METRICS_LOCK = threading.Lock()
+_metrics = Counter()
+_liveness = {}
+
+# 每台设备最新的一对同步帧（STITCH_LR 一次到齐；分开上传的 L/R 按帧号配对），
+# 供 pair 消费者读取；分开上传的 JPEG 只在配上对时才解码
+_PAIR_LOCK = threading.Lock()
+_pairs = {}  # 设备 -> {"gen", "dev", "frame_id", "t", "L", "R"}
+_pending = {}  # (设备, 路) -> (帧号, 像素或 JPEG 字节)
+
+_RAW_MODE_NAMES = {"RGB565": "raw565", "GRAY8": "gray8"}
+
+# 视差结果按 (设备, pair 代号) 缓存，多个观看者只算一次
+DISPARITY_MAX = 32
+DISPARITY_BLOCK = 7
+_disp_cache = {}  # 设备 -> (gen, png)
+_DISP_LOCK = threading.Lock()
+
 
 def _now_ts():
     return datetime.now().strftime("%Y%m%d_%H%M%S_%f")
 
 
-def _atomic_copy(src: Path, dst: Path):
+def _atomic_write(dst: Path, data: bytes):
     tmp = dst.with_suffix(dst.suffix + ".tmp")
-    shutil.copyfile(src, tmp)
+    tmp.write_bytes(data)
     os.replace(tmp, dst)
 
 
@@ -36,146 +155,934 @@ def _set_nocache(resp):
     return resp
 
 
-def _save_jpg(prefix: str, jpg_bytes: bytes) -> Path:
-    out = FRAMES_DIR / f"{prefix}_{_now_ts()}.jpg"
+def _save_jpg(prefix: str, jpg_bytes: bytes, name: str = None) -> Path:
+    out = FRAMES_DIR / (name or f"{prefix}_{_now_ts()}.jpg")
     out.write_bytes(jpg_bytes)
     return out
 
 
-def _rgb565_to_rgb888(raw: bytes, w: int, h: int, swap_bytes: bool) -> np.ndarray:
-    if len(raw) != w * h * 2:
-        raise ValueError(f"raw size mismatch: got={len(raw)} expect={w*h*2}")
+def _split_lr(img: np.ndarray):
+    # 左右拼接帧 -> 两个零拷贝 view（不复制像素）
+    half = img.shape[1] // 2
+    return img[:, :half], img[:, half:]
 
-    a = np.frombuffer(raw, dtype=np.uint8).reshape(h, w, 2)
-    if swap_bytes:
-        a = a[..., ::-1]  # swap low/high byte per pixel
 
-    msb = a[..., 0].astype(np.uint16)
-    lsb = a[..., 1].astype(np.uint16)
-    v = (msb << 8) | lsb
+def _frame_num(frame_id):
+    # "12L" / "12R" / "12" -> 12
+    digits = ""
+    for c in str(frame_id or ""):
+        if not c.isdigit():
+            break
+        digits += c
+    return int(digits) if digits else None
 
-    r = ((v >> 11) & 0x1F).astype(np.uint8)
-    g = ((v >> 5) & 0x3F).astype(np.uint8)
-    b = (v & 0x1F).astype(np.uint8)
 
-    r = (r << 3) | (r >> 2)
-    g = (g << 2) | (g >> 4)
-    b = (b << 3) | (b >> 2)
+def _publish_pair(dev: str, frame_id, left: np.ndarray, right: np.ndarray) -> int:
+    with _PAIR_LOCK:
+        prev = _pairs.get(dev)
+        gen = (prev["gen"] + 1) if prev else 1
+        _pairs[dev] = {
+            "gen": gen,
+            "dev": dev,
+            "frame_id": frame_id,
+            "t": time.time(),
+            "L": left,
+            "R": right,
+        }
+    _composite.publish(dev, gen)
+    return gen
 
-    return np.stack([r, g, b], axis=-1)
 
+def _as_pixels(img) -> np.ndarray:
+    if isinstance(img, np.ndarray):
+        return img
+    im = Image.open(io.BytesIO(img))
+    return np.asarray(im if im.mode == "L" else im.convert("RGB"))
 
-def _score_natural(rgb: np.ndarray) -> float:
-    x = rgb.astype(np.int16)
-    gx = np.abs(x[:, 1:, :] - x[:, :-1, :]).mean()
-    gy = np.abs(x[1:, :, :] - x[:-1, :, :]).mean()
-    return float(gx + gy)
 
+def _offer_side(side: str, frame: int, img):
+    """
+    分开上传的 L/R 按 (设备, 帧号) 配对，同一台的两边到齐才发布。
+    img 是像素数组（RAW 上传）或 JPEG 字节（JPEG 上传，配上对时才解码）。
+    """
+    if frame is None:
+        return None
+    dev = _device_id()
+    other = "R" if side == "L" else "L"
+    with _PAIR_LOCK:
+        pending = _pending.get((dev, other))
+        if pending is None or pending[0] != frame:
+            _pending[(dev, side)] = (frame, img)
+            return None
+        del _pending[(dev, other)]
+    try:
+        with _stage("pair"):
+            img, peer = _as_pixels(img), _as_pixels(pending[1])
+    except Exception:
+        return None  # 已通过标记扫描但解码失败：这一对不发布，上传本身照常
+    if side == "L":
+        return _publish_pair(dev, frame, img, peer)
+    return _publish_pair(dev, frame, peer, img)
 
-def _raw565_to_jpeg_best(raw: bytes, w: int, h: int):
-    rgb0 = _rgb565_to_rgb888(raw, w, h, swap_bytes=False)
-    rgb1 = _rgb565_to_rgb888(raw, w, h, swap_bytes=True)
 
-    s0 = _score_natural(rgb0)
-    s1 = _score_natural(rgb1)
+def latest_pair(dev: str = None):
+    """dev 为 None 时返回所有设备里最新发布的一对。"""
+    with _PAIR_LOCK:
+        if dev is not None:
+            return _pairs.get(dev)
+        return max(_pairs.values(), key=lambda p: p["t"], default=None)
 
-    rgb = rgb1 if s1 < s0 else rgb0
-    used_swap = s1 < s0
 
-    img = Image.fromarray(rgb, mode="RGB")
-    buf = io.BytesIO()
-    img.save(buf, format="JPEG", quality=85, subsampling=0, optimize=False)
-    return buf.getvalue(), used_swap, (s0, s1)
+def pair_devices() -> list:
+    with _PAIR_LOCK:
+        return sorted(_pairs)
 
 
-def _save_latest(side: str, jpg_bytes: bytes):
-    out = _save_jpg(side, jpg_bytes)
-    if side == "L":
-        _atomic_copy(out, LATEST_L)
-    else:
-        _atomic_copy(out, LATEST_R)
+def _geometry(w: int, h: int) -> dict:
+    """
+    X-Roi（全幅坐标 "x,y,w,h"）+ X-Scale（抽样倍数）+ X-Full-W/H：
+    帧内像素 (u, v) 对应全幅坐标 (x + u*scale, y + v*scale)。
+    不带这些头时就是整幅、scale=1。
+    """
+    try:
+        scale = int(request.headers.get("X-Scale") or 1)
+        roi = request.headers.get("X-Roi")
+        if roi:
+            x, y, rw, rh = (int(v) for v in roi.split(","))
+        else:
+            x, y, rw, rh = 0, 0, w * scale, h * scale
+        fw = int(request.headers.get("X-Full-W") or (x + rw))
+        fh = int(request.headers.get("X-Full-H") or (y + rh))
+    except ValueError:
+        abort(400, "bad X-Roi/X-Scale/X-Full-W/X-Full-H")
+    if scale < 1 or rw // scale != w or rh // scale != h:
+        abort(400, f"roi/scale mismatch: roi={rw}x{rh} scale={scale} frame={w}x{h}")
+    if x < 0 or y < 0 or x + rw > fw or y + rh > fh:
+        abort(400, f"roi outside full frame: roi={x},{y},{rw},{rh} full={fw}x{fh}")
+    return {"roi": [x, y, rw, rh], "scale": scale, "full": [fw, fh]}
+
+
+def _burst_meta():
+    # 设备连拍批量上传的帧：X-Burst-Id / X-Burst-Seq / X-Burst-Len / X-Skew-Us
+    bid = request.headers.get("X-Burst-Id")
+    if bid is None:
+        return None
+    try:
+        return {
+            "id": int(bid),
+            "seq": int(request.headers.get("X-Burst-Seq", -1)),
+            "len": int(request.headers.get("X-Burst-Len", 0)),
+            "skew_us": int(request.headers.get("X-Skew-Us", 0)),
+        }
+    except ValueError:
+        abort(400, "bad X-Burst-* headers")
+
+
+def _frame_meta(frame, mode: str, w: int, h: int, geo: dict, **extra) -> dict:
+    meta = {"dev": _device_id(), "frame_id": frame, "mode": mode, "w": w, "h": h}
+    meta.update(extra)
+    meta.update(geo)
+    burst = _burst_meta()
+    if burst is not None:
+        meta["burst"] = burst
+    return meta
+
+
+def _record_frame(side: str, saved: Path, meta: dict) -> dict:
+    rec = {"file": saved.name, "side": side, "t": time.time()}
+    rec.update(meta)
+    line = json.dumps(rec)
+    with _INDEX_LOCK:
+        with open(INDEX_FILE, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+        _latest_meta[side] = rec
+    return rec
+
+
+def _hdr_int(name: str):
+    v = request.headers.get(name)
+    if v is None:
+        return None
+    try:
+        return int(v)
+    except ValueError:
+        return None
+
+
+def _device_id() -> str:
+    return request.headers.get("X-Device-Id") or request.remote_addr or "unknown"
+
+
+def _read_body() -> bytes:
+    data = request.get_data()
+    g.t_body = time.time() * 1000.0
+    return data
+
+
+def _pooled(key, make):
+    # 本请求借用的池化 buffer，请求结束（teardown）时统一归还
+    buf = _pool.take(key, make)
+    g.setdefault("pooled", []).append((key, buf))
+    return buf
+
+
+def _pooled_array(shape, dtype) -> np.ndarray:
+    # 给 pixfmt 的 alloc：按形状 + dtype 取池化数组
+    return _pooled((shape, np.dtype(dtype).str), lambda: np.empty(shape, dtype))
+
+
+def _read_raw_body(w: int, h: int, fmt: str):
+    """
+    body 直接从 WSGI 输入流 readinto 池化的 bytearray（key = (w, h, fmt)），
+    不经 request.get_data() 的一次性 bytes。没有 Content-Length（chunked）时退回 get_data。
+    """
+    expect = pixfmt.raw_size(w, h, fmt)
+    n = request.content_length
+    if n is None:
+        return _read_body()
+    if n != expect:
+        if not n:
+            abort(400, "missing raw")
+        abort(400, f"raw size mismatch: got={n} expect={expect} fmt={fmt}")
+    buf = _pooled((w, h, fmt), lambda: bytearray(expect))
+    got = 0
+    stream = request.stream
+    with memoryview(buf) as mv:
+        while got < expect:
+            k = stream.readinto(mv[got:])
+            if not k:
+                break
+            got += k
+    if got != expect:
+        abort(400, f"truncated raw body: got={got} expect={expect}")
+    g.t_body = time.time() * 1000.0
+    return buf
+
+
+def _read_delta_frame(side: str, w: int, h: int, fmt: str):
+    """
+    X-Delta: key -> 正常读整帧并记为基准；delta -> 读位图 + 变化块，scatter 进基准帧，
+    返回还原出的整帧（池化 buffer）。基准对不上回 409，设备下一帧改发关键帧。
+    """
+    kind = request.headers.get("X-Delta")
+    tile = _hdr_int("X-Tile") or 16
+    seq = _hdr_int("X-Delta-Seq")
+    stream = (_device_id(), side)
+    bpp = pixfmt.BPP[fmt]
+    if kind not in ("key", "delta") or seq is None or tile < 1:
+        abort(400, f"bad X-Delta/X-Delta-Seq/X-Tile: {kind}")
+    if kind == "key":
+        with _stage("read"):
+            raw = _read_raw_body(w, h, fmt)
+        if len(raw) == pixfmt.raw_size(w, h, fmt):
+            with _stage("delta"):
+                _deltas.key(stream, raw, w, h, bpp, tile, seq)
+        g.delta = {"kind": "key", "bytes": len(raw)}
+        return raw
+
+    with _stage("read"):
+        body = _read_body()
+    expect = pixfmt.raw_size(w, h, fmt)
+    raw = _pooled((w, h, fmt), lambda: bytearray(expect))
+    try:
+        with _stage("delta"):
+            info = _deltas.apply(
+                stream, body, w, h, bpp, tile, seq, _hdr_int("X-Delta-Base"), raw
+            )
+    except DeltaMismatch as e:
+        _count("delta_resync")
+        abort(409, f"delta: {e}")
+    except ValueError as e:
+        abort(400, f"delta: {e}")
+    g.delta = dict(info, kind="delta")
+    return raw
+
+
+def _trace_latency(side: str) -> dict:
+    # 设备打的 X-T-Capture / X-T-Encoded / X-T-Send + 服务端收完 body / 处理完时刻
+    dev = _device_id()
+    sync = _clock.offset(dev)
+    t_done = time.time() * 1000.0
+    st = stages_ms(
+        _hdr_int("X-T-Capture"),
+        _hdr_int("X-T-Encoded"),
+        _hdr_int("X-T-Send"),
+        sync[0] if sync else None,
+        getattr(g, "t_body", t_done),
+        t_done,
+    )
+    _latency.record(dev, side, st)
+    return st
+
+
+def _stage(name: str):
+    tr = g.get("trace")
+    return tr.stage(name) if tr is not None else NULL_STAGE
+
+
+@app.before_request
+def _profile_begin():
+    if not PROFILE or request.endpoint not in _PROFILED_ENDPOINTS:
+        return
+    g.trace = _profiler.begin(request.endpoint, (request.view_args or {}).get("side"))
+    g.cprof = _profile_window.start_request()
+
+
+@app.after_request
+def _profile_finish(resp):
+    tr = g.get("trace")
+    if tr is not None:
+        tr.bytes = request.content_length or 0
+        _profiler.finish(tr, resp.status_code)
+    return resp
+
+
+@app.teardown_request
+def _profile_teardown(exc):
+    prof = g.pop("cprof", None)
+    if prof is not None:
+        _profile_window.end_request(prof)
+
+
+@app.teardown_request
+def _pool_teardown(exc):
+    # 编码/写盘都已完成；仍被 pair、待配对帧或预录队列引用的，池会等它们被挤掉再复用
+    for key, buf in g.pop("pooled", ()):
+        _pool.give(key, buf)
+
+
+def _count(key: str, n: int = 1):
+    with _METRICS_LOCK:
+        _metrics[key] += n
+
+
+def _touch(side: str, frame, dup=None):
+    now = time.time()
+    with _METRICS_LOCK:
+        for s in ("L", "R") if side == "LR" else (side,):
+            _liveness[s] = {"t": now, "frame_id": frame, "dup": dup}
+        _metrics["frames_in"] += 1
+        if dup:
+            _metrics[f"dup_{dup}"] += 1
+
+
+def _digest(payload: bytes) -> bytes:
+    return hashlib.blake2b(payload, digest_size=16).digest()
+
+
+def _want_thumb() -> bool:
+    return (DEDUP and DEDUP_NEAR > 0) or MOTION_GATE
+
+
+def _dup_kind(side: str, digest: bytes, thumb: np.ndarray = None):
+    # 连拍序列是刻意采的（标定/运动分析），不做去重
+    if not DEDUP or "X-Burst-Id" in request.headers:
+        return None
+    with _DEDUP_LOCK:
+        prev = _last_fp.get((_device_id(), side))
+    if prev is None:
+        return None
+    if prev[0] == digest:
+        return "exact"
+    if DEDUP_NEAR > 0 and thumb is not None and prev[1] is not None:
+        if prev[1].shape == thumb.shape:
+            mad = np.abs(thumb.astype(np.int16) - prev[1]).mean()
+            if mad < DEDUP_NEAR:
+                return "near"
+    return None
+
+
+def _remember(side: str, digest: bytes, thumb: np.ndarray = None):
+    if DEDUP:
+        with _DEDUP_LOCK:
+            _last_fp[(_device_id(), side)] = (digest, thumb)
+
+
+def _raw_archive_meta(info: dict) -> dict:
+    # 归档 .raw 时 index 里要有还原像素所需的一切：格式在 mode 里，字节序在 swap 里
+    if not ARCHIVE_RAW:
+        return {}
+    return {"archive": "raw", "swap": bool(info.get("swap", False))}
+
+
+def _jpeg_meta(jinfo: dict) -> dict:
+    # 随帧记进 index：后续环节（缩略图/导出/数据集）据此知道通道数，不再解析文件
+    return {
+        "components": jinfo["components"],
+        "subsampling": jinfo["subsampling"],
+        "progressive": jinfo["progressive"],
+    }
+
+
+def _verify_jpeg(jpg: bytes) -> dict:
+    try:
+        jinfo = jpegmeta.scan(jpg)
+        jpegmeta.check_dims(jinfo, _hdr_int("X-W"), _hdr_int("X-H"))
+        if JPEG_STRICT:
+            Image.open(io.BytesIO(jpg)).verify()
+    except Exception as e:
+        abort(400, f"invalid jpeg: {e}")
+    return jinfo
+
+
+def _dup_response(side: str, kind: str, nbytes: int):
+    _touch(side, _frame_num(request.headers.get("X-Frame-Id")), kind)
+    return (
+        jsonify(
+            {
+                "ok": True,
+                "side": side,
+                "duplicate": kind,
+                "bytes": nbytes,
+                "saved": None,
+            }
+        ),
+        200,
+    )
+
+
+def _archive(
+    side: str, data: bytes, meta: dict = None, name: str = None, ext: str = "jpg"
+):
+    out = _save_jpg(side, data, name or f"{side}_{_now_ts()}.{ext}")
+    _count("frames_archived")
+    if meta is not None:
+        _record_frame(side, out, meta)
     return out
 
 
+def _gate(side: str) -> MotionGate:
+    key = (_device_id(), side)
+    with _GATES_LOCK:
+        gate = _gates.get(key)
+        if gate is None:
+            gate = _gates[key] = MotionGate(**MOTION_OPTS)
+        return gate
+
+
+def _save_latest(
+    side: str, jpg_bytes: bytes, meta: dict = None, img=None, thumb=None, raw=None
+):
+    """
+    latest_* 总是更新；归档（带时间戳的帧 + index）在开启运动门控时
+    只发生在活动期间（含预录/后录）。返回本帧归档路径，未归档为 None。
+    raw 不为 None 时归档的是原始像素（.raw）而不是 JPEG。
+    """
+    data, ext = (raw, "raw") if raw is not None else (jpg_bytes, "jpg")
+    with _stage("copy"):
+        _atomic_write(LATEST_L if side == "L" else LATEST_R, jpg_bytes)
+    _mosaic.update(_device_id(), side, jpg_bytes)
+    if not MOTION_GATE or (meta and "burst" in meta):
+        with _stage("write"):
+            return _archive(side, data, meta, ext=ext)
+
+    # 名字在收到时确定，预录帧晚些落盘也保持原时间顺序
+    name = f"{side}_{_now_ts()}.{ext}"
+    if thumb is None:
+        if img is not None:
+            thumb = pixfmt.thumb_from_array(img)
+        else:
+            thumb = pixfmt.thumb_from_jpeg(jpg_bytes)
+    with _stage("motion"):
+        items, _, _ = _gate(side).feed(thumb, (name, data, meta))
+
+    saved = None
+    with _stage("write"):
+        for n, data, m in items:
+            out = _archive(side, data, m, n)
+            if n == name:
+                saved = out
+    return saved
+
+
 @app.get("/ping")
 def ping():
+    # 带 X-Device-Id + X-T0 时顺便做时钟同步（见 latency.ClockSync）
+    t1 = time.time() * 1000.0
+    dev = request.headers.get("X-Device-Id")
+    t0 = _hdr_int("X-T0")
+    if dev and t0 is not None:
+        prev_t0 = _hdr_int("X-Prev-T0")
+        prev_t3 = _hdr_int("X-Prev-T3")
+        prev = None
+        if prev_t0 is not None and prev_t3 is not None:
+            prev = (prev_t0, prev_t3)
+        _clock.observe(dev, t0, t1, time.time() * 1000.0, prev)
     return "ok", 200
 
 
 @app.post("/upload_raw/<side>")
 def upload_raw(side):
     side = side.upper()
-    if side not in ("L", "R"):
+    if side not in ("L", "R", "LR"):
         abort(404)
 
-    raw = request.get_data()
+    # 先看头：尺寸和格式决定接收 buffer
+    w = _hdr_int("X-W")
+    h = _hdr_int("X-H")
+    if not w or not h or w < 0 or h < 0:
+        abort(400, "missing raw or X-W/X-H")
+
+    try:
+        fmt = pixfmt.normalize_format(request.headers.get("X-Format"))
+    except ValueError as e:
+        abort(400, str(e))
+
+    if request.headers.get("X-Delta"):
+        raw = _read_delta_frame(side, w, h, fmt)
+    else:
+        with _stage("read"):
+            raw = _read_raw_body(w, h, fmt)
     if not raw:
         abort(400, "missing raw")
 
-    w = request.headers.get("X-W")
-    h = request.headers.get("X-H")
-    if not w or not h:
-        abort(400, "missing raw or X-W/X-H")
-    w = int(w)
-    h = int(h)
+    expect = pixfmt.raw_size(w, h, fmt)
+    if len(raw) != expect:
+        abort(400, f"raw size mismatch: got={len(raw)} expect={expect} fmt={fmt}")
 
-    if len(raw) != w * h * 2:
-        abort(400, f"raw size mismatch: got={len(raw)} expect={w*h*2}")
+    # 完全重复的 buffer：连转换都不做
+    with _stage("fingerprint"):
+        digest = _digest(raw)
+        dup = _dup_kind(side, digest)
+    if dup:
+        return _dup_response(side, dup, len(raw))
 
-    jpg, used_swap, scores = _raw565_to_jpeg_best(raw, w, h)
-    saved = _save_latest(side, jpg)
+    if side == "LR":
+        return _ingest_lr_raw(raw, w, h, fmt, digest)
 
-    return (
-        jsonify(
-            {
-                "ok": True,
-                "mode": "raw565",
-                "side": side,
-                "w": w,
-                "h": h,
-                "raw_bytes": len(raw),
-                "jpeg_bytes": len(jpg),
-                "swap": used_swap,
-                "score_no_swap": scores[0],
-                "score_swap": scores[1],
-                "saved": str(saved),
-                "latest": f"/latest_{side}.jpg",
-            }
-        ),
-        201,
+    geo = _geometry(w, h)
+    frame = _frame_num(request.headers.get("X-Frame-Id"))
+    img, info = pixfmt.decode_raw(raw, w, h, fmt, _stage, _pooled_array)
+    with _stage("fingerprint"):
+        thumb = pixfmt.thumb_from_array(img) if _want_thumb() else None
+        dup = _dup_kind(side, digest, thumb)
+    if dup:
+        return _dup_response(side, dup, len(raw))
+    _remember(side, digest, thumb)
+    _touch(side, frame)
+
+    with _stage("encode"):
+        jpg = pixfmt.encode_jpeg(img)
+    meta = _frame_meta(
+        frame, _RAW_MODE_NAMES[fmt], w, h, geo, **_raw_archive_meta(info)
     )
+    saved = _save_latest(side, jpg, meta, img, thumb, raw if ARCHIVE_RAW else None)
+    _offer_side(side, frame, img)
+
+    body = {
+        "ok": True,
+        "mode": _RAW_MODE_NAMES[fmt],
+        "format": fmt,
+        "side": side,
+        "w": w,
+        "h": h,
+        "raw_bytes": len(raw),
+        "jpeg_bytes": len(jpg),
+        "saved": str(saved) if saved else None,
+        "latest": f"/latest_{side}.jpg",
+    }
+    body.update(geo)
+    body.update(info)
+    if "delta" in g:
+        body["delta"] = g.delta
+    body["latency"] = _trace_latency(side)
+    return jsonify(body), 201
 
 
 @app.post("/upload_jpeg/<side>")
 def upload_jpeg(side):
     side = side.upper()
-    if side not in ("L", "R"):
+    if side not in ("L", "R", "LR"):
         abort(404)
 
-    jpg = request.get_data()
+    with _stage("read"):
+        jpg = _read_body()
     if not jpg:
         abort(400, "missing jpeg bytes")
 
-    # 基本校验：必须能被 PIL 打开（防止你 K210 端发了“伪 jpeg”）
-    try:
+    # 重复帧在校验之前就挡掉：先比哈希，再比缩略图（draft 解码很便宜）
+    with _stage("fingerprint"):
+        digest = _digest(jpg)
+        dup = _dup_kind(side, digest)
+        thumb = None
+        if not dup and _want_thumb():
+            try:
+                thumb = pixfmt.thumb_from_jpeg(jpg)
+            except Exception:
+                thumb = None  # 交给下面的校验报错
+            dup = _dup_kind(side, digest, thumb)
+    if dup:
+        return _dup_response(side, dup, len(jpg))
+
+    # 基本校验（防止 K210 端发了“伪 jpeg”）：扫标记段，尺寸必须和 X-W/X-H 一致
+    with _stage("verify"):
+        jinfo = _verify_jpeg(jpg)
+
+    _remember(side, digest, thumb)
+    if side == "LR":
+        _touch(side, _frame_num(request.headers.get("X-Frame-Id")))
+        return _ingest_lr_jpeg(jpg, jinfo)
+
+    w, h = jinfo["w"], jinfo["h"]
+    geo = _geometry(w, h)
+    frame = _frame_num(request.headers.get("X-Frame-Id"))
+    _touch(side, frame)
+    meta = _frame_meta(frame, "jpeg", w, h, geo, jpeg=_jpeg_meta(jinfo))
+    saved = _save_latest(side, jpg, meta, thumb=thumb)
+    _offer_side(side, frame, jpg)
+    body = {
+        "ok": True,
+        "mode": "jpeg",
+        "side": side,
+        "w": w,
+        "h": h,
+        "jpeg_bytes": len(jpg),
+        "jpeg": _jpeg_meta(jinfo),
+        "saved": str(saved) if saved else None,
+        "latest": f"/latest_{side}.jpg",
+    }
+    body.update(geo)
+    body["latency"] = _trace_latency(side)
+    return jsonify(body), 201
+
+
+def _lr_response(
+    mode: str,
+    left: np.ndarray,
+    right: np.ndarray,
+    extra: dict,
+    raws=(None, None),
+    archive_meta=None,
+):
+    frame_id = _frame_num(request.headers.get("X-Frame-Id"))
+    # 几何按单眼描述（X-Roi 是每只眼在其全幅中的位置）
+    h, w = left.shape[:2]
+    geo = _geometry(w, h)
+    meta = _frame_meta(frame_id, mode, w, h, geo, layout="LR", **(archive_meta or {}))
+    with _stage("encode"):
+        jpgL = pixfmt.encode_jpeg(left)
+        jpgR = pixfmt.encode_jpeg(right)
+    savedL = _save_latest("L", jpgL, meta, left, raw=raws[0])
+    savedR = _save_latest("R", jpgR, meta, right, raw=raws[1])
+    gen = _publish_pair(_device_id(), frame_id, left, right)
+
+    body = {
+        "ok": True,
+        "mode": mode,
+        "side": "LR",
+        "w": w,
+        "h": h,
+        "pair_gen": gen,
+        "jpeg_bytes_L": len(jpgL),
+        "jpeg_bytes_R": len(jpgR),
+        "saved_L": str(savedL) if savedL else None,
+        "saved_R": str(savedR) if savedR else None,
+        "latest": ["/latest_L.jpg", "/latest_R.jpg"],
+    }
+    body.update(geo)
+    body.update(extra)
+    if "delta" in g:
+        body["delta"] = g.delta
+    body["latency"] = _trace_latency("LR")
+    return jsonify(body), 201
+
+
+def _ingest_lr_raw(raw: bytes, w: int, h: int, fmt: str, digest: bytes):
+    if w % 2:
+        abort(400, f"LR frame width must be even: w={w}")
+    img, info = pixfmt.decode_raw(raw, w, h, fmt, _stage, _pooled_array)
+    with _stage("fingerprint"):
+        thumb = pixfmt.thumb_from_array(img) if _want_thumb() else None
+        dup = _dup_kind("LR", digest, thumb)
+    if dup:
+        return _dup_response("LR", dup, len(raw))
+    _remember("LR", digest, thumb)
+    _touch("LR", _frame_num(request.headers.get("X-Frame-Id")))
+    left, right = _split_lr(img)
+    extra = {"format": fmt, "raw_bytes": len(raw)}
+    extra.update(info)
+    raws = (None, None)
+    if ARCHIVE_RAW:
+        # 行交织 (h, 左一行 + 右一行) -> 每只眼一块连续的原始像素
+        rows = np.frombuffer(raw, np.uint8).reshape(h, 2, -1)
+        raws = (rows[:, 0].tobytes(), rows[:, 1].tobytes())
+    return _lr_response(
+        _RAW_MODE_NAMES[fmt], left, right, extra, raws, _raw_archive_meta(info)
+    )
+
+
+def _ingest_lr_jpeg(jpg: bytes, jinfo: dict):
+    # 宽度在解码前就能从 SOF 判断
+    if jinfo["w"] % 2:
+        abort(400, f"LR frame width must be even: w={jinfo['w']}")
+    with _stage("convert"):
         im = Image.open(io.BytesIO(jpg))
-        im.verify()
-    except Exception as e:
-        abort(400, f"invalid jpeg: {e}")
+        img = np.asarray(im if im.mode == "L" else im.convert("RGB"))
+    left, right = _split_lr(img)
+    # 两只眼归档的是重新编码的 JPEG，源帧的采样信息只放在响应里
+    extra = {"jpeg_bytes": len(jpg), "jpeg": _jpeg_meta(jinfo)}
+    return _lr_response("jpeg", left, right, extra)
 
-    saved = _save_latest(side, jpg)
-    return (
+
+def _selected_pair():
+    # ?dev= 选设备；不带时取最新发布的那台
+    p = latest_pair(request.args.get("dev") or None)
+    if p is None:
+        abort(404)
+    return p
+
+
+@app.get("/pair")
+def pair_info():
+    p = _selected_pair()
+    return _set_nocache(
         jsonify(
             {
-                "ok": True,
-                "mode": "jpeg",
-                "side": side,
-                "jpeg_bytes": len(jpg),
-                "saved": str(saved),
-                "latest": f"/latest_{side}.jpg",
+                "dev": p["dev"],
+                "gen": p["gen"],
+                "frame_id": p["frame_id"],
+                "age_s": time.time() - p["t"],
+                "shape": list(p["L"].shape),
+                "devices": pair_devices(),
             }
-        ),
-        201,
+        )
+    )
+
+
+def _composite_view(view: str) -> str:
+    if view not in VIEWS:
+        abort(404)
+    return view
+
+
+@app.get("/pair/<view>.jpg")
+def pair_view_jpg(view):
+    view = _composite_view(view)
+    p = _selected_pair()
+    try:
+        _, jpg = _composite.render(view, p)
+    except ValueError as e:
+        abort(409, str(e))
+    return _set_nocache(Response(jpg, mimetype="image/jpeg"))
+
+
+@app.get("/pair/<view>.mjpg")
+def pair_view_mjpg(view):
+    view = _composite_view(view)
+    try:
+        fps = float(request.args.get("fps") or COMPOSITE_FPS)
+    except ValueError:
+        abort(400, "bad fps")
+    # 不带 ?dev= 时锁定在打开时最新的那台，之后只跟这一台
+    dev = request.args.get("dev") or _selected_pair()["dev"]
+
+    def gen():
+        for jpg in _composite.stream(view, dev, latest_pair, min(fps, COMPOSITE_FPS)):
+            yield (
+                b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n"
+                % len(jpg)
+            )
+            yield jpg
+            yield b"\r\n"
+
+    return _set_nocache(
+        Response(gen(), mimetype="multipart/x-mixed-replace; boundary=frame")
+    )
+
+
+@app.get("/latest_disparity.png")
+def latest_disparity():
+    p = _selected_pair()
+    with _DISP_LOCK:
+        gen, png = _disp_cache.get(p["dev"], (None, None))
+        if gen != p["gen"]:
+            disp = stereo.disparity_sad(p["L"], p["R"], DISPARITY_MAX, DISPARITY_BLOCK)
+            buf = io.BytesIO()
+            Image.fromarray(stereo.disparity_image(disp, DISPARITY_MAX)).save(
+                buf, format="PNG"
+            )
+            png = buf.getvalue()
+            _disp_cache[p["dev"]] = (p["gen"], png)
+    return _set_nocache(Response(png, mimetype="image/png"))
+
+
+@app.get("/latest_meta.json")
+def latest_meta():
+    with _INDEX_LOCK:
+        meta = dict(_latest_meta)
+    return _set_nocache(jsonify(meta))
+
+
+@app.get("/metrics")
+def metrics():
+    now = time.time()
+    with _METRICS_LOCK:
+        counters = dict(_metrics)
+        live = {
+            k: {"age_s": now - v["t"], "frame_id": v["frame_id"], "dup": v["dup"]}
+            for k, v in _liveness.items()
+        }
+    return _set_nocache(
+        jsonify(
+            {
+                "counters": counters,
+                "liveness": live,
+                "pool": _pool.summary(),
+                "delta": _deltas.summary(),
+                "composite": _composite.summary(),
+            }
+        )
+    )
+
+
+@app.get("/latency")
+def latency_summary():
+    return _set_nocache(
+        jsonify({"clock": _clock.summary(), "devices": _latency.summary()})
+    )
+
+
+@app.post("/telemetry")
+def telemetry_post():
+    report = request.get_json(silent=True)
+    if not isinstance(report, dict) or not isinstance(report.get("stages", {}), dict):
+        abort(400, "telemetry must be a JSON object")
+    dev = report.get("dev") or _device_id()
+    if not isinstance(dev, str) or len(dev) > 64:
+        abort(400, "dev must be a short string")
+    try:
+        row = _telemetry.add(dev, report)
+    except (TypeError, ValueError) as e:
+        abort(400, f"bad telemetry: {e}")
+    return jsonify({"ok": True, "dev": dev, "seq": row["seq"]}), 201
+
+
+@app.get("/telemetry")
+def telemetry_all():
+    last = request.args.get("last", 60, type=int)
+    return _set_nocache(jsonify(_telemetry.summary(last)))
+
+
+@app.get("/telemetry/<dev>")
+def telemetry_dev(dev):
+    if dev not in _telemetry.devices():
+        abort(404)
+    last = request.args.get("last", type=int)
+    return _set_nocache(jsonify(_telemetry.series(dev, last)))
+
+
+@app.get("/export.avi")
+def export_avi():
+    # ?side=L|R|stereo&since=&until=&fps=&limit=&dev=  边读 JPEG 边输出，不重编码
+    # 多台设备上传过时必须给 dev（否则 400 并列出设备），不把几台的帧混进一个文件
+    side = request.args.get("side", "L")
+    dev = request.args.get("dev") or None
+    if side in ("l", "r"):
+        side = side.upper()
+    try:
+        plan = avi.plan_export(
+            FRAMES_DIR,
+            side,
+            request.args.get("since"),
+            request.args.get("until"),
+            request.args.get("fps", type=float),
+            request.args.get("limit", type=int),
+            dev,
+        )
+    except LookupError as e:
+        abort(404, str(e))
+    except ValueError as e:
+        abort(400, str(e))
+    resp = Response(avi.stream_avi(plan), mimetype="video/x-msvideo")
+    resp.headers["Content-Length"] = str(plan.total_size)
+    name = f"stereo_{side}"
+    if dev is not None:
+        # 设备号来自请求头 / IP，只留文件名安全的字符
+        name += "_" + "".join(c if c.isalnum() or c in "-." else "_" for c in dev)
+    resp.headers["Content-Disposition"] = f'attachment; filename="{name}.avi"'
+    return _set_nocache(resp)
+
+
+@app.get("/debug/slow")
+def debug_slow():
+    if not PROFILE:
+        abort(404, "profiling disabled (STEREO_PROFILE=1)")
+    n = request.args.get("n", 20, type=int)
+    route = request.args.get("route")
+    return _set_nocache(
+        jsonify(
+            {
+                "recent": len(_profiler),
+                "stages": _profiler.stage_summary(),
+                "slowest": _profiler.slowest(n, route),
+            }
+        )
+    )
+
+
+@app.get("/debug/profile")
+def debug_profile():
+    if not PROFILE:
+        abort(404, "profiling disabled (STEREO_PROFILE=1)")
+    seconds = min(max(request.args.get("seconds", 10.0, type=float), 0.1), 120.0)
+    sort = request.args.get("sort", "cumulative")
+    if sort not in ("cumulative", "tottime", "calls", "ncalls", "time"):
+        abort(400, f"bad sort: {sort}")
+    text = _profile_window.capture(
+        seconds, sort, request.args.get("limit", 40, type=int)
+    )
+    if text is None:
+        abort(409, "a profile window is already running")
+    return _set_nocache(Response(text, mimetype="text/plain"))
+
+
+@app.get("/motion")
+def motion_status():
+    with _GATES_LOCK:
+        gates = list(_gates.items())
+    return _set_nocache(
+        jsonify(
+            {
+                "enabled": MOTION_GATE,
+                "opts": MOTION_OPTS,
+                "sides": {f"{dev}/{side}": g.stats() for (dev, side), g in gates},
+            }
+        )
+    )
+
+
+@app.get("/mosaic")
+def mosaic_info():
+    return _set_nocache(jsonify(_mosaic.summary()))
+
+
+@app.get("/mosaic.jpg")
+def mosaic_jpg():
+    _, jpg = _mosaic.render()
+    if jpg is None:
+        abort(404)
+    return _set_nocache(Response(jpg, mimetype="image/jpeg"))
+
+
+@app.get("/mosaic.mjpg")
+def mosaic_mjpg():
+    # multipart/x-mixed-replace：浏览器 <img src> 直接播放；所有观看者共享同一次渲染
+    try:
+        fps = float(request.args.get("fps") or MOSAIC_FPS)
+    except ValueError:
+        abort(400, "bad fps")
+
+    def gen():
+        for jpg in _mosaic.stream(min(fps, MOSAIC_FPS)):
+            yield (
+                b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n"
+                % len(jpg)
+            )
+            yield jpg
+            yield b"\r\n"
+
+    return _set_nocache(
+        Response(gen(), mimetype="multipart/x-mixed-replace; boundary=frame")
     )
 
 
@@ -215,12 +1122,18 @@ def index():
     .card{{border:1px solid #ddd;border-radius:10px;padding:10px;}}
     img{{max-width:48vw;height:auto;display:block;}}
     code{{background:#f6f6f6;padding:2px 6px;border-radius:6px;}}
+    table{{border-collapse:collapse;font-size:13px;}}
+    td,th{{padding:2px 8px;text-align:right;border-bottom:1px solid #eee;}}
     @media (max-width:900px){{ img{{max-width:95vw;}} }}
   </style>
 </head>
 <body>
   <h3>MaixDuino Stereo</h3>
-  <div>Frames dir: <code>{FRAMES_DIR}</code></div>
+  <div>Frames dir: <code>{FRAMES_DIR}</code>
+    &middot; all rigs: <a href="/mosaic.mjpg">/mosaic.mjpg</a>
+    &middot; latest pair: <a href="/pair/sbs.mjpg">side-by-side</a>
+    <a href="/pair/anaglyph.mjpg">anaglyph</a>
+    <a href="/pair/diff.mjpg">difference</a></div>
   <div class="row" style="margin-top:12px;">
     <div class="card">
       <div>Left</div>
@@ -231,6 +1144,10 @@ def index():
       <img id="imgR" src="/latest_R.jpg">
     </div>
   </div>
+  <div class="card" style="margin-top:12px;">
+    <div>Devices (telemetry, ms avg/max per window)</div>
+    <table id="tele"></table>
+  </div>
   <script>
     function refresh(){{
       const t = Date.now();
@@ -238,6 +1155,55 @@ def index():
       document.getElementById("imgR").src = "/latest_R.jpg?t=" + t;
     }}
     setInterval(refresh, 400);
+
+    const STAGES = ["capture", "compress", "connect", "send", "response"];
+    function spark(vals){{
+      // 上传速率的迷你折线
+      const NS = "http://www.w3.org/2000/svg", w = 120, h = 24;
+      const svg = document.createElementNS(NS, "svg");
+      svg.setAttribute("width", w);
+      svg.setAttribute("height", h);
+      if (vals.length < 2) return svg;
+      const mx = Math.max(...vals, 1e-6);
+      const pts = vals.map((v, i) =>
+        (i * w / (vals.length - 1)).toFixed(1) + "," + (h - v * h / mx).toFixed(1));
+      const line = document.createElementNS(NS, "polyline");
+      line.setAttribute("fill", "none");
+      line.setAttribute("stroke", "#36c");
+      line.setAttribute("points", pts.join(" "));
+      svg.appendChild(line);
+      return svg;
+    }}
+    function row(tag, cells){{
+      // 设备 id / 上报值都来自客户端：只走 textContent，不拼 HTML
+      const tr = document.createElement("tr");
+      for (const c of cells) {{
+        const td = document.createElement(tag);
+        if (c instanceof Node) td.appendChild(c); else td.textContent = String(c);
+        tr.appendChild(td);
+      }}
+      return tr;
+    }}
+    async function refreshTele(){{
+      let data;
+      try {{ data = await (await fetch("/telemetry?last=60")).json(); }}
+      catch (e) {{ return; }}
+      const num = (v, k) => typeof v === "number" ? v.toFixed(k) : "-";
+      const rows = [row("th", ["device", "age s", "up/s", "kbps", "ok/fail/retry",
+        ...STAGES, "heap free/min", "boot ms", "trend"])];
+      for (const [dev, d] of Object.entries(data)) {{
+        const r = d.latest;
+        if (!r) continue;
+        const cell = s => r[s + "_n"] ? r[s + "_avg"] + "/" + r[s + "_max"] : "-";
+        rows.push(row("td", [dev, num(d.age_s, 0), num(r.uploads_per_s, 1),
+          num(r.kbps, 0), r.ok + "/" + r.fail + "/" + r.retries, ...STAGES.map(cell),
+          r.mem_free + "/" + r.mem_min, d.boot ? d.boot.total_ms : "-",
+          spark(d.series.map(x => x.uploads_per_s))]));
+      }}
+      document.getElementById("tele").replaceChildren(...rows);
+    }}
+    refreshTele();
+    setInterval(refreshTele, 3000);
   </script>
 </body>
 </html>
@@ -0,0 +1,40 @@
+# pc/stereo.py
+# 同步左右帧的消费者（视差等），输入可以是 RGB 或灰度数组
+import numpy as np
+
+from pixfmt import to_luma
+
+
+def _box_sum(a: np.ndarray, k: int) -> np.ndarray:
+    # k x k 窗口求和（积分图），输出与输入同尺寸，边缘按可用像素截断
+    r = k // 2
+    p = np.pad(a, ((r + 1, r), (r + 1, r)), mode="constant").cumsum(0).cumsum(1)
+    return p[k:, k:] - p[:-k, k:] - p[k:, :-k] + p[:-k, :-k]
+
+
+def disparity_sad(
+    left: np.ndarray, right: np.ndarray, max_disp: int = 32, block: int = 7
+) -> np.ndarray:
+    """
+    向量化 SAD 块匹配：每个视差一次整图运算，返回 HxW uint8 视差（像素）。
+    """
+    L = to_luma(left).astype(np.int32)
+    R = to_luma(right).astype(np.int32)
+    h, w = L.shape
+    max_disp = max(1, min(int(max_disp), w - 1))
+
+    best = np.full((h, w), np.iinfo(np.int32).max, dtype=np.int32)
+    disp = np.zeros((h, w), dtype=np.uint8)
+    for d in range(max_disp):
+        cost = _box_sum(np.abs(L[:, d:] - R[:, : w - d]), block)
+        view = best[:, d:]
+        better = cost < view
+        view[better] = cost[better]
+        disp[:, d:][better] = d
+    return disp
+
+
+def disparity_image(disp: np.ndarray, max_disp: int) -> np.ndarray:
+    # 视差 -> 0..255 灰度，便于直接编码查看
+    scale = 255.0 / max(1, max_disp - 1)
+    return np.clip(disp * scale, 0, 255).astype(np.uint8)
@@ -0,0 +1,114 @@
+# pc/telemetry.py
+# 设备遥测（k210/stereo_lcd_wifi/telemetry.py 定期上报）的每设备时间序列
+from collections import deque
+import threading
+import time
+
+STAGES = ("capture", "compress", "connect", "send", "response")
+COUNTS = ("ok", "fail", "retries", "bytes")
+
+
+def _num(v, what: str, default=0):
+    # 上报来自设备（或任何能 POST 的客户端）：只收数字，其余一律 ValueError -> 400
+    if v is None:
+        return default
+    if isinstance(v, bool) or not isinstance(v, (int, float)):
+        raise ValueError(f"{what} must be a number")
+    return v
+
+
+def _nums(v, n: int, what: str) -> list:
+    if not isinstance(v, (list, tuple)) or len(v) != n:
+        raise ValueError(f"{what} must be a list of {n} numbers")
+    return [_num(x, what) for x in v]
+
+
+def flatten(report: dict, t: float) -> dict:
+    """
+    设备上报的紧凑格式 -> 一行时间序列：
+    stages {name: [n, avg, max]} 展开成 <name>_avg / <name>_max，
+    窗口长度换算出上传速率。格式不对时 ValueError。
+    """
+    counts = report.get("counts") or {}
+    if not isinstance(counts, dict):
+        raise ValueError("counts must be an object")
+    counts = {k: _num(counts.get(k), f"counts.{k}") for k in COUNTS}
+    win_s = max(1e-3, _num(report.get("win_ms"), "win_ms") / 1000.0)
+    row = {
+        "t": t,
+        "seq": _num(report.get("seq"), "seq", None),
+        "uptime_s": _num(report.get("uptime_ms"), "uptime_ms") / 1000.0,
+        "win_s": win_s,
+        "ok": counts.get("ok", 0),
+        "fail": counts.get("fail", 0),
+        "retries": counts.get("retries", 0),
+        "bytes": counts.get("bytes", 0),
+        "uploads_per_s": counts.get("ok", 0) / win_s,
+        "kbps": counts.get("bytes", 0) * 8 / 1000.0 / win_s,
+    }
+    mem = _nums(report.get("mem") or [-1, -1], 2, "mem")
+    row["mem_free"], row["mem_min"] = mem[0], mem[1]
+    stages = report.get("stages") or {}
+    if not isinstance(stages, dict):
+        raise ValueError("stages must be an object")
+    for name, v in stages.items():
+        n, avg, mx = _nums(v, 3, f"stages.{name}")
+        row[f"{name}_n"] = n
+        row[f"{name}_avg"] = avg
+        row[f"{name}_max"] = mx
+    return row
+
+
+class TelemetryStore:
+    def __init__(self, maxlen: int = 360):
+        self.maxlen = maxlen
+        self._series = {}
+        self._boot = {}  # dev -> 最近一次启动报告（设备首帧上传后随遥测发一次）
+        self._lock = threading.Lock()
+
+    def add(self, dev: str, report: dict) -> dict:
+        row = flatten(report, time.time())
+        boot = report.get("boot")
+        if boot is not None and not isinstance(boot, dict):
+            raise ValueError("boot must be an object")
+        with self._lock:
+            q = self._series.get(dev)
+            if q is None:
+                q = self._series[dev] = deque(maxlen=self.maxlen)
+            elif q and row["seq"] is not None and q[-1]["seq"] is not None:
+                if row["seq"] <= q[-1]["seq"]:
+                    row["reboot"] = True  # 序号回退：设备重启过
+            q.append(row)
+            if boot:
+                self._boot[dev] = dict(boot, t=row["t"])
+        return row
+
+    def boot(self, dev: str):
+        with self._lock:
+            return self._boot.get(dev)
+
+    def devices(self) -> list:
+        with self._lock:
+            return list(self._series)
+
+    def series(self, dev: str, last: int = None) -> list:
+        with self._lock:
+            q = self._series.get(dev)
+            rows = list(q) if q else []
+        return rows[-last:] if last else rows
+
+    def summary(self, last: int = 60) -> dict:
+        now = time.time()
+        with self._lock:
+            items = [(dev, list(q)) for dev, q in self._series.items()]
+            boots = dict(self._boot)
+        out = {}
+        for dev, rows in items:
+            rows = rows[-last:]
+            out[dev] = {
+                "age_s": now - rows[-1]["t"] if rows else None,
+                "latest": rows[-1] if rows else None,
+                "series": rows,
+                "boot": boots.get(dev),
+            }
+        return out